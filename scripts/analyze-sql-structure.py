@@ -4,41 +4,35 @@ SQL Structure Analyzer
 Analyzes SQL files or databases to identify tables and columns for migration mapping
 """
 
-import re
 import sys
+import json
+import math
 import sqlite3
+import heapq
+import hashlib
 import argparse
-from typing import Dict, List, Set
+from typing import Any, Dict, List, Optional, Set, Tuple
 
-def analyze_sql_file(file_path: str) -> Dict[str, List[str]]:
+from hisabkitab_migration.sql_dump import (apply_statement, iter_range_events, iter_sql_rows, row_scanner,
+                                           scan_ranges, scan_sql_tables, table_columns)
+
+def format_column(column: Dict, table: Dict) -> str:
+    """One-line description of a column, e.g. 'category_id (int(11)) → categories.id'"""
+    text = f"{column['name']} ({column['type']})"
+    if column['name'] in table['primary_key'] or column['primary_key']:
+        text += " [PK]"
+    for fk in table['foreign_keys']:
+        if column['name'] in fk['columns'] and fk['ref_table']:
+            ref_columns = ','.join(fk['ref_columns'])
+            text += f" → {fk['ref_table']}" + (f".{ref_columns}" if ref_columns else '')
+    return text
+
+def analyze_sql_file(file_path: str, workers: int = 1) -> Dict[str, List[str]]:
     """Analyze SQL dump file to extract table structures"""
-    tables = {}
-    
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Find CREATE TABLE statements
-    create_table_pattern = r'CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?`?(\w+)`?\s*\((.*?)\);'
-    matches = re.finditer(create_table_pattern, content, re.IGNORECASE | re.MULTILINE | re.DOTALL)
-    
-    for match in matches:
-        table_name = match.group(1)
-        table_def = match.group(2)
-        
-        # Extract column definitions
-        columns = []
-        # Match column definitions (simplified)
-        column_pattern = r'`?(\w+)`?\s+(\w+(?:\([^)]+\))?)'
-        col_matches = re.finditer(column_pattern, table_def, re.IGNORECASE)
-        
-        for col_match in col_matches:
-            col_name = col_match.group(1)
-            col_type = col_match.group(2)
-            columns.append(f"{col_name} ({col_type})")
-        
-        tables[table_name] = columns
-    
-    return tables
+    return {
+        table_name: [format_column(column, table) for column in table['columns']]
+        for table_name, table in scan_sql_tables(file_path, workers).items()
+    }
 
 def analyze_sqlite_db(db_path: str) -> Dict[str, List[str]]:
     """Analyze SQLite database to extract table structures"""
@@ -64,6 +58,299 @@ def analyze_sqlite_db(db_path: str) -> Dict[str, List[str]]:
     conn.close()
     return tables
 
+class HyperLogLog:
+    """Distinct-count estimate in 2^p bytes (p=12: 4 KB, ~1.6% standard error)"""
+    
+    def __init__(self, p: int = 12):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+    
+    def add(self, value: Any):
+        h = int.from_bytes(hashlib.blake2b(str(value).encode('utf-8', 'surrogatepass'), digest_size=8).digest(), 'big')
+        index = h >> (64 - self.p)
+        rest = h & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+    
+    def count(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m * self.m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.m and zeros:
+            estimate = self.m * math.log(self.m / zeros)
+        return int(round(estimate))
+    
+    def merge(self, other: 'HyperLogLog'):
+        """Fold in a sketch of another stream (register-wise maximum)"""
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+class SpaceSaving:
+    """Top-k heavy hitters with a fixed number of counters
+    
+    The minimum counter is found through a lazily pruned heap, so a miss on
+    a full table costs O(log capacity) instead of a scan.
+    """
+    
+    def __init__(self, capacity: int = 64):
+        self.capacity = capacity
+        self.counts: Dict[Any, int] = {}
+        self.errors: Dict[Any, int] = {}
+        self._heap: List[Tuple[int, Any]] = []
+    
+    def add(self, item: Any):
+        counts = self.counts
+        if item in counts:
+            counts[item] += 1
+            return
+        if len(counts) < self.capacity:
+            counts[item] = 1
+            self.errors[item] = 0
+            heapq.heappush(self._heap, (1, item))
+            return
+        
+        # Pop stale heap entries until the top matches a live counter
+        heap = self._heap
+        while True:
+            floor, victim = heap[0]
+            if counts.get(victim) == floor:
+                break
+            current = counts.get(victim)
+            if current is None:
+                heapq.heappop(heap)
+            else:
+                heapq.heapreplace(heap, (current, victim))
+        heapq.heapreplace(heap, (floor + 1, item))
+        del counts[victim]
+        del self.errors[victim]
+        counts[item] = floor + 1
+        self.errors[item] = floor
+    
+    def top(self, k: int) -> List[Dict]:
+        ranked = sorted(self.counts.items(), key=lambda kv: kv[1], reverse=True)[:k]
+        return [{'value': value, 'count': count, 'max_error': self.errors[value]} for value, count in ranked]
+    
+    def merge(self, other: 'SpaceSaving'):
+        """Fold in a summary of another stream
+        
+        An item missing from a full summary may have occurred up to that
+        summary's minimum count, which is added to its count and error bound.
+        """
+        floor = min(self.counts.values()) if len(self.counts) >= self.capacity else 0
+        other_floor = min(other.counts.values()) if len(other.counts) >= other.capacity else 0
+        counts, errors = {}, {}
+        for item in set(self.counts) | set(other.counts):
+            counts[item] = self.counts.get(item, floor) + other.counts.get(item, other_floor)
+            errors[item] = self.errors.get(item, floor) + other.errors.get(item, other_floor)
+        kept = heapq.nlargest(self.capacity, counts, key=counts.get)
+        self.counts = {item: counts[item] for item in kept}
+        self.errors = {item: errors[item] for item in kept}
+        self._heap = [(count, item) for item, count in self.counts.items()]
+        heapq.heapify(self._heap)
+
+_NUMBER_START = frozenset('0123456789+-. ')
+
+class ColumnProfile:
+    """Single-pass statistics for one column in bounded memory"""
+    
+    TEXT_SAMPLE = 100  # longer values are truncated before counting/comparing
+    
+    def __init__(self, top_k: int = 10):
+        self.top_k = top_k
+        self.nulls = 0
+        self.empty = 0
+        self.numeric = 0
+        self.text = 0
+        self.num_min = None
+        self.num_max = None
+        self.text_min = None
+        self.text_max = None
+        self.max_length = 0
+        self.distinct = HyperLogLog()
+        self.frequent = SpaceSaving(max(64, top_k * 4))
+    
+    def add(self, value: Any):
+        if value is None:
+            self.nulls += 1
+            return
+        if isinstance(value, bytes):
+            value = value.hex()
+        text = value if isinstance(value, str) else str(value)
+        if not text or text.isspace():
+            self.empty += 1
+            return
+        
+        if len(text) > self.max_length:
+            self.max_length = len(text)
+        sample = text[:self.TEXT_SAMPLE]
+        self.distinct.add(text)
+        self.frequent.add(sample)
+        
+        number = None
+        if isinstance(value, (int, float)):
+            number = value
+        elif text[0] in _NUMBER_START:
+            try:
+                number = float(text.replace(',', ''))
+            except ValueError:
+                pass
+        if number is not None and number == number:  # NaN counts as text
+            self.numeric += 1
+            if self.num_min is None or number < self.num_min:
+                self.num_min = number
+            if self.num_max is None or number > self.num_max:
+                self.num_max = number
+        else:
+            self.text += 1
+            if self.text_min is None or sample < self.text_min:
+                self.text_min = sample
+            if self.text_max is None or sample > self.text_max:
+                self.text_max = sample
+    
+    def merge(self, other: 'ColumnProfile'):
+        """Fold in the profile of the same column over another part of the data"""
+        self.nulls += other.nulls
+        self.empty += other.empty
+        self.numeric += other.numeric
+        self.text += other.text
+        self.max_length = max(self.max_length, other.max_length)
+        for name, pick in (('num_min', min), ('num_max', max), ('text_min', min), ('text_max', max)):
+            values = [v for v in (getattr(self, name), getattr(other, name)) if v is not None]
+            setattr(self, name, pick(values) if values else None)
+        self.distinct.merge(other.distinct)
+        self.frequent.merge(other.frequent)
+    
+    def to_dict(self, rows: int) -> Dict:
+        filled = self.numeric + self.text
+        # Rows that had no value at all for this column (short rows) count as nulls too
+        nulls = rows - self.empty - filled
+        return {
+            'null_ratio': round(nulls / rows, 4) if rows else 0,
+            'empty_ratio': round(self.empty / rows, 4) if rows else 0,
+            'numeric_ratio': round(self.numeric / filled, 4) if filled else 0,
+            'text_ratio': round(self.text / filled, 4) if filled else 0,
+            'min': self.num_min if self.numeric else self.text_min,
+            'max': self.num_max if self.numeric else self.text_max,
+            'text_min': self.text_min,
+            'text_max': self.text_max,
+            'max_length': self.max_length,
+            'distinct_estimate': min(self.distinct.count(), filled),
+            'top_values': self.frequent.top(self.top_k)
+        }
+
+class TableProfile:
+    def __init__(self, top_k: int = 10):
+        self.top_k = top_k
+        self.rows = 0
+        self.columns: Dict[str, ColumnProfile] = {}
+    
+    def add_row(self, columns: List[str], values: List[Any]):
+        self.rows += 1
+        for i, value in enumerate(values):
+            name = columns[i] if i < len(columns) else f"column_{i + 1}"
+            profile = self.columns.get(name)
+            if profile is None:
+                profile = self.columns[name] = ColumnProfile(self.top_k)
+            profile.add(value)
+    
+    def merge(self, other: 'TableProfile'):
+        """Fold in the profile of another set of rows from the same table"""
+        for name, profile in other.columns.items():
+            mine = self.columns.get(name)
+            if mine is None:
+                mine = self.columns[name] = ColumnProfile(self.top_k)
+            mine.merge(profile)
+        self.rows += other.rows
+    
+    def to_dict(self) -> Dict:
+        return {
+            'row_count': self.rows,
+            'columns': {name: profile.to_dict(self.rows) for name, profile in self.columns.items()}
+        }
+
+def _profile_range(file_path: str, start: int, stop: Optional[int], top_k: int) -> Tuple[int, Tuple]:
+    """Profile one byte range of a dump in a worker process
+    
+    The worker cannot know the column names of tables defined in earlier
+    ranges, so rows without a column list are profiled by position, keyed
+    by how many of the range's DDL statements preceded them.
+    """
+    statements = []
+    profiles: Dict[Tuple[str, Optional[int]], TableProfile] = {}
+    scanner = row_scanner(file_path, start, stop)
+    for event in iter_range_events(scanner):
+        if event[0] == 'ddl':
+            statements.append(event[1])
+            continue
+        _, table_name, columns, values = event
+        key = (table_name, None if columns is not None else len(statements))
+        profile = profiles.get(key)
+        if profile is None:
+            profile = profiles[key] = TableProfile(top_k)
+        profile.add_row(columns or [], values)
+    return scanner.next_start, (statements, profiles)
+
+def _name_positional(profile: TableProfile, names: List[str]):
+    """Rename a positional profile's column_N entries to the table's column names"""
+    renamed = {}
+    for name, column in profile.columns.items():
+        index = int(name[len('column_'):]) - 1
+        renamed[names[index] if index < len(names) else name] = column
+    profile.columns = renamed
+
+def profile_sql_file(file_path: str, top_k: int = 10, workers: int = 1) -> Dict[str, Dict]:
+    """Profile every table of a SQL dump in one streaming pass, optionally split across processes"""
+    profiles: Dict[str, TableProfile] = {}
+    if workers <= 1:
+        for table_name, columns, values in iter_sql_rows(file_path):
+            profile = profiles.get(table_name)
+            if profile is None:
+                profile = profiles[table_name] = TableProfile(top_k)
+            profile.add_row(columns, values)
+        return {name: profile.to_dict() for name, profile in profiles.items()}
+    
+    tables = {}
+    for statements, range_profiles in scan_ranges(file_path, _profile_range, workers, top_k):
+        by_ddl_count: Dict[Optional[int], List[Tuple[str, TableProfile]]] = {}
+        for (table_name, ddl_count), profile in range_profiles.items():
+            by_ddl_count.setdefault(ddl_count, []).append((table_name, profile))
+        
+        # Replay the range's DDL, naming positional profiles with the columns in effect for their rows
+        named = by_ddl_count.pop(None, [])
+        for count in range(len(statements) + 1):
+            if count:
+                apply_statement(tables, statements[count - 1])
+            for table_name, profile in by_ddl_count.get(count, []):
+                _name_positional(profile, table_columns(tables, table_name))
+                named.append((table_name, profile))
+        
+        for table_name, profile in named:
+            if table_name in profiles:
+                profiles[table_name].merge(profile)
+            else:
+                profiles[table_name] = profile
+    return {name: profile.to_dict() for name, profile in profiles.items()}
+
+def profile_sqlite_db(db_path: str, top_k: int = 10) -> Dict[str, Dict]:
+    """Profile every table of a SQLite database, one cursor pass per table"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%';")
+    table_names = [row[0] for row in cursor.fetchall()]
+    
+    profiles = {}
+    for table_name in table_names:
+        profile = TableProfile(top_k)
+        cursor.execute(f'SELECT * FROM "{table_name}"')
+        columns = [d[0] for d in cursor.description]
+        for row in cursor:
+            profile.add_row(columns, row)
+        profiles[table_name] = profile.to_dict()
+    
+    conn.close()
+    return profiles
+
 def suggest_mapping(table_name: str, columns: List[str]) -> Dict[str, str]:
     """Suggest mapping from SQL table to HisabKitab-Pro entity"""
     table_lower = table_name.lower()
@@ -142,12 +429,31 @@ def main():
     parser.add_argument('--input', '-i', required=True, help='Input file (SQL dump or SQLite DB)')
     parser.add_argument('--type', '-t', choices=['sql', 'sqlite'], required=True, help='Input file type')
     parser.add_argument('--output', '-o', help='Output analysis file (optional)')
+    parser.add_argument('--profile', action='store_true',
+                        help='Profile table data (row counts, null ratios, ranges, distinct estimates, top values) as JSON')
+    parser.add_argument('--top-k', type=int, default=10, help='Number of most frequent values reported per column (default: 10)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Processes scanning byte ranges of a SQL dump in parallel (default: 1)')
     
     args = parser.parse_args()
     
     try:
+        if args.profile:
+            if args.type == 'sql':
+                profile = profile_sql_file(args.input, args.top_k, args.workers)
+            else:
+                profile = profile_sqlite_db(args.input, args.top_k)
+            report = json.dumps({'source': args.input, 'type': args.type, 'tables': profile}, indent=2, ensure_ascii=False, default=str)
+            if args.output:
+                with open(args.output, 'w', encoding='utf-8') as f:
+                    f.write(report)
+                print(f"✅ Profile of {len(profile)} table(s) saved to: {args.output}")
+            else:
+                print(report)
+            return
+        
         if args.type == 'sql':
-            tables = analyze_sql_file(args.input)
+            tables = analyze_sql_file(args.input, args.workers)
         else:
             tables = analyze_sqlite_db(args.input)
         
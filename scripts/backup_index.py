@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Backup Record Index
+SQLite sidecar mapping (entity, id) to the byte offset and length of each
+record in an uncompressed backup, so a single purchase or product can be
+read out of a multi-hundred-MB file without parsing the rest of it
+"""
+
+import os
+import sys
+import json
+import mmap
+import time
+import sqlite3
+import argparse
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from hisabkitab_migration.backup_stream import BackupReader
+
+# Spans inserted per executemany call while indexing
+INSERT_BATCH = 10000
+
+def index_path_for(backup_path: str) -> str:
+    return backup_path + '.idx'
+
+def _key(record_id: Any) -> str:
+    return str(record_id)
+
+class BackupIndex:
+    """Sidecar index of one backup (default: <backup>.idx)
+
+    The index remembers the backup's size and modification time; a backup
+    changed since it was indexed has to be indexed again (see is_current()).
+    Records are read through an mmap of the backup and decoded one at a time.
+    """
+
+    def __init__(self, backup_path: str, index_path: Optional[str] = None):
+        self.backup_path = backup_path
+        self.index_path = index_path or index_path_for(backup_path)
+        self.conn: Optional[sqlite3.Connection] = None
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+
+    def _backup_stamp(self) -> Tuple[int, int]:
+        stat = os.stat(self.backup_path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def build(self) -> Dict[str, int]:
+        """(Re)index the backup in one streaming pass; returns the records indexed per entity"""
+        self.close()
+        stamp = self._backup_stamp()
+        tmp_path = self.index_path + '.tmp'
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        conn = sqlite3.connect(tmp_path)
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute(
+            "CREATE TABLE records ("
+            " entity TEXT NOT NULL,"
+            " id TEXT NOT NULL,"
+            " offset INTEGER NOT NULL,"
+            " length INTEGER NOT NULL,"
+            " PRIMARY KEY (entity, id)"
+            ") WITHOUT ROWID"
+        )
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+
+        counts: Dict[str, int] = {}
+        duplicates = 0
+        batch = []
+        try:
+            for entity, record, offset, length in BackupReader(self.backup_path).iter_spans():
+                if not isinstance(record, dict) or record.get('id') is None:
+                    continue
+                counts[entity] = counts.get(entity, 0) + 1
+                batch.append((entity, _key(record['id']), offset, length))
+                if len(batch) >= INSERT_BATCH:
+                    duplicates += self._insert(conn, batch)
+                    batch = []
+            duplicates += self._insert(conn, batch)
+
+            conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", [
+                ('backup_size', str(stamp[0])),
+                ('backup_mtime_ns', str(stamp[1])),
+                ('built_at', datetime.now().isoformat(timespec='seconds')),
+                ('counts', json.dumps(counts)),
+                ('duplicates', str(duplicates)),
+            ])
+            conn.commit()
+        except BaseException:
+            conn.close()
+            os.remove(tmp_path)
+            raise
+        conn.close()
+        os.replace(tmp_path, self.index_path)
+        return counts
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, batch: List[Tuple]) -> int:
+        """Insert spans; a repeated (entity, id) keeps its first record. Returns how many were repeats"""
+        before = conn.total_changes
+        conn.executemany("INSERT OR IGNORE INTO records (entity, id, offset, length) VALUES (?, ?, ?, ?)", batch)
+        return len(batch) - (conn.total_changes - before)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.conn is None:
+            if not os.path.exists(self.index_path):
+                raise FileNotFoundError(f"no index for {self.backup_path}; build it first")
+            self.conn = sqlite3.connect(f"file:{self.index_path}?mode=ro", uri=True)
+        return self.conn
+
+    def meta(self) -> Dict[str, str]:
+        return dict(self._connect().execute("SELECT key, value FROM meta").fetchall())
+
+    def is_current(self) -> bool:
+        """Whether the index exists and the backup is unchanged since it was built"""
+        if not os.path.exists(self.index_path):
+            return False
+        meta = self.meta()
+        return (meta.get('backup_size'), meta.get('backup_mtime_ns')) == tuple(map(str, self._backup_stamp()))
+
+    def span(self, entity: str, record_id: Any) -> Optional[Tuple[int, int]]:
+        row = self._connect().execute("SELECT offset, length FROM records WHERE entity = ? AND id = ?",
+                                      (entity, _key(record_id))).fetchone()
+        return tuple(row) if row else None
+
+    def get(self, entity: str, record_id: Any) -> Optional[Dict]:
+        """The record with this id, decoded from its bytes alone; None if the entity has no such id"""
+        span = self.span(entity, record_id)
+        if span is None:
+            return None
+        if self._map is None:
+            self._file = open(self.backup_path, 'rb')
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        offset, length = span
+        return json.loads(self._map[offset:offset + length])
+
+    def ids(self, entity: str, limit: int = 10) -> Iterator[str]:
+        """Some indexed ids of an entity, e.g. to show what can be looked up"""
+        for (record_id,) in self._connect().execute("SELECT id FROM records WHERE entity = ? LIMIT ?", (entity, limit)):
+            yield record_id
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+            self._map = None
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+def build_index(index: BackupIndex):
+    print(f"🔨 Indexing {index.backup_path} ...", file=sys.stderr)
+    started = time.perf_counter()
+    counts = index.build()
+    summary = ', '.join(f"{entity}: {count}" for entity, count in counts.items()) or 'no records'
+    print(f"📇 {index.index_path} ({summary}) in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description='Index a HisabKitab-Pro backup and read single records from it by id')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help='Index a backup (writes <backup>.idx)')
+    build.add_argument('backup', help='Uncompressed backup / converter output')
+    build.add_argument('--index', help='Index file (default: <backup>.idx)')
+    get = subparsers.add_parser('get', help='Print records by entity and id (indexes the backup first if needed)')
+    get.add_argument('backup', help='Uncompressed backup / converter output')
+    get.add_argument('entity', help='Entity, e.g. purchases, products, suppliers')
+    get.add_argument('ids', nargs='+', help='Record ids')
+    get.add_argument('--index', help='Index file (default: <backup>.idx)')
+
+    args = parser.parse_args()
+
+    index = BackupIndex(args.backup, args.index)
+    try:
+        if args.command == 'build' or not index.is_current():
+            build_index(index)
+        if args.command == 'build':
+            meta = index.meta()
+            if meta['duplicates'] != '0':
+                print(f"⚠️  {meta['duplicates']} record(s) repeat an id; lookups return the first", file=sys.stderr)
+            return
+
+        missing = 0
+        for record_id in args.ids:
+            started = time.perf_counter()
+            record = index.get(args.entity, record_id)
+            elapsed = (time.perf_counter() - started) * 1000
+            if record is None:
+                missing += 1
+                examples = ', '.join(index.ids(args.entity, 5))
+                print(f"❌ No {args.entity} record with id {record_id}"
+                      f"{' (ids look like: ' + examples + ')' if examples else ''}", file=sys.stderr)
+                continue
+            print(json.dumps(record, indent=2, ensure_ascii=False))
+            print(f"⏱  {args.entity} {record_id}: {elapsed:.2f} ms", file=sys.stderr)
+        if missing:
+            sys.exit(1)
+    except (OSError, ValueError) as e:
+        print(f"❌ Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        index.close()
+
+if __name__ == '__main__':
+    main()
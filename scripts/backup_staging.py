@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Backup Staging Database Tool
+Loads backups into an indexed SQLite staging file, runs the reconciliation
+queries on it and regenerates backups from it (see
+hisabkitab_migration.backup_staging)
+"""
+
+import sys
+import time
+import sqlite3
+import argparse
+from typing import List, Optional, Tuple
+
+from hisabkitab_migration.backup_staging import RECONCILIATION, copy_backup, run_query
+from hisabkitab_migration.backup_stream import is_staging
+
+def print_table(columns: List[str], rows: List[Tuple], limit: Optional[int] = None):
+    print('\t'.join(columns))
+    for row in rows[:limit]:
+        print('\t'.join('' if value is None else str(value) for value in row))
+    if limit is not None and len(rows) > limit:
+        print(f"... and {len(rows) - limit} more rows")
+
+def main():
+    parser = argparse.ArgumentParser(description='Load backups into an indexed SQLite staging file, query it '
+                                                 'and regenerate backups from it')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    load = subparsers.add_parser('load', help='Load a backup / converter output into a staging file')
+    load.add_argument('backup', help='Backup or converter output (.gz/.bz2/.xz too)')
+    load.add_argument('--output', '-o', required=True, help='Staging file (.sqlite, .sqlite3 or .db)')
+    export = subparsers.add_parser('export', help='Regenerate a backup from a staging file')
+    export.add_argument('staging', help='Staging file')
+    export.add_argument('--output', '-o', required=True, help='Backup file (.gz/.bz2/.xz compressed by extension)')
+    report = subparsers.add_parser('report', help='Run the reconciliation queries (supplier totals, GST, invoices)')
+    report.add_argument('staging', help='Staging file')
+    report.add_argument('--limit', type=int, default=50, help='Rows printed per query (default: 50)')
+    query = subparsers.add_parser('query', help='Run one SQL query and print its rows tab-separated')
+    query.add_argument('staging', help='Staging file')
+    query.add_argument('sql', help='SQL, e.g. "SELECT supplier_name, SUM(grand_total) FROM purchases GROUP BY 1"')
+
+    args = parser.parse_args()
+
+    try:
+        if args.command in ('load', 'export'):
+            source, output = (args.backup, args.output) if args.command == 'load' else (args.staging, args.output)
+            if args.command == 'load' and not is_staging(output):
+                parser.error(f"{output}: a staging file is named .sqlite, .sqlite3 or .db")
+            if args.command == 'export' and is_staging(output):
+                parser.error(f"{output}: export writes a JSON backup, not a staging file")
+            print(f"📂 Reading: {source}")
+            started = time.perf_counter()
+            counts = copy_backup(source, output)
+            for entity, count in counts.items():
+                print(f"   {entity}: {count} records")
+            print(f"📁 Output saved to: {output} in {time.perf_counter() - started:.1f}s")
+        elif args.command == 'report':
+            for title, sql in RECONCILIATION.items():
+                columns, rows, elapsed = run_query(args.staging, sql)
+                print(f"📊 {title} ({len(rows)} rows, {elapsed * 1000:.1f} ms)")
+                print_table(columns, rows, args.limit)
+                print()
+        else:
+            columns, rows, elapsed = run_query(args.staging, args.sql)
+            print_table(columns, rows)
+            print(f"⏱  {len(rows)} rows in {elapsed * 1000:.1f} ms", file=sys.stderr)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"❌ Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Backup Checker for HisabKitab-Pro Migration
+Streams a backup or converter output (optionally .gz/.bz2/.xz compressed) and
+checks its envelope, record fields, ids and references, with per-entity
+counts and sizes, without loading the file into memory
+"""
+
+import os
+import sys
+import json
+import argparse
+from typing import Any, Dict, List, Optional, Tuple
+
+from hisabkitab_migration.backup_stream import DATA_KEYS, BackupReader, open_reader
+
+# Top-level fields every backup has (see BACKUP_FORMAT.md), and those it may have
+ENVELOPE_FIELDS = ('version', 'export_date', 'export_by', 'data')
+OPTIONAL_FIELDS = ('summaries',)
+
+# References checked: entity -> {field: referenced entity}
+REFERENCES = {
+    'products': {'category_id': 'categories'},
+    'categories': {'parent_id': 'categories'},
+    'sub_categories': {'parent_id': 'categories'},
+    'purchases': {'supplier_id': 'suppliers'},
+    'sales': {'customer_id': 'customers', 'sales_person_id': 'sales_persons'},
+    'stock_adjustments': {'product_id': 'products'},
+}
+
+# Entities whose line items reference products
+ITEM_REFERENCES = {'purchases': 'items', 'sales': 'items'}
+
+# Templates next to BACKUP_FORMAT.md; a record is expected to have the fields all their records share
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+DEFAULT_TEMPLATES = ('migration-template.json', 'restore-template.json')
+
+# Ids up to this go into a bitmap (16 MB at most per set); larger or non-integer ids into a set
+BITMAP_LIMIT = 1 << 27
+
+# Example ids kept per problem
+EXAMPLES = 5
+
+class IdSet:
+    """Set of record ids in bounded memory: one bit per id for the usual dense integers"""
+
+    def __init__(self):
+        self.bits = bytearray()
+        self.other = set()
+
+    @staticmethod
+    def _normalize(value: Any) -> Any:
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        return value if isinstance(value, (int, str)) and not isinstance(value, bool) else json.dumps(value)
+
+    def add(self, value: Any) -> bool:
+        """Add value; returns False if it was already there"""
+        value = self._normalize(value)
+        if isinstance(value, int) and 0 <= value < BITMAP_LIMIT:
+            byte, bit = value >> 3, 1 << (value & 7)
+            if byte >= len(self.bits):
+                self.bits.extend(bytes(max(byte + 1 - len(self.bits), len(self.bits))))
+            if self.bits[byte] & bit:
+                return False
+            self.bits[byte] |= bit
+            return True
+        if value in self.other:
+            return False
+        self.other.add(value)
+        return True
+
+    def missing_from(self, defined: 'IdSet') -> Tuple[int, List[Any]]:
+        """How many ids of this set are not in defined, and the first few of them"""
+        mine = int.from_bytes(self.bits, 'little')
+        missing = mine & ~int.from_bytes(defined.bits, 'little')
+        count = bin(missing).count('1')
+        examples = []
+        while missing and len(examples) < EXAMPLES:
+            lowest = missing & -missing
+            examples.append(lowest.bit_length() - 1)
+            missing ^= lowest
+        others = [value for value in self.other if value not in defined.other]
+        return count + len(others), examples + others[:EXAMPLES - len(examples)]
+
+def load_expected_fields(template_paths: List[str]) -> Dict[str, set]:
+    """entity (or entity.items) -> fields every template record of it has"""
+    expected: Dict[str, set] = {}
+    for path in template_paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f).get('data', {})
+        for entity, records in data.items():
+            if not isinstance(records, list):
+                continue
+            for record in records:
+                expected[entity] = expected[entity] & set(record) if entity in expected else set(record)
+                items_key = ITEM_REFERENCES.get(entity)
+                for item in record.get(items_key, []) if items_key else []:
+                    name = f"{entity}.{items_key}"
+                    expected[name] = expected[name] & set(item) if name in expected else set(item)
+    return expected
+
+class BackupChecker:
+    """Collects counts and problems while records stream by; errors make the file unsafe to import"""
+
+    def __init__(self, expected_fields: Optional[Dict[str, set]] = None):
+        self.expected_fields = expected_fields or {}
+        self.counts: Dict[str, int] = {}
+        self.ids: Dict[str, IdSet] = {}
+        # (entity, field, referenced entity) -> ids referenced
+        self.references: Dict[Tuple[str, str, str], IdSet] = {}
+        # (level, code, where) -> [count, examples]
+        self.problems: Dict[Tuple[str, str, str], List] = {}
+
+    def problem(self, level: str, code: str, where: str, example: Any = None):
+        entry = self.problems.setdefault((level, code, where), [0, []])
+        entry[0] += 1
+        if example is not None and len(entry[1]) < EXAMPLES:
+            entry[1].append(example)
+
+    def _check_fields(self, name: str, record: Dict, record_id: Any):
+        for field in self.expected_fields.get(name, ()):
+            if field not in record:
+                self.problem('warning', 'missing_field', f"{name}.{field}", record_id)
+
+    def add(self, entity: str, record: Any):
+        self.counts[entity] = self.counts.get(entity, 0) + 1
+        if not isinstance(record, dict):
+            self.problem('error', 'not_an_object', entity, self.counts[entity])
+            return
+        record_id = record.get('id')
+        if record_id is None:
+            self.problem('error', 'missing_id', entity, f"#{self.counts[entity]}")
+        elif not self.ids.setdefault(entity, IdSet()).add(record_id):
+            self.problem('error', 'duplicate_id', entity, record_id)
+        self._check_fields(entity, record, record_id)
+
+        for field, target in REFERENCES.get(entity, {}).items():
+            value = record.get(field)
+            if value is not None and value != '':
+                self.references.setdefault((entity, field, target), IdSet()).add(value)
+
+        items_key = ITEM_REFERENCES.get(entity)
+        if items_key:
+            items = record.get(items_key)
+            if not isinstance(items, list):
+                self.problem('error', 'items_not_a_list', f"{entity}.{items_key}", record_id)
+                return
+            for item in items:
+                if not isinstance(item, dict):
+                    self.problem('error', 'not_an_object', f"{entity}.{items_key}", record_id)
+                    continue
+                self._check_fields(f"{entity}.{items_key}", item, record_id)
+                if item.get('product_id') is not None:
+                    self.references.setdefault((f"{entity}.{items_key}", 'product_id', 'products'),
+                                               IdSet()).add(item['product_id'])
+
+    def check_references(self):
+        for (entity, field, target), referenced in self.references.items():
+            count, examples = referenced.missing_from(self.ids.get(target, IdSet()))
+            if count:
+                # A file without the target entity (e.g. products only) is
+                # resolved against the data already in the app at import
+                where = f"{entity}.{field} -> {target}"
+                if self.counts.get(target):
+                    key = ('error', 'unresolved_reference', where)
+                else:
+                    key = ('warning', 'unresolved_reference', f"{where} (resolved against existing data at import)")
+                entry = self.problems.setdefault(key, [0, []])
+                entry[0] += count
+                entry[1].extend(examples)
+
+    def check_envelope(self, reader: BackupReader):
+        for field in ENVELOPE_FIELDS[:-1]:
+            if field not in reader.header:
+                self.problem('error', 'missing_field', field)
+        if not reader.sizes and not reader.objects:
+            self.problem('error', 'missing_field', 'data')
+        for field in reader.header:
+            if field not in ENVELOPE_FIELDS + OPTIONAL_FIELDS:
+                self.problem('warning', 'unknown_field', field)
+        for entity in self.counts:
+            if entity not in DATA_KEYS:
+                self.problem('warning', 'unknown_entity', f"data.{entity}")
+        for entity in DATA_KEYS:
+            if entity not in reader.sizes:
+                self.problem('warning', 'missing_entity', f"data.{entity}")
+        for name, value in reader.objects.items():
+            if name != 'settings':
+                self.problem('error', 'not_an_array', f"data.{name}")
+            elif not isinstance(value, dict):
+                self.problem('error', 'not_an_object', 'data.settings')
+        if 'settings' not in reader.objects:
+            self.problem('warning', 'missing_entity', 'data.settings')
+
+def check_backup(path: str, expected_fields: Optional[Dict[str, set]] = None) -> Dict:
+    """Stream one backup; returns its report (counts, sizes, problems, ok)"""
+    reader = open_reader(path)
+    checker = BackupChecker(expected_fields)
+    report = {'file': path, 'bytes': os.path.getsize(path)}
+    try:
+        for entity, record in reader:
+            checker.add(entity, record)
+    except ValueError as e:
+        # Malformed JSON: what was read so far is still reported
+        checker.problem('error', 'malformed_json', f"{getattr(e, 'msg', e)}: character {reader.offset}")
+    else:
+        checker.check_envelope(reader)
+    checker.check_references()
+
+    report['version'] = reader.header.get('version')
+    report['export_date'] = reader.header.get('export_date')
+    report['entities'] = {entity: {'records': count, 'size': reader.sizes.get(entity, 0)}
+                          for entity, count in checker.counts.items()}
+    report['problems'] = [{'level': level, 'code': code, 'where': where, 'count': count, 'examples': examples}
+                          for (level, code, where), (count, examples) in checker.problems.items()]
+    report['ok'] = not any(problem['level'] == 'error' for problem in report['problems'])
+    return report
+
+def format_size(size: int) -> str:
+    if size >= 1 << 20:
+        return f"{size / (1 << 20):.1f} MB"
+    if size >= 1 << 10:
+        return f"{size / (1 << 10):.1f} KB"
+    return f"{size} B"
+
+def print_report(report: Dict):
+    print(f"📦 {report['file']} ({format_size(report['bytes'])} on disk, version {report['version']},"
+          f" exported {report['export_date']})")
+    for entity, stats in report['entities'].items():
+        print(f"   {entity}: {stats['records']} records, {format_size(stats['size'])}")
+    if not report['entities']:
+        print("   (no records)")
+    for problem in sorted(report['problems'], key=lambda p: p['level']):
+        icon = '❌' if problem['level'] == 'error' else '⚠️ '
+        examples = f" (e.g. {', '.join(map(str, problem['examples']))})" if problem['examples'] else ''
+        print(f"   {icon} {problem['code']}: {problem['where']} × {problem['count']}{examples}")
+    print("✅ Ready to import" if report['ok'] else "❌ Not safe to import")
+
+def main():
+    parser = argparse.ArgumentParser(description='Check HisabKitab-Pro backup files before importing them')
+    parser.add_argument('inputs', nargs='+', help='Backup / converter output files (.gz/.bz2/.xz and staging .sqlite/.db too)')
+    parser.add_argument('--template', action='append',
+                        help='Template backup whose record fields are expected (repeatable; default: '
+                             'migration-template.json and restore-template.json)')
+    parser.add_argument('--no-fields', action='store_true', help='Skip the record field checks')
+    parser.add_argument('--report', help='Also write the reports to this JSON file')
+
+    args = parser.parse_args()
+
+    expected_fields = None
+    if not args.no_fields:
+        templates = args.template or [os.path.join(TEMPLATE_DIR, name) for name in DEFAULT_TEMPLATES]
+        templates = [path for path in templates if os.path.exists(path)]
+        expected_fields = load_expected_fields(templates) if templates else None
+
+    reports = []
+    for path in args.inputs:
+        try:
+            report = check_backup(path, expected_fields)
+        except OSError as e:
+            print(f"❌ {path}: {e}", file=sys.stderr)
+            report = {'file': path, 'ok': False, 'problems': [{'level': 'error', 'code': 'unreadable',
+                                                                'where': str(e), 'count': 1, 'examples': []}]}
+        else:
+            print_report(report)
+        print()
+        reports.append(report)
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, indent=2, ensure_ascii=False, default=str)
+        print(f"📝 Report written to: {args.report}")
+    sys.exit(0 if all(report['ok'] for report in reports) else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Inbox Conversion Daemon for HisabKitab-Pro Migration
+Watches an inbox directory and converts every file dropped into it with a
+pool of warm worker processes, writing backups and run reports to an outbox
+"""
+
+import os
+import json
+import time
+import signal
+import argparse
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from hisabkitab_migration.cache import add_cache_arguments
+from hisabkitab_migration.profiles import add_profile_arguments
+from hisabkitab_migration.jobs import JobPool
+
+# Files the daemon picks up; anything else dropped in the inbox is left alone
+INBOX_EXTENSIONS = ('.csv', '.xlsx', '.xlsm', '.db', '.sqlite', '.sqlite3', '.sql', '.dump')
+
+# Partially uploaded files are usually written under one of these names first
+IGNORED_SUFFIXES = ('.part', '.tmp', '.crdownload', '.partial')
+
+def unique_path(path: str) -> str:
+    """path, or path with a timestamp suffix when something is already there"""
+    if not os.path.exists(path):
+        return path
+    stem, ext = os.path.splitext(path)
+    candidate = f"{stem}_{datetime.now().strftime('%Y%m%d-%H%M%S')}{ext}"
+    counter = 1
+    while os.path.exists(candidate):
+        candidate = f"{stem}_{datetime.now().strftime('%Y%m%d-%H%M%S')}_{counter}{ext}"
+        counter += 1
+    return candidate
+
+class InboxDaemon:
+    """Polls the inbox, claims settled files and keeps at most max_in_flight conversions running
+
+    A file is claimed by moving it into inbox/.processing, so a restarted
+    daemon never converts it twice; afterwards it moves to inbox/processed
+    or inbox/failed. Each file gets <name>.report.json in outbox/reports.
+    """
+
+    def __init__(self, inbox: str, outbox: str, options: Dict, workers: int,
+                 max_in_flight: Optional[int] = None, poll_interval: float = 2.0):
+        self.inbox = inbox
+        self.outbox = outbox
+        self.options = options
+        self.workers = workers
+        self.max_in_flight = max_in_flight or workers * 2
+        self.poll_interval = poll_interval
+        self.processing_dir = os.path.join(inbox, '.processing')
+        self.reports_dir = os.path.join(outbox, 'reports')
+        for directory in (self.processing_dir, os.path.join(inbox, 'processed'),
+                          os.path.join(inbox, 'failed'), outbox, self.reports_dir):
+            os.makedirs(directory, exist_ok=True)
+
+        self.stopping = False
+        self._sizes: Dict[str, tuple] = {}
+        self.totals = {'ok': 0, 'failed': 0}
+        self.pool = JobPool(workers)
+
+    def request_stop(self, signum=None, frame=None):
+        if self.stopping:
+            print("\n⛔ Second signal: exiting without waiting for running conversions")
+            os._exit(1)
+        self.stopping = True
+        print(f"\n🛑 Draining: finishing {len(self.pool)} running conversion(s), no new files will be claimed")
+
+    def settled_files(self) -> List[str]:
+        """Inbox files whose size and mtime did not change since the previous poll"""
+        ready, seen = [], {}
+        for entry in sorted(os.scandir(self.inbox), key=lambda e: e.name):
+            name = entry.name
+            if not entry.is_file() or name.startswith('.') or name.lower().endswith(IGNORED_SUFFIXES):
+                continue
+            if not name.lower().endswith(INBOX_EXTENSIONS):
+                continue
+            stat = entry.stat()
+            seen[name] = (stat.st_size, stat.st_mtime)
+            if self._sizes.get(name) == seen[name]:
+                ready.append(name)
+        self._sizes = seen
+        return ready
+
+    def claim(self, name: str):
+        claimed = os.path.join(self.processing_dir, name)
+        os.replace(os.path.join(self.inbox, name), claimed)
+        self._sizes.pop(name, None)
+        output_path = unique_path(os.path.join(self.outbox, os.path.splitext(name)[0] + '.json'))
+        self.pool.submit(claimed, claimed, output_path, self.options)
+        print(f"📥 {name} → worker")
+
+    def finish(self, claimed: str, report: Dict):
+        name = os.path.basename(claimed)
+        status = report['status']
+        self.totals[status] += 1
+        destination = unique_path(os.path.join(self.inbox, 'processed' if status == 'ok' else 'failed', name))
+        os.replace(claimed, destination)
+        report['finished_at'] = datetime.now().isoformat()
+        with open(unique_path(os.path.join(self.reports_dir, name + '.report.json')), 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+        if status == 'ok':
+            counts = ', '.join(f"{k}: {v}" for k, v in report['counts'].items())
+            cached = ', from cache' if report.get('cached') else ''
+            print(f"✅ {name} → {report['output']} ({counts}, {report['seconds']}s{cached})")
+        else:
+            print(f"❌ {name}: {report['error']}")
+
+    def recover(self):
+        """Put files left in .processing by an interrupted run back into the inbox"""
+        for name in sorted(os.listdir(self.processing_dir)):
+            os.replace(os.path.join(self.processing_dir, name), unique_path(os.path.join(self.inbox, name)))
+            print(f"♻️  Re-queued {name} from an interrupted run")
+
+    def run(self, once: bool = False):
+        self.recover()
+        print(f"👀 Watching {self.inbox} → {self.outbox} "
+              f"(entity: {self.options['entity']}, workers: {self.workers}, max in flight: {self.max_in_flight})")
+
+        while True:
+            if not self.stopping:
+                for name in self.settled_files():
+                    if len(self.pool) >= self.max_in_flight:
+                        break
+                    self.claim(name)
+
+            if len(self.pool):
+                for claimed, report in self.pool.poll(self.poll_interval):
+                    self.finish(claimed, report)
+            elif self.stopping or (once and not self._sizes):
+                break
+            else:
+                time.sleep(self.poll_interval)
+
+        self.pool.shutdown(wait=True)
+        print(f"\n🏁 Stopped: {self.totals['ok']} converted, {self.totals['failed']} failed")
+
+def main():
+    parser = argparse.ArgumentParser(description='Watch an inbox directory and convert dropped files to HisabKitab-Pro JSON')
+    parser.add_argument('--inbox', required=True, help='Directory watched for new input files')
+    parser.add_argument('--outbox', required=True, help='Directory for converted backups and reports/')
+    parser.add_argument('--entity', '-e', default='purchases',
+                        choices=['purchases', 'products', 'customers', 'suppliers', 'categories', 'sales'],
+                        help='What the dropped files contain (default: purchases, i.e. purchase registers)')
+    parser.add_argument('--table', help='Table to read from SQLite/SQL dump files (default: the entity name)')
+    parser.add_argument('--sheet', action='append', help='XLSX sheet name or 1-based number (repeatable, or "all")')
+    parser.add_argument('--company-id', type=int, default=1, help='Company ID for imported data')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes (default: CPU count)')
+    parser.add_argument('--max-in-flight', type=int, help='Most files converting or queued at once (default: 2 x workers)')
+    parser.add_argument('--poll', type=float, default=2.0, help='Seconds between inbox scans (default: 2)')
+    parser.add_argument('--once', action='store_true', help='Convert what is in the inbox, then exit')
+    add_cache_arguments(parser)
+    add_profile_arguments(parser)
+
+    args = parser.parse_args()
+
+    options = {'entity': args.entity, 'table': args.table, 'sheets': args.sheet, 'company_id': args.company_id,
+               'cache_dir': None if args.no_cache else args.cache_dir, 'cache_size': args.cache_size,
+               'profile_dir': None if args.no_profile else args.profile_dir,
+               'save_profile': args.save_profile}
+    daemon = InboxDaemon(args.inbox, args.outbox, options, args.workers, args.max_in_flight, args.poll)
+    signal.signal(signal.SIGINT, daemon.request_stop)
+    signal.signal(signal.SIGTERM, daemon.request_stop)
+    daemon.run(once=args.once)
+
+if __name__ == '__main__':
+    main()
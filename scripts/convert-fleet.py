@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Fleet Converter for HisabKitab-Pro Migration
+Converts the sources of many companies listed in a manifest in one process
+pool, largest first, writing each company's backups and reports to its own
+directory; one failing tenant never stops the others
+"""
+
+import os
+import sys
+import argparse
+
+from hisabkitab_migration.cache import add_cache_arguments
+from hisabkitab_migration.profiles import add_profile_arguments
+from hisabkitab_migration.fleet import ENTITIES, load_manifest, print_fleet_report, run_fleet
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert many companies\' sources to HisabKitab-Pro JSON from a manifest')
+    parser.add_argument('--manifest', '-m', required=True,
+                        help='JSON, JSONL or CSV list of tenants: source, company_id, and optionally entity, table, sheet, type, name')
+    parser.add_argument('--outbox', '-o', required=True, help='Output directory (one company_<id>/ per company)')
+    parser.add_argument('--entity', '-e', choices=ENTITIES, default='products',
+                        help='Entity for manifest entries that do not name one (default: products)')
+    parser.add_argument('--table', help='Table for SQLite/SQL dump entries that do not name one (default: the entity name)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes (default: CPU count)')
+    add_cache_arguments(parser)
+    add_profile_arguments(parser)
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.manifest):
+        print(f"❌ Manifest not found: {args.manifest}")
+        sys.exit(1)
+
+    tenants = load_manifest(args.manifest, {'entity': args.entity, 'table': args.table})
+    print(f"📋 {len(tenants)} tenant(s) in {args.manifest}")
+    options = {'cache_dir': None if args.no_cache else args.cache_dir, 'cache_size': args.cache_size,
+               'profile_dir': None if args.no_profile else args.profile_dir,
+               'save_profile': args.save_profile}
+    fleet_report = run_fleet(tenants, args.outbox, args.workers, options)
+    print_fleet_report(fleet_report)
+    print(f"   📁 {os.path.join(args.outbox, 'fleet_report.json')}")
+    if fleet_report['failed']:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
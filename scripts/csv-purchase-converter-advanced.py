@@ -4,285 +4,155 @@ Advanced CSV Purchase Data Converter
 Handles CSV files and array data from various sources
 """
 
-import json
-import csv
+import os
 import sys
+import time
 import argparse
 from datetime import datetime
-from typing import Dict, List, Any, Optional
-from collections import defaultdict
+from typing import Dict
 
-def parse_date(date_str: str) -> str:
-    """Convert various date formats to ISO format"""
-    if not date_str:
-        return datetime.now().strftime("%Y-%m-%dT%H:%M:%S.000Z")
-    
-    date_str = str(date_str).strip()
-    
-    formats = [
-        "%d-%b-%Y",      # 07-Apr-2025
-        "%d/%b/%Y",      # 08/Apr/2025
-        "%d-%B-%Y",      # 07-April-2025
-        "%d/%B/%Y",      # 08/April/2025
-        "%d-%m-%Y",      # 07-04-2025
-        "%d/%m/%Y",      # 07/04/2025
-        "%Y-%m-%d",      # 2025-04-07
-        "%d.%m.%Y",      # 07.04.2025
-        "%d %b %Y",      # 07 Apr 2025
-        "%d %B %Y",      # 07 April 2025
-    ]
-    
-    for fmt in formats:
-        try:
-            dt = datetime.strptime(date_str, fmt)
-            return dt.strftime("%Y-%m-%dT%H:%M:%S.000Z")
-        except:
-            continue
-    
-    print(f"⚠️  Warning: Could not parse date '{date_str}', using current date")
-    return datetime.now().strftime("%Y-%m-%dT%H:%M:%S.000Z")
-
-def clean_string(value: Any) -> str:
-    """Clean and strip string values"""
-    if value is None:
-        return ""
-    return str(value).strip()
-
-def clean_number(value: Any) -> float:
-    """Clean and convert to number"""
-    if value is None:
-        return 0.0
-    try:
-        cleaned = str(value).replace(",", "").replace(" ", "").strip()
-        return float(cleaned)
-    except:
-        return 0.0
-
-def clean_int(value: Any) -> int:
-    """Clean and convert to integer"""
-    if value is None:
-        return 0
-    try:
-        cleaned = str(value).replace(",", "").replace(" ", "").strip()
-        return int(float(cleaned))
-    except:
-        return 0
-
-def find_column_index(headers: List[str], keywords: List[str]) -> Optional[int]:
-    """Find column index by matching keywords"""
-    headers_lower = [h.lower().strip() for h in headers]
-    for keyword in keywords:
-        for i, header in enumerate(headers_lower):
-            if keyword in header:
-                return i
-    return None
-
-def convert_purchase_data(data_rows: List[List[str]], headers: List[str]) -> Dict:
-    """Convert purchase data rows to HisabKitab-Pro format"""
-    
-    # Find column indices
-    supplier_name_idx = find_column_index(headers, ['customer name', 'supplier name', 'vendor name', 'supplier'])
-    gstin_idx = find_column_index(headers, ['gst number', 'gstin', 'gst no', 'gst'])
-    invoice_number_idx = find_column_index(headers, ['bill no', 'invoice no', 'invoice number', 'bill number'])
-    invoice_date_idx = find_column_index(headers, ['bill date', 'invoice date', 'date', 'purchase date'])
-    hsn_code_idx = find_column_index(headers, ['hsn', 'hsn code', 'hsn_code'])
-    description_idx = find_column_index(headers, ['desc', 'description', 'product', 'item'])
-    gst_rate_idx = find_column_index(headers, ['gst%', 'gst rate', 'gst_percent', 'tax rate'])
-    quantity_idx = find_column_index(headers, ['qty', 'quantity', 'qty'])
-    unit_idx = find_column_index(headers, ['unit', 'uom', 'unit of measure'])
-    taxable_amount_idx = find_column_index(headers, ['taxable amt', 'taxable amount', 'subtotal', 'base amount'])
-    sgst_idx = find_column_index(headers, ['sgst'])
-    cgst_idx = find_column_index(headers, ['cgst'])
-    igst_idx = find_column_index(headers, ['igst'])
-    total_amount_idx = find_column_index(headers, ['bill amt', 'total', 'grand total', 'bill amount'])
-    
-    print(f"📊 Column Mapping:")
-    print(f"   Supplier Name: Column {supplier_name_idx}")
-    print(f"   Invoice Number: Column {invoice_number_idx}")
-    print(f"   Invoice Date: Column {invoice_date_idx}")
-    print(f"   Quantity: Column {quantity_idx}")
-    print(f"   Total Amount: Column {total_amount_idx}")
-    
-    # Group purchases by invoice
-    purchases_dict = {}
-    suppliers_dict = {}
-    purchase_id = 1
-    
-    for row_idx, row in enumerate(data_rows, 1):
-        if not row or len(row) < max(filter(None, [
-            supplier_name_idx, invoice_number_idx, invoice_date_idx
-        ]), default=0) + 1:
-            print(f"⚠️  Skipping row {row_idx}: Insufficient columns")
-            continue
-        
-        try:
-            # Extract data
-            supplier_name = clean_string(row[supplier_name_idx]) if supplier_name_idx is not None else ""
-            gstin = clean_string(row[gstin_idx]) if gstin_idx is not None else ""
-            invoice_number = clean_string(row[invoice_number_idx]) if invoice_number_idx is not None else ""
-            invoice_date = parse_date(row[invoice_date_idx]) if invoice_date_idx is not None else datetime.now().strftime("%Y-%m-%dT%H:%M:%S.000Z")
-            
-            # Skip if essential data is missing
-            if not supplier_name or not invoice_number:
-                print(f"⚠️  Skipping row {row_idx}: Missing supplier name or invoice number")
-                continue
-            
-            # Extract item data
-            hsn_code = clean_string(row[hsn_code_idx]) if hsn_code_idx is not None else ""
-            description = clean_string(row[description_idx]) if description_idx is not None else hsn_code or "Unknown Product"
-            gst_rate = clean_number(row[gst_rate_idx]) if gst_rate_idx is not None else 0
-            quantity = clean_int(row[quantity_idx]) if quantity_idx is not None else 0
-            unit = clean_string(row[unit_idx]) if unit_idx is not None else "pcs"
-            taxable_amount = clean_number(row[taxable_amount_idx]) if taxable_amount_idx is not None else 0
-            sgst_amount = clean_number(row[sgst_idx]) if sgst_idx is not None else 0
-            cgst_amount = clean_number(row[cgst_idx]) if cgst_idx is not None else 0
-            igst_amount = clean_number(row[igst_idx]) if igst_idx is not None else 0
-            total_amount = clean_number(row[total_amount_idx]) if total_amount_idx is not None else 0
-            
-            # Create supplier if not exists
-            supplier_key = supplier_name.upper().strip()
-            if supplier_key not in suppliers_dict:
-                supplier_id = len(suppliers_dict) + 1
-                suppliers_dict[supplier_key] = {
-                    "id": supplier_id,
-                    "name": supplier_name.strip(),
-                    "gstin": gstin,
-                    "email": "",
-                    "phone": "",
-                    "address": "",
-                    "city": "",
-                    "state": "",
-                    "pincode": "",
-                    "contact_person": "",
-                    "is_registered": bool(gstin),
-                    "company_id": 1,
-                    "created_at": invoice_date,
-                    "updated_at": invoice_date
-                }
-            
-            supplier_id = suppliers_dict[supplier_key]["id"]
-            
-            # Create purchase key (supplier + invoice + date)
-            purchase_key = f"{supplier_key}_{invoice_number}_{invoice_date[:10]}"
-            
-            if purchase_key not in purchases_dict:
-                purchases_dict[purchase_key] = {
-                    "id": purchase_id,
-                    "type": "gst",
-                    "supplier_id": supplier_id,
-                    "supplier_name": supplier_name.strip(),
-                    "invoice_number": invoice_number,
-                    "purchase_date": invoice_date,
-                    "items": [],
-                    "subtotal": 0,
-                    "total_tax": 0,
-                    "grand_total": 0,
-                    "payment_status": "pending",
-                    "payment_method": "cash",
-                    "notes": "",
-                    "company_id": 1,
-                    "created_by": 1,
-                    "created_at": invoice_date,
-                    "updated_at": invoice_date
-                }
-                purchase_id += 1
-            
-            purchase = purchases_dict[purchase_key]
-            
-            # Calculate unit price
-            unit_price = taxable_amount / quantity if quantity > 0 else 0
-            
-            # Calculate tax rates
-            cgst_rate = (cgst_amount / taxable_amount * 100) if taxable_amount > 0 else 0
-            sgst_rate = (sgst_amount / taxable_amount * 100) if taxable_amount > 0 else 0
-            igst_rate = (igst_amount / taxable_amount * 100) if taxable_amount > 0 else 0
-            
-            # Use provided GST rate or calculate from tax amounts
-            if gst_rate == 0:
-                gst_rate = cgst_rate + sgst_rate + igst_rate
-            
-            # Create purchase item
-            item = {
-                "product_id": None,
-                "product_name": description,
-                "quantity": quantity,
-                "unit_price": unit_price,
-                "purchase_price": unit_price,
-                "hsn_code": hsn_code,
-                "gst_rate": round(gst_rate, 2),
-                "cgst_rate": round(cgst_rate, 2) if cgst_rate > 0 else None,
-                "sgst_rate": round(sgst_rate, 2) if sgst_rate > 0 else None,
-                "igst_rate": round(igst_rate, 2) if igst_rate > 0 else None,
-                "tax_amount": round(cgst_amount + sgst_amount + igst_amount, 2),
-                "total": round(total_amount, 2),
-                "article": "",
-                "barcode": ""
-            }
-            
-            purchase["items"].append(item)
-            purchase["subtotal"] = round(purchase["subtotal"] + taxable_amount, 2)
-            purchase["total_tax"] = round(purchase["total_tax"] + (cgst_amount + sgst_amount + igst_amount), 2)
-            purchase["grand_total"] = round(purchase["grand_total"] + total_amount, 2)
-            
-        except Exception as e:
-            print(f"❌ Error processing row {row_idx}: {e}")
-            print(f"   Row data: {row[:5]}...")
-            continue
-    
-    # Convert to lists
-    suppliers = list(suppliers_dict.values())
-    purchases = list(purchases_dict.values())
-    
-    return {
-        "suppliers": suppliers,
-        "purchases": purchases
-    }
+from hisabkitab_migration.fingerprint_index import FingerprintIndex
+from hisabkitab_migration.cache import add_cache_arguments, open_cache
+from hisabkitab_migration.profiles import add_profile_arguments, open_profiles
+from hisabkitab_migration.sample import add_sample_arguments, preview_purchase_input
+from hisabkitab_migration.purchases import (
+    convert_purchase_data,
+    convert_purchase_files,
+    convert_purchase_tables,
+    create_backup_json,
+    find_input_files,
+    read_csv_file,
+    iter_input_tables,
+    split_into_shards,
+)
+from hisabkitab_migration.rejects import RejectSink, print_rejects, rejects_path
+from hisabkitab_migration.validation import print_validation
+from hisabkitab_migration.writers import write_backup_json
+from hisabkitab_migration.xlsx_reader import is_xlsx
 
-def read_csv_file(file_path: str) -> tuple[List[str], List[List[str]]]:
-    """Read CSV file and return headers and rows"""
-    headers = []
-    rows = []
-    
-    with open(file_path, 'r', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        headers = next(reader, [])
-        rows = list(reader)
-    
-    return headers, rows
+# Purchases listed at the end of a run; the rest are only in the output
+SUMMARY_LIMIT = 20
 
-def create_backup_json(suppliers: List[Dict], purchases: List[Dict], company_id: int = 1) -> Dict:
-    """Create HisabKitab-Pro backup JSON structure"""
+def run_report(result: Dict, started: float) -> Dict:
+    """What a cache hit prints in place of the conversion output"""
     return {
-        "version": "1.0.0",
-        "export_date": datetime.now().strftime("%Y-%m-%dT%H:%M:%S.000Z"),
-        "export_by": "csv_purchase_converter",
-        "data": {
-            "companies": [],
-            "users": [],
-            "products": [],
-            "categories": [],
-            "sales": [],
-            "purchases": purchases,
-            "suppliers": suppliers,
-            "customers": [],
-            "sales_persons": [],
-            "category_commissions": [],
-            "sub_categories": [],
-            "sales_person_category_assignments": [],
-            "stock_adjustments": [],
-            "settings": {}
-        }
+        'suppliers': len(result['suppliers']),
+        'purchases': len(result['purchases']),
+        'seconds': round(time.time() - started, 3),
+        'finished_at': datetime.now().isoformat(timespec='seconds')
     }
 
 def main():
     parser = argparse.ArgumentParser(description='Convert CSV purchase data to HisabKitab-Pro format')
-    parser.add_argument('--input', '-i', help='Input CSV file path')
-    parser.add_argument('--output', '-o', default='purchase_migration.json', help='Output JSON file')
+    parser.add_argument('--input', '-i', help='Input CSV/XLSX file, or a directory / glob pattern of such files for batch mode')
+    parser.add_argument('--sheet', action='append',
+                        help='XLSX sheet name or 1-based number (repeatable, or "all"; default: first sheet)')
+    parser.add_argument('--output', '-o', default='purchase_migration.json', help='Output JSON file (.sqlite/.db: staging database)')
     parser.add_argument('--company-id', type=int, default=1, help='Company ID for imported data')
+    parser.add_argument('--index', help='Fingerprint index file used to skip invoices converted in earlier runs')
+    parser.add_argument('--on-duplicate', choices=['drop', 'flag'], default='drop',
+                        help='What to do with lines already in the index (default: drop)')
+    parser.add_argument('--workers', type=int, help='Worker processes for batch mode (default: CPU count)')
+    parser.add_argument('--shards', action='store_true', help='Batch mode: write one output file per input file')
+    parser.add_argument('--rejects-format', choices=['ndjson', 'csv'], default='ndjson',
+                        help='Format of <output>.rejects.<format>, the rows that were skipped (default: ndjson)')
+    add_cache_arguments(parser)
+    add_profile_arguments(parser)
+    add_sample_arguments(parser)
     
     args = parser.parse_args()
-    
-    if args.input:
+    index = FingerprintIndex(args.index) if args.index else None
+    profiles = open_profiles(args)
+    
+    batch_files = []
+    if args.input and not os.path.isfile(args.input):
+        batch_files = find_input_files(args.input)
+        if not batch_files:
+            print(f"❌ No CSV/XLSX files found for: {args.input}")
+            sys.exit(1)
+    
+    if args.sample:
+        if not args.input:
+            parser.error("--sample needs --input")
+        try:
+            preview_purchase_input(batch_files or [args.input], args)
+        except (ImportError, ValueError) as e:
+            print(f"❌ Error: {e}")
+            sys.exit(1)
+        return
+    
+    # Opening the sink removes the rejects file of an earlier run, cache hit or not
+    rejects = RejectSink(rejects_path(args.output, args.rejects_format))
+    
+    # A fingerprint index makes the output depend on earlier runs, so it bypasses the cache
+    inputs = batch_files or ([args.input] if args.input else [])
+    cache = open_cache(args) if inputs and index is None else None
+    if cache is not None:
+        key = cache.key(inputs, {
+            'converter': 'purchases', 'batch': bool(batch_files), 'sheet': args.sheet, 'company_id': args.company_id,
+            'shards': args.shards and bool(batch_files), 'output_ext': os.path.splitext(args.output)[1].lower(),
+            'rejects_format': args.rejects_format, 'profiles': profiles.version() if profiles else None
+        })
+        report = cache.restore(key, args.output)
+        if report is not None:
+            print(f"⚡ Cache hit: restored the output of the run from {report['finished_at']}")
+            print(f"   📦 Suppliers: {report['suppliers']}")
+            print(f"   📋 Purchases: {report['purchases']}")
+            for output in report['outputs']:
+                print(f"   📁 {output}")
+            return
+    started = time.time()
+    
+    if batch_files:
+        print(f"📂 Batch mode: {len(batch_files)} input files")
+        print("\n🔄 Converting purchase data...")
+        try:
+            result = convert_purchase_files(batch_files, args.workers, index, args.on_duplicate, args.sheet,
+                                            args.company_id, rejects, profiles)
+        except (ImportError, ValueError) as e:
+            print(f"❌ Error: {e}")
+            sys.exit(1)
+        finally:
+            rejects.close()
+        
+        print(f"\n✅ Conversion complete!")
+        print(f"   📦 Suppliers: {len(result['suppliers'])}")
+        print(f"   📋 Purchases: {len(result['purchases'])}")
+        print_validation(result['summaries']['validation'])
+        print_rejects(rejects)
+        
+        outputs = []
+        if args.shards:
+            stem, ext = os.path.splitext(args.output)
+            for shard_no, (file_path, suppliers, purchases) in enumerate(split_into_shards(result), 1):
+                # Global summaries travel with the first shard only
+                summaries = result['summaries'] if shard_no == 1 else None
+                shard_path = f"{stem}_part{shard_no:03d}{ext}"
+                write_backup_json(shard_path, create_backup_json(suppliers, purchases, args.company_id, summaries))
+                outputs.append(shard_path)
+                print(f"   📁 {shard_path} ← {os.path.basename(file_path)} ({len(purchases)} purchases)")
+        else:
+            write_backup_json(args.output, create_backup_json(result['suppliers'], result['purchases'],
+                                                              args.company_id, result['summaries']))
+            outputs.append(args.output)
+            print(f"\n📁 Output saved to: {args.output}")
+        
+        if rejects.written:
+            outputs.append(rejects.path)
+        if cache is not None:
+            cache.store(key, args.output, outputs, run_report(result, started))
+        if index is not None:
+            added = index.add_many(result['fingerprints'], args.input)
+            index.close()
+            print(f"📇 Recorded {added} new fingerprints in: {args.index}")
+        return
+    
+    tables = None
+    if args.input and is_xlsx(args.input):
+        # Stream the workbook's sheets; rows are read as they are converted
+        print(f"📂 Reading XLSX file: {args.input}")
+        tables = iter_input_tables(args.input, args.sheet)
+    elif args.input:
         # Read from CSV file
         print(f"📂 Reading CSV file: {args.input}")
         headers, data_rows = read_csv_file(args.input)
@@ -311,28 +181,51 @@ def main():
     print("\n🔄 Converting purchase data...")
     
     # Convert data
-    result = convert_purchase_data(data_rows, headers)
+    try:
+        if tables is not None:
+            result = convert_purchase_tables(tables, index, args.on_duplicate, args.company_id, rejects, profiles)
+        else:
+            result = convert_purchase_data(data_rows, headers, index, args.on_duplicate, args.company_id, rejects,
+                                           os.path.basename(args.input or ''), profiles)
+    except (ImportError, ValueError) as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+    finally:
+        rejects.close()
     
     print(f"\n✅ Conversion complete!")
     print(f"   📦 Suppliers: {len(result['suppliers'])}")
     print(f"   📋 Purchases: {len(result['purchases'])}")
+    print(f"   📈 Stock levels: {len(result['summaries']['stock_levels'])} products")
+    print(f"   📒 Supplier ledger: {len(result['summaries']['supplier_ledger'])} suppliers")
+    print_validation(result['summaries']['validation'])
+    print_rejects(rejects)
     
     # Create backup JSON
-    backup = create_backup_json(result['suppliers'], result['purchases'], args.company_id)
+    backup = create_backup_json(result['suppliers'], result['purchases'], args.company_id, result['summaries'])
     
     # Save to file
-    with open(args.output, 'w', encoding='utf-8') as f:
-        json.dump(backup, f, indent=2, ensure_ascii=False)
+    write_backup_json(args.output, backup)
     
     print(f"\n📁 Output saved to: {args.output}")
+    
+    if cache is not None:
+        cache.store(key, args.output, [args.output] + ([rejects.path] if rejects.written else []),
+                    run_report(result, started))
+    if index is not None:
+        added = index.add_many(result['fingerprints'], args.input or args.output)
+        index.close()
+        print(f"📇 Recorded {added} new fingerprints in: {args.index}")
     print(f"\n📝 Purchase Summary:")
-    for purchase in result['purchases']:
+    for purchase in result['purchases'][:SUMMARY_LIMIT]:
         print(f"   • {purchase['supplier_name']}")
         print(f"     Invoice: {purchase['invoice_number']}")
         print(f"     Date: {purchase['purchase_date'][:10]}")
         print(f"     Items: {len(purchase['items'])}")
         print(f"     Total: ₹{purchase['grand_total']:,.2f}")
         print()
+    if len(result['purchases']) > SUMMARY_LIMIT:
+        print(f"   ... and {len(result['purchases']) - SUMMARY_LIMIT} more purchases (see {args.output})\n")
     
     print(f"✅ Ready to import into HisabKitab-Pro!")
     print(f"   1. Open Backup & Restore page")
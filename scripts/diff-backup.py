@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Source / Backup Diff for HisabKitab-Pro Migration
+Converts the source again (CSV, XLSX, SQLite, SQL dump or MySQL) and compares
+the result with a backup, converter output or staging file record by record:
+missing, extra and changed records, with the fields that differ
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from typing import Dict, Iterator, Tuple
+
+from hisabkitab_migration.backup_stream import open_reader
+from hisabkitab_migration.diff import DEFAULT_PARTITIONS, NATURAL_KEYS, BackupDiff, has_differences, print_diff
+from hisabkitab_migration.entities import iter_entities
+from hisabkitab_migration.profiles import add_profile_arguments, open_profiles, profiled_rows
+from hisabkitab_migration.purchases import PurchaseAssembler, iter_purchases
+from hisabkitab_migration.rejects import RejectSink, print_rejects
+from hisabkitab_migration.sales import SalesAssembler, iter_sales
+from hisabkitab_migration.sources import SOURCES, read_rows
+
+def iter_source(args, rejects: RejectSink) -> Iterator[Tuple[str, Dict]]:
+    """(entity, record) as the converter produces them; purchases bring their suppliers, sales their customers"""
+    # Mapped by the layout's profile as the converter did; comparing never saves one
+    profiles = open_profiles(args, save_new=False)
+    rows = read_rows(args.input, args.type, table=args.table, entity=args.entity, sheet=args.sheet,
+                     workers=args.workers, host=args.host, port=args.port, user=args.user,
+                     password=args.password, database=args.database, profiles=profiles)
+    if args.entity == 'purchases':
+        assembler = PurchaseAssembler(company_id=args.company_id)
+        for purchase in iter_purchases(rows, assembler=assembler, rejects=rejects, profiles=profiles):
+            yield 'purchases', purchase
+        for supplier in assembler.suppliers_dict.values():
+            yield 'suppliers', supplier
+    elif args.entity == 'sales':
+        assembler = SalesAssembler(args.company_id)
+        for sale in iter_sales(profiled_rows(rows, 'sales', profiles), assembler=assembler):
+            yield 'sales', sale
+        for customer in assembler.customers():
+            yield 'customers', customer
+    else:
+        for record in iter_entities(profiled_rows(rows, args.entity, profiles), args.entity, args.company_id):
+            yield args.entity, record
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare a source with the HisabKitab-Pro backup converted from it')
+    parser.add_argument('backup', help='Backup, converter output or staging file (.gz/.bz2/.xz/.sqlite/.db)')
+    parser.add_argument('--input', '-i', help='Source file (CSV, XLSX, SQL dump or SQLite DB)')
+    parser.add_argument('--type', '-t', choices=list(SOURCES), help='Input source type (default: from the extension)')
+    parser.add_argument('--entity', '-e', required=True, choices=list(NATURAL_KEYS),
+                        help='Entity the source holds (purchases: a purchase register, sales: invoice lines)')
+    parser.add_argument('--table', help='Table name (for SQLite, MySQL or SQL dump)')
+    parser.add_argument('--sheet', action='append', help='XLSX sheet name or 1-based number (repeatable, or "all")')
+    parser.add_argument('--company-id', type=int, default=1, help='Company ID the data was converted with')
+    parser.add_argument('--key', action='append', metavar='ENTITY=FIELD[,FIELD]',
+                        help='Natural key to match records by, e.g. products=barcode (repeatable)')
+    parser.add_argument('--ignore', action='append', default=[], metavar='FIELD',
+                        help='Field not to compare (repeatable; ids, timestamps and references are never compared)')
+    parser.add_argument('--compare-ids', action='store_true',
+                        help='Also compare ids and references (only meaningful for unmerged converter outputs)')
+    parser.add_argument('--report', help='Write every difference to this NDJSON file')
+    parser.add_argument('--partitions', type=int, default=DEFAULT_PARTITIONS,
+                        help=f'Hash partitions spilled to disk; raise for tens of millions of records '
+                             f'(default: {DEFAULT_PARTITIONS})')
+    add_profile_arguments(parser)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Processes parsing byte ranges of a SQL dump in parallel (default: CPU count)')
+    parser.add_argument('--host', default='localhost', help='MySQL host (default: localhost)')
+    parser.add_argument('--port', type=int, default=3306, help='MySQL port (default: 3306)')
+    parser.add_argument('--user', default='root', help='MySQL user (default: root)')
+    parser.add_argument('--password', default=os.environ.get('MYSQL_PWD', ''), help='MySQL password (default: $MYSQL_PWD)')
+    parser.add_argument('--database', help='MySQL database name')
+
+    args = parser.parse_args()
+    if args.type != 'mysql' and not args.input:
+        parser.error("--input is required (except for --type mysql)")
+
+    keys = {}
+    for spec in args.key or []:
+        entity, _, fields = spec.partition('=')
+        if entity not in NATURAL_KEYS or not fields:
+            parser.error(f"--key {spec}: expected ENTITY=FIELD[,FIELD] with ENTITY one of {', '.join(NATURAL_KEYS)}")
+        keys[entity] = [tuple(field.strip() for field in fields.split(','))]
+
+    report = open(args.report, 'w', encoding='utf-8', buffering=1 << 20) if args.report else None
+    on_difference = (lambda entry: report.write(json.dumps(entry, ensure_ascii=False, default=str) + '\n')) \
+        if report else None
+    diff = BackupDiff(keys, args.ignore, args.compare_ids, args.partitions, on_difference)
+    # Rows the converter skips are in neither side; they are summarized, not compared
+    rejects = RejectSink(console_limit=0)
+
+    print(f"🔍 Comparing {args.input or args.database} ({args.entity}) with {args.backup}")
+    started = time.time()
+    try:
+        summary = diff.run(iter_source(args, rejects), open_reader(args.backup))
+    except (ImportError, OSError, ValueError) as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+    finally:
+        if report:
+            report.close()
+
+    print_diff(summary)
+    print_rejects(rejects)
+    if rejects.counts['bad_date'] and summary.get('purchases', {}).get('fields', {}).get('purchase_date'):
+        print("   Unparseable dates are converted with the day of the conversion, so their purchase_date"
+              " differs between runs (--ignore purchase_date to leave them out)")
+    print(f"⏱  {time.time() - started:.1f}s")
+    if report:
+        print(f"📝 Differences written to: {args.report}")
+    if has_differences(summary):
+        print("❌ The backup does not match the source")
+        sys.exit(1)
+    print("✅ The backup matches the source")
+
+if __name__ == '__main__':
+    main()
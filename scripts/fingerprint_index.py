@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Purchase Fingerprint Index Manager
+Rebuilds, resets and counts the persistent index of invoices and invoice
+lines already converted (see hisabkitab_migration.fingerprint_index)
+"""
+
+import argparse
+
+from hisabkitab_migration.fingerprint_index import FingerprintIndex
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the purchase fingerprint index used to skip already-imported invoices')
+    parser.add_argument('--index', required=True, help='Fingerprint index file (SQLite)')
+    parser.add_argument('--rebuild', nargs='+', metavar='BACKUP', help='Add fingerprints from existing backups (JSON, .gz/.bz2/.xz or staging databases)')
+    parser.add_argument('--reset', action='store_true', help='Clear the index before rebuilding')
+
+    args = parser.parse_args()
+
+    index = FingerprintIndex(args.index)
+    try:
+        if args.reset:
+            index.clear()
+            print(f"🧹 Cleared index: {args.index}")
+
+        for backup_path in args.rebuild or []:
+            added = index.rebuild_from_backup(backup_path)
+            print(f"📂 {backup_path}: {added} new fingerprints")
+
+        counts = index.counts()
+        print(f"\n📇 Index: {args.index}")
+        print(f"   Invoices: {counts.get('invoice', 0)}")
+        print(f"   Lines: {counts.get('line', 0)}")
+    finally:
+        index.close()
+
+if __name__ == '__main__':
+    main()
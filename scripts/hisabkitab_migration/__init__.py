@@ -0,0 +1,102 @@
+"""
+HisabKitab-Pro Migration Library
+The conversion logic behind the migration scripts, importable for in-process
+use: rows go in as iterables and converted records come out as iterators
+
+    sys.path.insert(0, 'scripts')  # or vendor the package directory
+    from hisabkitab_migration import read_rows, iter_products, write_backup
+
+    products = iter_products(read_rows('items.csv'))
+    write_backup('products.json.gz', {'products': products}, export_by='ingestion')
+"""
+
+from .backup_stream import BackupReader, BackupWriter, open_reader, open_writer
+from .categories import CategoryTree, remap_products, resolve_categories
+from .diff import BackupDiff, natural_key
+from .entities import (
+    CONVERTERS,
+    FIELD_MAPPINGS,
+    convert_batch,
+    convert_rows,
+    convert_streaming,
+    iter_categories,
+    iter_customers,
+    iter_entities,
+    iter_products,
+    iter_suppliers,
+    stock_level,
+)
+from .profiles import ProfileStore, detect_profile, profiled_rows, schema_fingerprint
+from .purchases import (
+    PurchaseAssembler,
+    convert_purchase_files,
+    convert_purchase_tables,
+    iter_input_tables,
+    iter_purchase_lines,
+    iter_purchases,
+    map_purchase_columns,
+    parse_purchase_file,
+    purchase_columns,
+    read_input_tables,
+)
+from .rejects import RejectSink
+from .sales import SalesAssembler, convert_sales_streaming, iter_sales, map_sale_columns, write_sales_backup
+from .sources import SOURCES, read_rows, register_source, source_available, source_for_path
+from .validation import IssueCounter, check_gstin, check_hsn, check_phone, check_pincode, validate_record
+from .writers import write_backup, write_backup_json
+
+__all__ = [
+    'BackupReader',
+    'BackupWriter',
+    'open_reader',
+    'open_writer',
+    'CategoryTree',
+    'remap_products',
+    'resolve_categories',
+    'BackupDiff',
+    'natural_key',
+    'CONVERTERS',
+    'FIELD_MAPPINGS',
+    'convert_batch',
+    'convert_rows',
+    'convert_streaming',
+    'iter_categories',
+    'iter_customers',
+    'iter_entities',
+    'iter_products',
+    'iter_suppliers',
+    'stock_level',
+    'ProfileStore',
+    'detect_profile',
+    'profiled_rows',
+    'schema_fingerprint',
+    'PurchaseAssembler',
+    'convert_purchase_files',
+    'convert_purchase_tables',
+    'iter_input_tables',
+    'iter_purchase_lines',
+    'iter_purchases',
+    'map_purchase_columns',
+    'parse_purchase_file',
+    'purchase_columns',
+    'read_input_tables',
+    'RejectSink',
+    'SalesAssembler',
+    'convert_sales_streaming',
+    'iter_sales',
+    'map_sale_columns',
+    'write_sales_backup',
+    'SOURCES',
+    'read_rows',
+    'register_source',
+    'source_available',
+    'source_for_path',
+    'IssueCounter',
+    'check_gstin',
+    'check_hsn',
+    'check_phone',
+    'check_pincode',
+    'validate_record',
+    'write_backup',
+    'write_backup_json',
+]
@@ -0,0 +1,327 @@
+"""
+Backup Staging Database
+Converted entities bulk-loaded into an indexed SQLite file: one table per
+entity (the record's JSON plus the columns reconciliation filters and groups
+on), line items in their own tables. A staging file is written wherever a
+converter writes a backup (output named .sqlite/.sqlite3/.db) and read back
+wherever a backup is read, so it also regenerates JSON backups
+"""
+
+import os
+import json
+import time
+import sqlite3
+from datetime import datetime
+from itertools import chain, groupby
+from operator import itemgetter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .backup_stream import DATA_KEYS, open_reader, open_writer
+
+# Records inserted per executemany call
+INSERT_BATCH = 10000
+
+# Columns copied out of each record next to its JSON; every entity also gets id and company_id
+COLUMNS = {
+    'purchases': ('supplier_id', 'supplier_name', 'invoice_number', 'purchase_date', 'type',
+                  'subtotal', 'total_tax', 'grand_total', 'payment_status'),
+    'sales': ('customer_id', 'customer_name', 'sales_person_id', 'invoice_number', 'sale_date',
+              'subtotal', 'tax_amount', 'grand_total', 'return_amount', 'payment_status'),
+    'products': ('name', 'sku', 'barcode', 'category_id', 'hsn_code', 'gst_rate', 'stock_quantity', 'created_at'),
+    'suppliers': ('name', 'gstin'),
+    'customers': ('name', 'phone', 'gstin'),
+    'categories': ('name', 'parent_id'),
+    'stock_adjustments': ('product_id', 'created_at'),
+}
+
+# Entities whose line items get a <entity>_items table, and the item columns kept there
+ITEM_ENTITIES = {'purchases': 'items', 'sales': 'items'}
+ITEM_COLUMNS = ('product_id', 'product_name', 'hsn_code', 'gst_rate', 'quantity', 'tax_amount', 'total', 'sale_type')
+
+# Indexes created after the load: company + date like run_add_performance_indexes.sql, then the
+# supplier / customer / invoice lookups reconciliation needs. Every entity table also gets (id).
+# Amounts are appended so the totals queries are answered from the index without reading records.
+INDEXES = {
+    'purchases': {
+        'company_date': 'company_id, purchase_date DESC, total_tax, grand_total',
+        'company_supplier': 'company_id, supplier_id, invoice_number, subtotal, total_tax, grand_total',
+        'company_invoice': 'company_id, invoice_number',
+    },
+    'sales': {
+        'company_date': 'company_id, sale_date DESC, tax_amount, grand_total, return_amount',
+        'company_customer': 'company_id, customer_id, grand_total',
+        'company_invoice': 'company_id, invoice_number',
+    },
+    'products': {'company_created': 'company_id, created_at DESC'},
+    'stock_adjustments': {'company_created': 'company_id, created_at DESC'},
+    'purchases_items': {'parent': 'parent_seq', 'gst_rate': 'gst_rate, tax_amount, total', 'hsn': 'hsn_code'},
+    'sales_items': {'parent': 'parent_seq', 'product': 'product_id'},
+}
+
+# Ready-made reconciliation queries for the report command
+RECONCILIATION = {
+    'Purchases by supplier': (
+        "SELECT p.company_id, p.supplier_id, s.name AS supplier, p.invoices, p.taxable, p.gst, p.total"
+        " FROM (SELECT company_id, supplier_id, COUNT(*) AS invoices, ROUND(SUM(subtotal), 2) AS taxable,"
+        " ROUND(SUM(total_tax), 2) AS gst, ROUND(SUM(grand_total), 2) AS total"
+        " FROM purchases GROUP BY company_id, supplier_id) p LEFT JOIN suppliers s ON s.id = p.supplier_id"
+        " ORDER BY p.company_id, p.total DESC"
+    ),
+    'Purchase GST by rate': (
+        "SELECT gst_rate, COUNT(*) AS lines, ROUND(SUM(total - tax_amount), 2) AS taxable,"
+        " ROUND(SUM(tax_amount), 2) AS gst, ROUND(SUM(total), 2) AS total"
+        " FROM purchases_items GROUP BY gst_rate ORDER BY gst_rate"
+    ),
+    'Purchases by month': (
+        "SELECT company_id, substr(purchase_date, 1, 7) AS month, COUNT(*) AS invoices,"
+        " ROUND(SUM(total_tax), 2) AS gst, ROUND(SUM(grand_total), 2) AS total"
+        " FROM purchases GROUP BY company_id, month ORDER BY company_id, month"
+    ),
+    'Sales by month': (
+        "SELECT company_id, substr(sale_date, 1, 7) AS month, COUNT(*) AS invoices,"
+        " ROUND(SUM(tax_amount), 2) AS gst, ROUND(SUM(grand_total), 2) AS total,"
+        " ROUND(SUM(return_amount), 2) AS returns"
+        " FROM sales GROUP BY company_id, month ORDER BY company_id, month"
+    ),
+    'Repeated invoice numbers': (
+        "SELECT company_id, supplier_id, invoice_number, COUNT(*) AS purchases"
+        " FROM purchases GROUP BY company_id, supplier_id, invoice_number HAVING COUNT(*) > 1"
+    ),
+}
+
+# Envelope fields every backup has; the rest of the header (summaries, ...) goes back after data
+ENVELOPE_FIELDS = ('version', 'export_date', 'export_by')
+
+_SQLITE_MAGIC = b'SQLite format 3\x00'
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+def _scalar(value: Any) -> Any:
+    """Column value: scalars as they are, nested values as JSON text"""
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
+class StagingWriter:
+    """Loads records into a staging database; same interface as BackupWriter
+
+    The database is built in <path>.tmp inside one transaction with the
+    journal off, indexed and analyzed on close(), then moved into place, so
+    an interrupted run never leaves a half-loaded file at path.
+    """
+
+    def __init__(self, path: str, export_by: str, version: str = '1.0.0', export_date: Optional[str] = None):
+        self.path = path
+        self.tmp_path = path + '.tmp'
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+        # Pipeline converters write from their writer thread, one call at a time
+        self.conn = sqlite3.connect(self.tmp_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = OFF")
+        self.conn.execute("PRAGMA synchronous = OFF")
+        self.conn.execute("CREATE TABLE _envelope (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.execute("CREATE TABLE _objects (name TEXT PRIMARY KEY, value TEXT)")
+        self.conn.execute("CREATE TABLE _entities (name TEXT PRIMARY KEY, position INTEGER, records INTEGER)")
+        self.header = {
+            'version': version,
+            'export_date': export_date or datetime.now().strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            'export_by': export_by,
+        }
+        self.closed = False
+        self._entities: Dict[str, int] = {}
+        self._seq: Dict[str, int] = {}
+        self._objects: Dict[str, Any] = {}
+        self._current: Optional[str] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            if not self.closed:
+                self.close()
+        else:
+            self.abort()
+
+    def _create(self, name: str):
+        columns = ('id', 'company_id') + COLUMNS.get(name, ())
+        self.conn.execute(f"CREATE TABLE {_quote(name)} (seq INTEGER PRIMARY KEY, "
+                          f"{', '.join(columns)}, record TEXT NOT NULL)")
+        if name in ITEM_ENTITIES:
+            self.conn.execute(f"CREATE TABLE {_quote(name + '_items')} (parent_seq INTEGER NOT NULL, parent_id, "
+                              f"{', '.join(ITEM_COLUMNS)})")
+        self._entities[name] = 0
+        self._seq[name] = 0
+
+    def write_entity(self, name: str, records: Iterable[Dict]) -> int:
+        """Load one entity; returns the number of records written"""
+        self.begin_entity(name)
+        self.write_records(records)
+        return self.end_entity()
+
+    def begin_entity(self, name: str):
+        """Start loading an entity; writing the same entity again appends to its table"""
+        if name not in self._entities:
+            self._create(name)
+        self._current = name
+        self._count = 0
+
+    def write_records(self, records: Iterable[Any]):
+        """Load records (dicts, or JSON text already serialized) into the open entity"""
+        name = self._current
+        columns = ('id', 'company_id') + COLUMNS.get(name, ())
+        items_key = ITEM_ENTITIES.get(name)
+        insert = (f"INSERT INTO {_quote(name)} (seq, {', '.join(columns)}, record) "
+                  f"VALUES ({', '.join('?' * (len(columns) + 2))})")
+        insert_items = (f"INSERT INTO {_quote(name + '_items')} (parent_seq, parent_id, {', '.join(ITEM_COLUMNS)}) "
+                        f"VALUES ({', '.join('?' * (len(ITEM_COLUMNS) + 2))})") if items_key else None
+
+        rows: List[Tuple] = []
+        item_rows: List[Tuple] = []
+        seq = self._seq[name]
+        for record in records:
+            if isinstance(record, str):
+                text, record = record, json.loads(record)
+            else:
+                text = json.dumps(record, ensure_ascii=False)
+            seq += 1
+            rows.append((seq,) + tuple(_scalar(record.get(column)) for column in columns) + (text,))
+            items = record.get(items_key) if items_key else None
+            if isinstance(items, list):
+                item_rows.extend((seq, _scalar(record.get('id')))
+                                 + tuple(_scalar(item.get(column)) for column in ITEM_COLUMNS)
+                                 for item in items if isinstance(item, dict))
+            if len(rows) >= INSERT_BATCH:
+                self._insert(insert, rows, insert_items, item_rows)
+                rows, item_rows = [], []
+        self._insert(insert, rows, insert_items, item_rows)
+        self._count += seq - self._seq[name]
+        self._entities[name] += seq - self._seq[name]
+        self._seq[name] = seq
+
+    def _insert(self, insert: str, rows: List[Tuple], insert_items: Optional[str], item_rows: List[Tuple]):
+        if rows:
+            self.conn.executemany(insert, rows)
+        if item_rows:
+            self.conn.executemany(insert_items, item_rows)
+
+    def end_entity(self) -> int:
+        """Finish the open entity; returns the number of records written since begin_entity()"""
+        self._current = None
+        return self._count
+
+    def write_object(self, name: str, value: Any):
+        """Store a non-array data entry such as settings"""
+        self._objects[name] = value
+
+    def _create_indexes(self):
+        for table in list(self._entities) + [name + '_items' for name in ITEM_ENTITIES if name in self._entities]:
+            indexes = dict(INDEXES.get(table, {}))
+            if table in self._entities:
+                indexes['id'] = 'id'
+            for suffix, columns in indexes.items():
+                self.conn.execute(f"CREATE INDEX {_quote(f'idx_{table}_{suffix}')} ON {_quote(table)} ({columns})")
+
+    def close(self, extra: Optional[Dict[str, Any]] = None):
+        """Finish the load: envelope, empty tables for unwritten entities, indexes, then move into place"""
+        for name in DATA_KEYS:
+            if name not in self._entities:
+                self._create(name)
+        self._objects.setdefault('settings', {})
+        header = dict(self.header, **(extra or {}))
+        self.conn.executemany("INSERT INTO _envelope (key, value) VALUES (?, ?)",
+                              [(key, json.dumps(value, ensure_ascii=False)) for key, value in header.items()])
+        self.conn.executemany("INSERT INTO _objects (name, value) VALUES (?, ?)",
+                              [(name, json.dumps(value, ensure_ascii=False)) for name, value in self._objects.items()])
+        self.conn.executemany("INSERT INTO _entities (name, position, records) VALUES (?, ?, ?)",
+                              [(name, position, count) for position, (name, count) in enumerate(self._entities.items())])
+        self._create_indexes()
+        self.conn.execute("ANALYZE")
+        self.conn.commit()
+        self.conn.close()
+        os.replace(self.tmp_path, self.path)
+        self.closed = True
+
+    def abort(self):
+        """Drop a load that failed part way"""
+        self.conn.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+        self.closed = True
+
+class StagingReader:
+    """Reads a staging database back as backup records; same interface as BackupReader
+
+    Iterating yields (entity, record) in the order the entities and records
+    were loaded. `header`, `objects` and `sizes` (characters of record JSON
+    per entity) are filled as with a JSON backup.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.header: Dict[str, Any] = {}
+        self.objects: Dict[str, Any] = {}
+        self.sizes: Dict[str, int] = {}
+        self.offset = 0
+
+    def __iter__(self) -> Iterator[Tuple[str, Dict]]:
+        return self.iter_records()
+
+    def connect(self) -> sqlite3.Connection:
+        with open(self.path, 'rb') as f:
+            if f.read(len(_SQLITE_MAGIC)) != _SQLITE_MAGIC:
+                raise ValueError(f"{self.path}: not a staging database")
+        return sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+
+    def iter_records(self) -> Iterator[Tuple[str, Dict]]:
+        conn = self.connect()
+        try:
+            self.header = {key: json.loads(value) for key, value in conn.execute("SELECT key, value FROM _envelope")}
+            self.objects = {name: json.loads(value) for name, value in conn.execute("SELECT name, value FROM _objects")}
+            for (name,) in conn.execute("SELECT name FROM _entities ORDER BY position").fetchall():
+                self.sizes[name] = 0
+                for (text,) in conn.execute(f"SELECT record FROM {_quote(name)} ORDER BY seq"):
+                    self.sizes[name] += len(text)
+                    self.offset += len(text)
+                    yield name, json.loads(text)
+        except sqlite3.DatabaseError as e:
+            raise ValueError(f"{self.path}: {e}") from e
+        finally:
+            conn.close()
+
+def copy_backup(source: str, output: str) -> Dict[str, int]:
+    """Copy the records, settings and envelope of a backup or staging file into another
+
+    Either side may be a staging database or a (compressed) JSON backup;
+    records keep their order. Returns the records copied per entity.
+    """
+    reader = open_reader(source)
+    records = iter(reader)
+    # The envelope fields come before data, so they are known once the first record is
+    first = next(records, None)
+    header = reader.header
+    counts: Dict[str, int] = {}
+    with open_writer(output, export_by=header.get('export_by', 'staging'), version=header.get('version', '1.0.0'),
+                     export_date=header.get('export_date')) as writer:
+        for entity, group in groupby(chain([first], records) if first else [], key=itemgetter(0)):
+            writer.begin_entity(entity)
+            writer.write_records(record for _, record in group)
+            counts[entity] = counts.get(entity, 0) + writer.end_entity()
+        for name, value in reader.objects.items():
+            writer.write_object(name, value)
+        # summaries come after data in a JSON backup, so the rest of the header is only complete now
+        writer.close({key: value for key, value in reader.header.items() if key not in ENVELOPE_FIELDS})
+    return counts
+
+def run_query(path: str, sql: str, params: Tuple = ()) -> Tuple[List[str], List[Tuple], float]:
+    """Run one query on a staging file; returns (column names, rows, seconds)"""
+    conn = StagingReader(path).connect()
+    try:
+        started = time.perf_counter()
+        cursor = conn.execute(sql, params)
+        rows = cursor.fetchall()
+        elapsed = time.perf_counter() - started
+        return [column[0] for column in cursor.description or ()], rows, elapsed
+    finally:
+        conn.close()
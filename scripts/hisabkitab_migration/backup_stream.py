@@ -0,0 +1,281 @@
+"""
+Streaming Backup Reader/Writer
+Reads and writes HisabKitab-Pro backup JSON one record at a time, so large
+(optionally .gz/.bz2/.xz compressed) backups never have to fit in memory
+"""
+
+import bz2
+import gzip
+import json
+import lzma
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+CHUNK_SIZE = 1 << 20  # 1 MB
+
+# Order of the entity arrays inside "data", as written by the app
+DATA_KEYS = [
+    'companies', 'users', 'products', 'categories', 'sales', 'purchases',
+    'suppliers', 'customers', 'sales_persons', 'category_commissions',
+    'sub_categories', 'sales_person_category_assignments', 'stock_adjustments'
+]
+
+_WHITESPACE = ' \t\n\r'
+
+def open_backup(path: str, mode: str = 'r'):
+    """Open a backup file as text, decompressing by file extension"""
+    lower = path.lower()
+    if lower.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    if lower.endswith('.bz2'):
+        return bz2.open(path, mode + 't', encoding='utf-8')
+    if lower.endswith('.xz'):
+        return lzma.open(path, mode + 't', encoding='utf-8')
+    # Read line endings untranslated, so character counts match the file's bytes (see iter_spans)
+    return open(path, mode, encoding='utf-8', newline='' if mode == 'r' else None)
+
+def is_compressed(path: str) -> bool:
+    return path.lower().endswith(('.gz', '.bz2', '.xz'))
+
+# Outputs with these extensions are SQLite staging databases (see backup_staging), not JSON
+STAGING_EXTENSIONS = ('.sqlite', '.sqlite3', '.db')
+
+def is_staging(path: str) -> bool:
+    return path.lower().endswith(STAGING_EXTENSIONS)
+
+def open_reader(path: str):
+    """BackupReader for a backup, StagingReader for a staging database"""
+    if is_staging(path):
+        from .backup_staging import StagingReader
+        return StagingReader(path)
+    return BackupReader(path)
+
+def open_writer(path: str, export_by: str, version: str = '1.0.0', export_date: Optional[str] = None):
+    """BackupWriter, or a StagingWriter for an output named .sqlite/.sqlite3/.db"""
+    if is_staging(path):
+        from .backup_staging import StagingWriter
+        return StagingWriter(path, export_by, version, export_date)
+    return BackupWriter(path, export_by, version, export_date)
+
+class BackupReader:
+    """Incremental parser for the backup envelope
+
+    Iterating yields (entity, record) for every element of every array in
+    "data". Top-level fields (version, export_date, summaries, ...) are
+    collected in `header`, non-array data entries (settings) in `objects`,
+    and the size of each entity array (characters of JSON text) in `sizes`.
+    """
+
+    def __init__(self, path: str, chunk_size: int = CHUNK_SIZE):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.header: Dict[str, Any] = {}
+        self.objects: Dict[str, Any] = {}
+        self.sizes: Dict[str, int] = {}
+        self._decoder = json.JSONDecoder()
+        self._track_bytes = False
+
+    def __iter__(self) -> Iterator[Tuple[str, Dict]]:
+        return self.iter_records()
+
+    @property
+    def offset(self) -> int:
+        """Characters of JSON text consumed so far"""
+        return self._base + self._pos
+
+    def iter_spans(self) -> Iterator[Tuple[str, Dict, int, int]]:
+        """Yield (entity, record, byte offset, byte length) for every record of an uncompressed backup"""
+        if is_compressed(self.path):
+            raise ValueError(f"{self.path}: byte offsets need an uncompressed backup; decompress it first")
+        self._track_bytes = True
+        for entity, record in self.iter_records():
+            start = self._byte_offset(self._record_start)
+            yield entity, record, start, self._byte_offset(self.offset) - start
+
+    def _byte_offset(self, char_offset: int) -> int:
+        """Byte offset of a character offset at or after the last one asked for, still in the buffer"""
+        if char_offset > self._cursor_char:
+            self._cursor_byte += len(self._buf[self._cursor_char - self._base:char_offset - self._base].encode('utf-8'))
+            self._cursor_char = char_offset
+        return self._cursor_byte
+
+    def iter_records(self) -> Iterator[Tuple[str, Dict]]:
+        with open_backup(self.path) as f:
+            self._file = f
+            self._buf = ''
+            self._pos = 0
+            self._base = 0
+            self._eof = False
+            self._cursor_char = self._cursor_byte = 0
+            self._record_start = 0
+
+            self._expect('{')
+            for key in self._iter_keys():
+                if key != 'data':
+                    self.header[key] = self._decode()
+                    continue
+                self._expect('{')
+                for entity in self._iter_keys():
+                    if self._peek() != '[':
+                        self.objects[entity] = self._decode()
+                        continue
+                    start = self.offset
+                    self._pos += 1
+                    for record in self._iter_array():
+                        yield entity, record
+                    self.sizes[entity] = self.sizes.get(entity, 0) + self.offset - start
+
+    def _fill(self) -> bool:
+        """Read more text into the buffer, dropping what was already consumed"""
+        if self._eof:
+            return False
+        if self._track_bytes:
+            self._byte_offset(self._base + self._pos)
+        self._buf = self._buf[self._pos:]
+        self._base += self._pos
+        self._pos = 0
+        chunk = self._file.read(max(self.chunk_size, len(self._buf)))
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf += chunk
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                raise ValueError(f"{self.path}: unexpected end of file")
+
+    def _expect(self, char: str):
+        found = self._peek()
+        if found != char:
+            raise ValueError(f"{self.path}: expected '{char}' but found '{found}'")
+        self._pos += 1
+
+    def _decode(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+                # A value ending exactly at the buffer end may be truncated (e.g. a number)
+                if end < len(self._buf) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill()
+
+    def _iter_keys(self) -> Iterator[str]:
+        """Iterate keys of an object whose '{' was consumed; the caller consumes each value"""
+        if self._peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self._decode()
+            self._expect(':')
+            yield key
+            sep = self._peek()
+            self._pos += 1
+            if sep == '}':
+                return
+            if sep != ',':
+                raise ValueError(f"{self.path}: expected ',' or '}}' but found '{sep}'")
+
+    def _iter_array(self) -> Iterator[Any]:
+        """Iterate values of an array whose '[' was consumed"""
+        if self._peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            self._peek()
+            self._record_start = self.offset
+            yield self._decode()
+            sep = self._peek()
+            self._pos += 1
+            if sep == ']':
+                return
+            if sep != ',':
+                raise ValueError(f"{self.path}: expected ',' or ']' but found '{sep}'")
+
+def iter_backup_records(path: str) -> Iterator[Tuple[str, Dict]]:
+    """Yield (entity, record) pairs from a backup file"""
+    return BackupReader(path).iter_records()
+
+class BackupWriter:
+    """Writes the backup envelope incrementally, one record per line
+
+    Entities are written with write_entity() in any order; entities from
+    DATA_KEYS that were never written are emitted as empty arrays on close().
+    """
+
+    def __init__(self, path: str, export_by: str, version: str = '1.0.0', export_date: Optional[str] = None):
+        self.path = path
+        self._file = open_backup(path, 'w')
+        self._written = set()
+        self._file.write('{\n')
+        self._file.write(f'  "version": {json.dumps(version)},\n')
+        self._file.write(f'  "export_date": {json.dumps(export_date or datetime.now().strftime("%Y-%m-%dT%H:%M:%S.000Z"))},\n')
+        self._file.write(f'  "export_by": {json.dumps(export_by)},\n')
+        self._file.write('  "data": {')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            if not self._file.closed:
+                self.close()
+        else:
+            self._file.close()
+
+    def _key(self, name: str):
+        self._file.write(',\n' if self._written else '\n')
+        self._file.write(f'    {json.dumps(name)}: ')
+        self._written.add(name)
+
+    def write_entity(self, name: str, records: Iterable[Dict]) -> int:
+        """Write one entity array; returns the number of records written"""
+        self.begin_entity(name)
+        self.write_records(records)
+        return self.end_entity()
+
+    def begin_entity(self, name: str):
+        """Open an entity array to be filled by write_records() calls"""
+        self._key(name)
+        self._file.write('[')
+        self._count = 0
+
+    def write_records(self, records: Iterable[Any]):
+        """Append records (dicts, or JSON text already serialized) to the open entity array"""
+        for record in records:
+            self._file.write(',\n      ' if self._count else '\n      ')
+            self._file.write(record if isinstance(record, str) else json.dumps(record, ensure_ascii=False))
+            self._count += 1
+
+    def end_entity(self) -> int:
+        """Close the open entity array; returns the number of records written"""
+        self._file.write('\n    ]' if self._count else ']')
+        return self._count
+
+    def write_object(self, name: str, value: Any):
+        """Write a non-array data entry such as settings"""
+        self._key(name)
+        self._file.write(json.dumps(value, ensure_ascii=False))
+
+    def close(self, extra: Optional[Dict[str, Any]] = None):
+        """Finish the envelope; extra top-level keys (e.g. summaries) go after data"""
+        for name in DATA_KEYS:
+            if name not in self._written:
+                self.write_entity(name, [])
+        if 'settings' not in self._written:
+            self.write_object('settings', {})
+        self._file.write('\n  }')
+        for key, value in (extra or {}).items():
+            self._file.write(f',\n  {json.dumps(key)}: {json.dumps(value, ensure_ascii=False)}')
+        self._file.write('\n}\n')
+        self._file.close()
@@ -0,0 +1,203 @@
+"""
+Conversion Result Cache
+Content-addressed store of finished conversions: the key hashes the input
+bytes, the options that shape the output and the converter code, so a re-run
+of the same file with the same options restores the output instead of
+converting again
+"""
+
+import os
+import glob
+import gzip
+import json
+import shutil
+import sqlite3
+import hashlib
+from datetime import datetime
+from typing import Dict, List, Optional
+
+CHUNK_SIZE = 1 << 20  # 1 MB
+
+DEFAULT_CACHE_DIR = os.environ.get('HK_CACHE_DIR') or os.path.join(
+    os.path.expanduser('~'), '.cache', 'hisabkitab-migration')
+DEFAULT_MAX_MB = 2048
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Outputs that are already compressed are stored as they are
+_COMPRESSED = ('.gz', '.bz2', '.xz')
+
+_code_version = None
+
+def code_version() -> str:
+    """Hash of the converter source, so any code change invalidates old entries"""
+    global _code_version
+    if _code_version is None:
+        digest = hashlib.sha256()
+        for path in sorted(glob.glob(os.path.join(_PACKAGE_DIR, '*.py'))):
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        _code_version = digest.hexdigest()
+    return _code_version
+
+def output_role(main_output: str, path: str) -> str:
+    """Where path sits relative to the main output, e.g. '_part002.json' for a shard"""
+    stem = os.path.splitext(main_output)[0]
+    if not path.startswith(stem):
+        raise ValueError(f"output {path} is not named after {main_output}")
+    return path[len(stem):]
+
+class ResultCache:
+    """Directory of cached outputs with an SQLite index, evicted least-recently-used past max_bytes
+
+    Each entry is <key>/ holding the gzip-compressed output files and the
+    run report. Input hashes are remembered by (path, size, mtime), so an
+    unchanged file is not re-read to find its key.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_mb: int = DEFAULT_MAX_MB):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_mb * 1024 * 1024
+        os.makedirs(cache_dir, exist_ok=True)
+        # Several daemon workers may share one cache
+        self.conn = sqlite3.connect(os.path.join(cache_dir, 'index.db'), timeout=30)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " files TEXT NOT NULL,"
+            " report TEXT NOT NULL,"
+            " created_at TEXT,"
+            " last_used REAL NOT NULL"
+            ")"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS input_hashes ("
+            " path TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " sha256 TEXT NOT NULL"
+            ")"
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def file_hash(self, path: str) -> str:
+        """SHA-256 of a file's content, reused while its size and mtime are unchanged"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        row = self.conn.execute("SELECT size, mtime_ns, sha256 FROM input_hashes WHERE path = ?", (path,)).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        self.conn.execute("INSERT OR REPLACE INTO input_hashes (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+                          (path, stat.st_size, stat.st_mtime_ns, digest.hexdigest()))
+        self.conn.commit()
+        return digest.hexdigest()
+
+    def key(self, input_paths: List[str], options: Dict) -> str:
+        """Cache key for converting these inputs (in this order) with these options"""
+        parts = {
+            'inputs': [self.file_hash(path) for path in input_paths],
+            'options': options,
+            'code': code_version(),
+        }
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def restore(self, key: str, main_output: str) -> Optional[Dict]:
+        """Write a cached result's files next to main_output; returns its report, or None on a miss"""
+        row = self.conn.execute("SELECT files, report FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        entry_dir = self._entry_dir(key)
+        files = json.loads(row[0])
+        if not all(os.path.exists(os.path.join(entry_dir, stored)) for stored in files.values()):
+            self._delete(key)
+            return None
+
+        stem = os.path.splitext(main_output)[0]
+        outputs = []
+        for role, stored in files.items():
+            destination = stem + role
+            if stored.endswith('.raw'):
+                shutil.copyfile(os.path.join(entry_dir, stored), destination)
+            else:
+                with gzip.open(os.path.join(entry_dir, stored), 'rb') as src, open(destination, 'wb') as dst:
+                    shutil.copyfileobj(src, dst, CHUNK_SIZE)
+            outputs.append(destination)
+
+        self.conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (datetime.now().timestamp(), key))
+        self.conn.commit()
+        report = json.loads(row[1])
+        report['outputs'] = outputs
+        return report
+
+    def store(self, key: str, main_output: str, output_paths: List[str], report: Dict):
+        """Add a finished conversion (its output files and report), then evict past the size limit"""
+        entry_dir = self._entry_dir(key)
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.makedirs(entry_dir)
+
+        files = {}
+        size = 0
+        for number, path in enumerate(output_paths):
+            if path.lower().endswith(_COMPRESSED):
+                stored = f"{number:04d}.raw"
+                shutil.copyfile(path, os.path.join(entry_dir, stored))
+            else:
+                stored = f"{number:04d}.gz"
+                with open(path, 'rb') as src, gzip.open(os.path.join(entry_dir, stored), 'wb', compresslevel=6) as dst:
+                    shutil.copyfileobj(src, dst, CHUNK_SIZE)
+            files[output_role(main_output, path)] = stored
+            size += os.path.getsize(os.path.join(entry_dir, stored))
+
+        now = datetime.now()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO entries (key, size, files, report, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, size, json.dumps(files), json.dumps(report, ensure_ascii=False, default=str),
+             now.isoformat(), now.timestamp())
+        )
+        self.conn.commit()
+        self.evict()
+
+    def _delete(self, key: str):
+        shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+        self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        self.conn.commit()
+
+    def evict(self) -> int:
+        """Drop least-recently-used entries until the cache fits in max_bytes; returns how many went"""
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        evicted = 0
+        for key, size in self.conn.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._delete(key)
+            total -= size
+            evicted += 1
+        return evicted
+
+    def stats(self) -> Dict:
+        count, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {'entries': count, 'bytes': size, 'max_bytes': self.max_bytes}
+
+def add_cache_arguments(parser):
+    """The --no-cache / --cache-dir / --cache-size options shared by the converter CLIs"""
+    parser.add_argument('--no-cache', action='store_true', help='Always convert; neither use nor fill the result cache')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help='Result cache directory (default: $HK_CACHE_DIR or ~/.cache/hisabkitab-migration)')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_MAX_MB,
+                        help=f'Result cache size limit in MB, least recently used entries go first (default: {DEFAULT_MAX_MB})')
+
+def open_cache(args) -> Optional[ResultCache]:
+    """The cache selected by the CLI options, or None with --no-cache"""
+    return None if args.no_cache else ResultCache(args.cache_dir, args.cache_size)
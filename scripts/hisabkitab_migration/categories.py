@@ -0,0 +1,162 @@
+"""
+Category Hierarchy
+Resolves parent_id links between categories in linear time: an id index and
+child lists are built in one pass each, orphans (parent not in the data) and
+cycles are cut loose as top-level categories, and the tree is emitted parents
+first. The app has two levels, category and subcategory, so deeper
+categories are merged into their subcategory and products re-pointed there.
+"""
+
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+# Category + subcategory, as the app shows them
+LEVELS = 2
+
+# Example ids kept per problem
+EXAMPLES = 5
+
+class CategoryTree:
+    """Categories indexed by id with their children, resolved into import order
+
+    resolve() fills `ordered` (every kept category, each parent before its
+    children, subtrees together), `remap` (merged category id -> the id that
+    replaces it) and `report`. Records are updated in place: parent_id and
+    is_subcategory match where they ended up.
+    """
+
+    def __init__(self, categories: Iterable[Dict], levels: int = LEVELS):
+        self.levels = levels
+        self.by_id: Dict[Any, Dict] = {}
+        self.records: List[Dict] = []
+        self.ordered: List[Dict] = []
+        self.remap: Dict[Any, Any] = {}
+        self.problems: Dict[str, List] = {'duplicate_id': [], 'orphan': [], 'cycle': [], 'merged': []}
+        self.counts: Dict[str, int] = defaultdict(int)
+        for category in categories:
+            category_id = category.get('id')
+            if category_id is not None and category_id in self.by_id:
+                self._problem('duplicate_id', category_id)
+                continue
+            if category_id is not None:
+                self.by_id[category_id] = category
+            self.records.append(category)
+
+    def _problem(self, kind: str, category_id: Any):
+        self.counts[kind] += 1
+        if len(self.problems[kind]) < EXAMPLES:
+            self.problems[kind].append(category_id)
+
+    def resolve(self) -> 'CategoryTree':
+        children: Dict[Any, List[Dict]] = defaultdict(list)
+        parents: Dict[int, Any] = {}
+        roots: List[Dict] = []
+        for category in self.records:
+            parent_id = category.get('parent_id')
+            if parent_id is None or parent_id == '':
+                roots.append(category)
+            elif parent_id not in self.by_id:
+                self._problem('orphan', category.get('id'))
+                roots.append(category)
+            else:
+                children[parent_id].append(category)
+                parents[id(category)] = parent_id
+
+        visited = set()
+        for root in roots:
+            self._emit(root, children, visited)
+
+        # Whatever was not reached hangs off a cycle: walk up from it until the walk meets itself,
+        # cut the cycle there and emit the subtree below the cut
+        for category in self.records:
+            if id(category) in visited:
+                continue
+            walk = set()
+            node = category
+            while id(node) not in walk:
+                walk.add(id(node))
+                node = self.by_id[parents[id(node)]]
+            self._problem('cycle', node.get('id'))
+            children[parents.pop(id(node))].remove(node)
+            self._emit(node, children, visited)
+        return self
+
+    def _emit(self, root: Dict, children: Dict[Any, List[Dict]], visited: set):
+        """Depth-first from root: keep the first `levels` levels, merge deeper ones into their last kept ancestor"""
+        stack = [(root, 0, None)]
+        while stack:
+            category, depth, kept_ancestor = stack.pop()
+            visited.add(id(category))
+            category_id = category.get('id')
+            if depth < self.levels:
+                category['parent_id'] = kept_ancestor if depth else None
+                category['is_subcategory'] = depth > 0
+                self.ordered.append(category)
+                kept = category_id
+            else:
+                self._problem('merged', category_id)
+                self.remap[category_id] = kept_ancestor
+                kept = kept_ancestor
+            # Reversed so siblings come out in input order
+            for child in reversed(children.get(category_id, ())):
+                stack.append((child, depth + 1, kept))
+
+    @property
+    def sub_categories(self) -> List[Dict]:
+        """What the app exports as sub_categories: the categories that are subcategories"""
+        return [category for category in self.ordered if category['is_subcategory']]
+
+    def category_for(self, category_id: Any) -> Any:
+        """Where a product's category_id points after resolving: itself, the category it was merged into,
+        or None if no such category exists"""
+        if category_id is None or category_id == '':
+            return None
+        if category_id in self.remap:
+            return self.remap[category_id]
+        return category_id if category_id in self.by_id else None
+
+    def report(self) -> Dict:
+        return {
+            'categories': len(self.ordered),
+            'top_level': len(self.ordered) - sum(1 for category in self.ordered if category['is_subcategory']),
+            'subcategories': sum(1 for category in self.ordered if category['is_subcategory']),
+            'problems': {kind: {'count': self.counts[kind], 'examples': examples}
+                         for kind, examples in self.problems.items() if self.counts[kind]},
+        }
+
+def resolve_categories(categories: Iterable[Dict], levels: int = LEVELS) -> CategoryTree:
+    """Index, check and order categories; see CategoryTree"""
+    return CategoryTree(categories, levels).resolve()
+
+def remap_products(products: Iterable[Dict], tree: CategoryTree, counts: Dict[str, int]) -> Iterator[Dict]:
+    """Point products at their category after resolve(); counts gets 'remapped' and 'unknown_category'"""
+    for product in products:
+        category_id = product.get('category_id')
+        if category_id is not None and category_id != '':
+            resolved = tree.category_for(category_id)
+            if resolved is None:
+                counts['unknown_category'] = counts.get('unknown_category', 0) + 1
+            elif resolved != category_id:
+                counts['remapped'] = counts.get('remapped', 0) + 1
+            product['category_id'] = resolved
+        yield product
+
+# What each problem means for the import
+PROBLEMS = {
+    'duplicate_id': 'repeated id, later ones dropped',
+    'orphan': 'parent not found, made top-level',
+    'cycle': 'parent chain loops, cut here and made top-level',
+    'merged': f'deeper than {LEVELS} levels, merged into its subcategory',
+}
+
+def print_hierarchy(report: Optional[Dict], products: Optional[Dict[str, int]] = None):
+    if not report:
+        return
+    print(f"🌳 Categories: {report['top_level']} top-level, {report['subcategories']} subcategories")
+    for kind, problem in report['problems'].items():
+        examples = ', '.join(map(str, problem['examples']))
+        print(f"   ⚠️  {problem['count']} {PROBLEMS.get(kind, kind)} (e.g. id {examples})")
+    if products and products.get('remapped'):
+        print(f"   🔗 {products['remapped']} product(s) moved to the category theirs was merged into")
+    if products and products.get('unknown_category'):
+        print(f"   ⚠️  {products['unknown_category']} product(s) pointed at a missing category; category cleared")
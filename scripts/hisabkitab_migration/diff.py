@@ -0,0 +1,292 @@
+"""
+Source / Backup Diff
+Compares the records a source converts to with the records in a backup,
+matched by natural key (SKU, GSTIN, supplier + invoice number, ...). Both
+sides are streamed once into hash partitions on disk as canonical JSON with
+a digest; each partition is then compared on its own, so the run is linear
+in the number of records and memory is bounded by the largest partition
+"""
+
+import os
+import json
+import zlib
+import hashlib
+import tempfile
+from collections import Counter, deque
+from itertools import chain
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Natural keys per entity: alternatives tried in order, the first with every field non-empty is used
+NATURAL_KEYS = {
+    'products': [('sku',), ('barcode',), ('name',)],
+    'suppliers': [('gstin',), ('name',)],
+    'customers': [('gstin',), ('phone',), ('name',)],
+    'categories': [('name',)],
+    'purchases': [('supplier_name', 'invoice_number')],
+    'sales': [('invoice_number', 'sale_date')],
+}
+
+# Key fields compared by day only
+DATE_KEY_FIELDS = {'purchase_date', 'sale_date'}
+
+# Fields that differ between any two conversions (ids, timestamps, validation notes),
+# and references, which merges and imports renumber
+IGNORED_FIELDS = {'id', 'created_at', 'updated_at', 'created_by', 'issues'}
+REFERENCE_FIELDS = {'supplier_id', 'customer_id', 'category_id', 'parent_id', 'product_id', 'sales_person_id'}
+
+DEFAULT_PARTITIONS = 64
+
+# Example keys kept per entity and kind of difference
+EXAMPLES = 5
+
+def canonical(value: Any, ignored: frozenset = frozenset()) -> Any:
+    """Value with formatting differences removed: '' is None, 1.0 is 1, floats to 4 places, strings stripped
+
+    Dict entries that are None after this are dropped, so a field that is
+    missing and one that is empty compare equal.
+    """
+    kind = type(value)
+    if kind is str:
+        return value.strip() or None
+    if kind is dict:
+        result = {}
+        for field, item in value.items():
+            if field not in ignored:
+                item = canonical(item, ignored)
+                if item is not None:
+                    result[field] = item
+        return result
+    if value is None or kind is bool or kind is int:
+        return value
+    if kind is float:
+        return int(value) if value.is_integer() else round(value, 4)
+    if kind is list:
+        return [canonical(item, ignored) for item in value]
+    return str(value)
+
+def natural_key(entity: str, record: Dict, key_fields: Optional[List[Tuple[str, ...]]] = None) -> Optional[str]:
+    """e.g. 'gstin=09ABPPA6876Q1ZN' or 'supplier_name=v p traders|invoice_number=vpt/25-26/11'; None if no key applies"""
+    for fields in key_fields or NATURAL_KEYS.get(entity, [('id',)]):
+        parts = []
+        for field in fields:
+            value = record.get(field)
+            if value is None or value == '':
+                break
+            value = str(value).strip().casefold()
+            parts.append(f"{field}={value[:10] if field in DATE_KEY_FIELDS else value}")
+        else:
+            return '|'.join(parts)
+    return None
+
+def field_deltas(source: Any, backup: Any, path: str = '') -> Iterator[Tuple[str, Any, Any]]:
+    """(field path, source value, backup value) for every difference, e.g. ('items[2].quantity', 5, 4)"""
+    if isinstance(source, dict) and isinstance(backup, dict):
+        for field in list(source) + [field for field in backup if field not in source]:
+            if source.get(field) != backup.get(field):
+                yield from field_deltas(source.get(field), backup.get(field), f"{path}.{field}" if path else field)
+    elif isinstance(source, list) and isinstance(backup, list) and len(source) == len(backup):
+        for index, (a, b) in enumerate(zip(source, backup)):
+            if a != b:
+                yield from field_deltas(a, b, f"{path}[{index}]")
+    else:
+        yield path, source, backup
+
+def _field_name(path: str) -> str:
+    """Field path without list indexes, for counting: items[2].quantity -> items[].quantity"""
+    name, depth = [], 0
+    for char in path:
+        if char == '[':
+            depth += 1
+            name.append('[]')
+        elif char == ']':
+            depth -= 1
+        elif not depth:
+            name.append(char)
+    return ''.join(name)
+
+class EntityDiff:
+    """Counts and examples of one entity's differences"""
+
+    def __init__(self):
+        self.source = 0
+        self.backup = 0
+        self.identical = 0
+        self.missing = 0
+        self.extra = 0
+        self.changed = 0
+        self.duplicates = Counter()
+        self.no_key = Counter()
+        self.fields = Counter()
+        self.examples: Dict[str, List] = {'missing': [], 'extra': [], 'changed': []}
+
+    def example(self, kind: str, value: Any):
+        if len(self.examples[kind]) < EXAMPLES:
+            self.examples[kind].append(value)
+
+    def to_dict(self) -> Dict:
+        return {
+            'source': self.source, 'backup': self.backup, 'identical': self.identical, 'missing': self.missing,
+            'extra': self.extra, 'changed': self.changed, 'duplicates': dict(self.duplicates),
+            'no_key': dict(self.no_key), 'fields': dict(self.fields.most_common()), 'examples': self.examples,
+        }
+
+class _Partitions:
+    """One side's records spilled to partition files as lines of: digest, tab, [entity, key], tab, canonical JSON"""
+
+    def __init__(self, directory: str, side: str, count: int):
+        self.paths = [os.path.join(directory, f"{side}_{index:03d}.tsv") for index in range(count)]
+        self._files = [open(path, 'wb', buffering=1 << 16) for path in self.paths]
+
+    def add(self, entity: str, key: str, record: Dict):
+        text = json.dumps(record, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+        digest = hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+        entity_key = json.dumps([entity, key], ensure_ascii=False)
+        line = f"{digest}\t{entity_key}\t{text}\n".encode('utf-8')
+        self._files[zlib.crc32(entity_key.encode('utf-8')) % len(self._files)].write(line)
+
+    def close(self):
+        for f in self._files:
+            f.close()
+
+def _read_partition(path: str) -> Iterator[Tuple[int, str, str, bytes]]:
+    """(line offset, digest, entity key JSON, canonical JSON bytes) per line"""
+    offset = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            digest, entity_key, text = line.rstrip(b'\n').split(b'\t', 2)
+            yield offset, digest.decode(), entity_key.decode('utf-8'), text
+            offset += len(line)
+
+class BackupDiff:
+    """Streams the expected (source) and actual (backup) records, then compares them partition by partition
+
+    Backup records are compared on the fields the source records have, so
+    fields the app adds on export do not count as changes. Differences are
+    passed to on_difference(entry) as they are found, e.g. to write a report.
+    """
+
+    def __init__(self, keys: Optional[Dict[str, List[Tuple[str, ...]]]] = None, ignored: Iterable[str] = (),
+                 compare_ids: bool = False, partitions: int = DEFAULT_PARTITIONS, on_difference=None):
+        self.keys = dict(NATURAL_KEYS, **(keys or {}))
+        self.ignored = frozenset(IGNORED_FIELDS | set(ignored) | (set() if compare_ids else REFERENCE_FIELDS))
+        if compare_ids:
+            self.ignored -= {'id'}
+        self.partitions = partitions
+        self.on_difference = on_difference or (lambda entry: None)
+        self.entities: Dict[str, EntityDiff] = {}
+        # Top-level fields the source records of each entity have
+        self.fields: Dict[str, set] = {}
+
+    def _entity(self, entity: str) -> EntityDiff:
+        if entity not in self.entities:
+            self.entities[entity] = EntityDiff()
+        return self.entities[entity]
+
+    def _spill(self, side: str, records: Iterable[Tuple[str, Dict]], spill: _Partitions):
+        for entity, record in records:
+            if side == 'backup' and entity not in self.fields:
+                continue
+            stats = self._entity(entity)
+            setattr(stats, side, getattr(stats, side) + 1)
+            key = natural_key(entity, record, self.keys.get(entity))
+            if key is None:
+                stats.no_key[side] += 1
+                continue
+            record = canonical(record, self.ignored)
+            if side == 'source':
+                self.fields.setdefault(entity, set()).update(record)
+            else:
+                fields = self.fields[entity]
+                record = {field: value for field, value in record.items() if field in fields}
+            spill.add(entity, key, record)
+
+    def run(self, source: Iterable[Tuple[str, Dict]], backup: Iterable[Tuple[str, Dict]]) -> Dict[str, Dict]:
+        """Compare (entity, record) streams; only entities the source has are read from the backup"""
+        with tempfile.TemporaryDirectory(prefix='hk_diff_') as spool_dir:
+            for side, records in (('source', source), ('backup', backup)):
+                spill = _Partitions(spool_dir, side, self.partitions)
+                try:
+                    self._spill(side, records, spill)
+                finally:
+                    spill.close()
+            for index in range(self.partitions):
+                self._compare(os.path.join(spool_dir, f"source_{index:03d}.tsv"),
+                              os.path.join(spool_dir, f"backup_{index:03d}.tsv"))
+        return {entity: stats.to_dict() for entity, stats in self.entities.items()}
+
+    def _compare(self, source_path: str, backup_path: str):
+        # entity key -> (digest, offset of its line); the records themselves stay on disk.
+        # Records sharing a key are matched in order: the second in the source with the second in the backup.
+        expected: Dict[str, Tuple[str, int]] = {}
+        repeated: Dict[str, deque] = {}
+        for offset, digest, entity_key, _ in _read_partition(source_path):
+            if entity_key in expected or entity_key in repeated:
+                repeated.setdefault(entity_key, deque()).append((digest, offset))
+                self.entities[json.loads(entity_key)[0]].duplicates['source'] += 1
+            else:
+                expected[entity_key] = (digest, offset)
+
+        seen = set()
+        with open(source_path, 'rb') as source_file:
+            def source_record(offset: int) -> Dict:
+                source_file.seek(offset)
+                return json.loads(source_file.readline().split(b'\t', 2)[2])
+
+            for _, digest, entity_key, text in _read_partition(backup_path):
+                entity, key = json.loads(entity_key)
+                stats = self.entities[entity]
+                if entity_key in seen:
+                    stats.duplicates['backup'] += 1
+                    found = repeated[entity_key].popleft() if repeated.get(entity_key) else None
+                else:
+                    seen.add(entity_key)
+                    found = expected.pop(entity_key, None)
+                if found is None:
+                    stats.extra += 1
+                    stats.example('extra', key)
+                    self.on_difference({'entity': entity, 'key': key, 'status': 'extra', 'backup': json.loads(text)})
+                elif found[0] == digest:
+                    stats.identical += 1
+                else:
+                    deltas = list(field_deltas(source_record(found[1]), json.loads(text)))
+                    stats.changed += 1
+                    stats.fields.update({_field_name(path) for path, _, _ in deltas})
+                    stats.example('changed', {'key': key, 'deltas': deltas[:EXAMPLES]})
+                    self.on_difference({'entity': entity, 'key': key, 'status': 'changed',
+                                        'deltas': [{'field': path, 'source': a, 'backup': b} for path, a, b in deltas]})
+
+            missing = chain(expected.items(),
+                            ((entity_key, found) for entity_key, queue in repeated.items() for found in queue))
+            for entity_key, (_, offset) in missing:
+                entity, key = json.loads(entity_key)
+                stats = self.entities[entity]
+                stats.missing += 1
+                stats.example('missing', key)
+                self.on_difference({'entity': entity, 'key': key, 'status': 'missing', 'source': source_record(offset)})
+
+def has_differences(summary: Dict[str, Dict]) -> bool:
+    return any(stats['missing'] or stats['extra'] or stats['changed'] or stats['no_key']
+               for stats in summary.values())
+
+def _short(value: Any, limit: int = 40) -> str:
+    text = json.dumps(value, ensure_ascii=False) if not isinstance(value, str) else value
+    return text if len(text) <= limit else text[:limit - 1] + '…'
+
+def print_diff(summary: Dict[str, Dict]):
+    for entity, stats in summary.items():
+        print(f"📊 {entity}: {stats['source']} from the source, {stats['backup']} in the backup")
+        print(f"   ✅ {stats['identical']} identical")
+        if stats['missing']:
+            print(f"   ❌ {stats['missing']} missing from the backup (e.g. {', '.join(stats['examples']['missing'])})")
+        if stats['extra']:
+            print(f"   ➕ {stats['extra']} only in the backup (e.g. {', '.join(stats['examples']['extra'])})")
+        if stats['changed']:
+            fields = ', '.join(f"{field} {count}" for field, count in list(stats['fields'].items())[:8])
+            print(f"   ✏️  {stats['changed']} changed ({fields})")
+            for example in stats['examples']['changed']:
+                deltas = '; '.join(f"{path}: {_short(a)} → {_short(b)}" for path, a, b in example['deltas'])
+                print(f"      {example['key']}: {deltas}")
+        for side, count in stats['duplicates'].items():
+            print(f"   🔁 {count} record(s) in the {side} repeat a key; they are matched in order")
+        for side, count in stats['no_key'].items():
+            print(f"   ⚠️  {count} {side} record(s) without a natural key were skipped")
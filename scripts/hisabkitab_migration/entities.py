@@ -0,0 +1,413 @@
+"""
+Entity Conversion
+Maps source rows (dicts keyed by column name) to HisabKitab-Pro products,
+customers, suppliers and categories (sales are grouped in sales.py)
+"""
+
+import json
+from datetime import datetime
+from functools import partial
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .categories import resolve_categories
+from .validation import IssueCounter, validate_record
+
+# Field mappings from common SQL column names to HisabKitab-Pro format
+FIELD_MAPPINGS = {
+    'products': {
+        'id': ['id', 'product_id', 'item_id', 'pid'],
+        'name': ['name', 'product_name', 'item_name', 'title', 'product_title'],
+        'sku': ['sku', 'code', 'product_code', 'item_code', 'product_sku'],
+        'barcode': ['barcode', 'barcode_no', 'ean', 'barcode_number'],
+        'category_id': ['category_id', 'cat_id', 'group_id', 'category'],
+        'purchase_price': ['cost', 'purchase_price', 'buy_price', 'cp', 'cost_price'],
+        'selling_price': ['price', 'selling_price', 'sale_price', 'sp', 'mrp', 'retail_price'],
+        'stock_quantity': ['stock', 'quantity', 'qty', 'stock_qty', 'inventory', 'available_stock'],
+        'min_stock_level': ['min_stock', 'reorder_level', 'alert_level', 'min_qty'],
+        'hsn_code': ['hsn', 'hsn_code', 'hsn_no'],
+        'gst_rate': ['gst', 'gst_rate', 'tax_rate', 'gst_percentage'],
+        'unit': ['unit', 'uom', 'unit_of_measure'],
+        'description': ['description', 'desc', 'details', 'product_description']
+    },
+    'customers': {
+        'id': ['id', 'customer_id', 'client_id', 'cid'],
+        'name': ['name', 'customer_name', 'client_name', 'company_name'],
+        'email': ['email', 'email_id', 'email_address'],
+        'phone': ['phone', 'phone_no', 'mobile', 'contact_no', 'phone_number'],
+        'address': ['address', 'addr', 'full_address'],
+        'city': ['city'],
+        'state': ['state'],
+        'pincode': ['pincode', 'pin_code', 'postal_code', 'zip'],
+        'gstin': ['gstin', 'gst_no', 'gst_number'],
+        'credit_limit': ['credit_limit', 'credit', 'max_credit']
+    },
+    'suppliers': {
+        'id': ['id', 'supplier_id', 'vendor_id', 'sid'],
+        'name': ['name', 'supplier_name', 'vendor_name'],
+        'email': ['email', 'email_id', 'email_address'],
+        'phone': ['phone', 'phone_no', 'mobile', 'contact_no'],
+        'address': ['address', 'addr', 'full_address'],
+        'city': ['city'],
+        'state': ['state'],
+        'pincode': ['pincode', 'pin_code', 'postal_code'],
+        'gstin': ['gstin', 'gst_no', 'gst_number'],
+        'is_registered': ['is_registered', 'gst_registered', 'registered']
+    },
+    'categories': {
+        'id': ['id', 'category_id', 'cat_id'],
+        'name': ['name', 'category_name', 'cat_name'],
+        'description': ['description', 'desc'],
+        'parent_id': ['parent_id', 'parent_category_id', 'parent_cat_id']
+    },
+    # One row per invoice line; invoice-level columns repeat on every line (see sales.py)
+    'sales': {
+        'invoice_number': ['invoice_number', 'invoice_no', 'bill_no', 'bill_number', 'voucher_no', 'invoice', 'sale_id', 'order_id'],
+        'sale_date': ['sale_date', 'invoice_date', 'bill_date', 'date', 'order_date', 'sold_at', 'created_at'],
+        'customer_id': ['customer_id', 'client_id'],
+        'customer_name': ['customer_name', 'customer', 'client_name', 'party_name'],
+        'customer_phone': ['customer_phone', 'customer_mobile', 'mobile', 'phone', 'phone_no', 'contact_no'],
+        'product_id': ['product_id', 'item_id'],
+        'product_name': ['product_name', 'item_name', 'product', 'item', 'description'],
+        'barcode': ['barcode', 'barcode_no', 'ean'],
+        'quantity': ['quantity', 'qty'],
+        'unit_price': ['unit_price', 'rate', 'price', 'selling_price', 'sale_price'],
+        'mrp': ['mrp'],
+        'discount': ['discount', 'discount_amount', 'disc'],
+        'tax_amount': ['tax_amount', 'gst_amount', 'tax'],
+        'total': ['total', 'line_total', 'item_total', 'amount', 'net_amount'],
+        'sale_type': ['sale_type', 'line_type', 'type'],
+        'grand_total': ['grand_total', 'invoice_total', 'bill_amount', 'bill_total'],
+        'payment_method': ['payment_method', 'payment_mode', 'pay_mode'],
+        'paid_amount': ['paid_amount', 'amount_paid', 'received_amount'],
+        'cash_amount': ['cash_amount', 'cash'],
+        'upi_amount': ['upi_amount', 'upi'],
+        'card_amount': ['card_amount', 'card'],
+        'sales_person_name': ['sales_person', 'sales_person_name', 'salesman'],
+        'notes': ['notes', 'remarks']
+    }
+}
+
+def find_matching_field(sql_column: str, entity_type: str) -> Optional[str]:
+    """Find matching HisabKitab-Pro field for SQL column name"""
+    mappings = FIELD_MAPPINGS.get(entity_type, {})
+    sql_lower = sql_column.lower().strip()
+    
+    for hk_field, possible_names in mappings.items():
+        if sql_lower in [n.lower() for n in possible_names]:
+            return hk_field
+    
+    return None
+
+def convert_product(row: Dict, headers: List[str], company_id: int = 1) -> Dict:
+    """Convert SQL product row to HisabKitab-Pro format"""
+    product = {
+        'id': int(row.get('id', 0)) or None,
+        'name': str(row.get('name', '')).strip() or 'Unnamed Product',
+        'sku': str(row.get('sku', '')).strip() or '',
+        'barcode': str(row.get('barcode', '')).strip() or '',
+        'category_id': int(row['category_id']) if row.get('category_id') else None,
+        'description': str(row.get('description', '')).strip() or '',
+        'unit': str(row.get('unit', 'pcs')).strip() or 'pcs',
+        'purchase_price': float(row.get('purchase_price', 0)) or 0,
+        'selling_price': float(row.get('selling_price', 0)) or 0,
+        'stock_quantity': int(row.get('stock_quantity', 0)) or 0,
+        'min_stock_level': int(row.get('min_stock_level', 0)) or 0,
+        'hsn_code': str(row.get('hsn_code', '')).strip() or '',
+        'gst_rate': float(row.get('gst_rate', 18)) or 18,
+        'tax_type': 'exclusive',
+        'cgst_rate': None,
+        'sgst_rate': None,
+        'igst_rate': None,
+        'is_active': True,
+        'status': 'active',
+        'barcode_status': 'inactive',
+        'company_id': company_id,
+        'created_at': datetime.now().isoformat() + 'Z',
+        'updated_at': datetime.now().isoformat() + 'Z'
+    }
+    
+    # Map fields from SQL column names
+    for header in headers:
+        hk_field = find_matching_field(header, 'products')
+        if hk_field and header in row:
+            value = row[header]
+            if hk_field in ['id', 'category_id', 'stock_quantity', 'min_stock_level']:
+                try:
+                    product[hk_field] = int(value) if value else None
+                except:
+                    pass
+            elif hk_field in ['purchase_price', 'selling_price', 'gst_rate']:
+                try:
+                    product[hk_field] = float(value) if value else 0
+                except:
+                    pass
+            else:
+                product[hk_field] = str(value).strip() if value else ''
+    
+    return product
+
+def convert_customer(row: Dict, headers: List[str], company_id: int = 1) -> Dict:
+    """Convert SQL customer row to HisabKitab-Pro format"""
+    customer = {
+        'id': int(row.get('id', 0)) or None,
+        'name': str(row.get('name', '')).strip() or 'Unnamed Customer',
+        'email': str(row.get('email', '')).strip() or '',
+        'phone': str(row.get('phone', '')).strip() or '',
+        'gstin': str(row.get('gstin', '')).strip() or '',
+        'address': str(row.get('address', '')).strip() or '',
+        'city': str(row.get('city', '')).strip() or '',
+        'state': str(row.get('state', '')).strip() or '',
+        'pincode': str(row.get('pincode', '')).strip() or '',
+        'contact_person': str(row.get('contact_person', '')).strip() or '',
+        'credit_limit': float(row.get('credit_limit', 0)) or 0,
+        'credit_balance': 0,
+        'is_active': True,
+        'company_id': company_id,
+        'created_at': datetime.now().isoformat() + 'Z',
+        'updated_at': datetime.now().isoformat() + 'Z'
+    }
+    
+    # Map fields from SQL column names
+    for header in headers:
+        hk_field = find_matching_field(header, 'customers')
+        if hk_field and header in row:
+            value = row[header]
+            if hk_field in ['id', 'credit_limit']:
+                try:
+                    customer[hk_field] = int(value) if value else (0 if hk_field == 'credit_limit' else None)
+                except:
+                    pass
+            else:
+                customer[hk_field] = str(value).strip() if value else ''
+    
+    return customer
+
+def convert_supplier(row: Dict, headers: List[str], company_id: int = 1) -> Dict:
+    """Convert SQL supplier row to HisabKitab-Pro format"""
+    supplier = {
+        'id': int(row.get('id', 0)) or None,
+        'name': str(row.get('name', '')).strip() or 'Unnamed Supplier',
+        'email': str(row.get('email', '')).strip() or '',
+        'phone': str(row.get('phone', '')).strip() or '',
+        'gstin': str(row.get('gstin', '')).strip() or '',
+        'address': str(row.get('address', '')).strip() or '',
+        'city': str(row.get('city', '')).strip() or '',
+        'state': str(row.get('state', '')).strip() or '',
+        'pincode': str(row.get('pincode', '')).strip() or '',
+        'contact_person': str(row.get('contact_person', '')).strip() or '',
+        'is_registered': bool(row.get('is_registered', False)),
+        'company_id': company_id,
+        'created_at': datetime.now().isoformat() + 'Z',
+        'updated_at': datetime.now().isoformat() + 'Z'
+    }
+    
+    # Map fields from SQL column names
+    for header in headers:
+        hk_field = find_matching_field(header, 'suppliers')
+        if hk_field and header in row:
+            value = row[header]
+            if hk_field == 'id':
+                try:
+                    supplier[hk_field] = int(value) if value else None
+                except:
+                    pass
+            elif hk_field == 'is_registered':
+                supplier[hk_field] = bool(value) if value else False
+            else:
+                supplier[hk_field] = str(value).strip() if value else ''
+    
+    return supplier
+
+def convert_category(row: Dict, headers: List[str], company_id: int = 1) -> Dict:
+    """Convert SQL category row to HisabKitab-Pro format"""
+    category = {
+        'id': int(row.get('id', 0)) or None,
+        'name': str(row.get('name', '')).strip() or 'Unnamed Category',
+        'description': str(row.get('description', '')).strip() or '',
+        'parent_id': int(row['parent_id']) if row.get('parent_id') else None,
+        'is_subcategory': bool(row.get('parent_id')),
+        'company_id': company_id,
+        'created_at': datetime.now().isoformat() + 'Z',
+        'updated_at': datetime.now().isoformat() + 'Z'
+    }
+    
+    # Map fields from SQL column names
+    for header in headers:
+        hk_field = find_matching_field(header, 'categories')
+        if hk_field and header in row:
+            value = row[header]
+            if hk_field in ['id', 'parent_id']:
+                try:
+                    category[hk_field] = int(value) if value else None
+                except:
+                    pass
+            elif hk_field == 'is_subcategory':
+                category[hk_field] = bool(value) if value else False
+            else:
+                category[hk_field] = str(value).strip() if value else ''
+    
+    return category
+
+CONVERTERS = {
+    'products': convert_product,
+    'customers': convert_customer,
+    'suppliers': convert_supplier,
+    'categories': convert_category,
+}
+
+def stock_level(product: Dict) -> Dict:
+    """Final stock of one product, so the import does not recompute it"""
+    return {
+        'product_id': product['id'],
+        'product_name': product['name'],
+        'sku': product['sku'],
+        'stock_quantity': product['stock_quantity'] or 0
+    }
+
+def iter_entities(rows: Iterable[Dict], entity: str, company_id: int = 1,
+                  issues: Optional[IssueCounter] = None) -> Iterator[Dict]:
+    """Lazily convert and validate source rows of one entity type; issue codes are tallied into issues"""
+    convert = CONVERTERS[entity]
+    headers = None
+    
+    # Sources may stream rows (XLSX), so headers come from the first row seen
+    for row in rows:
+        if headers is None:
+            headers = list(row.keys())
+        record = convert(row, headers, company_id)
+        found = validate_record(record)
+        if issues is not None:
+            issues.add(found)
+        yield record
+
+def iter_products(rows: Iterable[Dict], company_id: int = 1) -> Iterator[Dict]:
+    return iter_entities(rows, 'products', company_id)
+
+def iter_customers(rows: Iterable[Dict], company_id: int = 1) -> Iterator[Dict]:
+    return iter_entities(rows, 'customers', company_id)
+
+def iter_suppliers(rows: Iterable[Dict], company_id: int = 1) -> Iterator[Dict]:
+    return iter_entities(rows, 'suppliers', company_id)
+
+def iter_categories(rows: Iterable[Dict], company_id: int = 1) -> Iterator[Dict]:
+    return iter_entities(rows, 'categories', company_id)
+
+def create_backup_json(
+    products: List[Dict] = None,
+    customers: List[Dict] = None,
+    suppliers: List[Dict] = None,
+    categories: List[Dict] = None,
+    sales: List[Dict] = None,
+    purchases: List[Dict] = None,
+    company_id: int = 1,
+    summaries: Dict = None,
+    sub_categories: List[Dict] = None
+) -> Dict:
+    """Create HisabKitab-Pro backup JSON structure"""
+    backup = {
+        'version': '1.0.0',
+        'export_date': datetime.now().isoformat() + 'Z',
+        'export_by': 'sql_migration',
+        'data': {
+            'companies': [],
+            'users': [],
+            'products': products or [],
+            'categories': categories or [],
+            'sales': sales or [],
+            'purchases': purchases or [],
+            'suppliers': suppliers or [],
+            'customers': customers or [],
+            'sales_persons': [],
+            'category_commissions': [],
+            'sub_categories': sub_categories or [],
+            'sales_person_category_assignments': [],
+            'stock_adjustments': [],
+            'settings': {}
+        }
+    }
+    if summaries:
+        backup['summaries'] = summaries
+    return backup
+
+def convert_rows(data: Iterable[Dict], entity: str, company_id: int = 1) -> Tuple[Dict, List[Dict]]:
+    """Convert source rows of one entity type; returns the backup JSON and the converted records"""
+    if entity == 'sales':
+        from .sales import convert_sales_rows
+        return convert_sales_rows(data, company_id)
+    
+    issues = IssueCounter()
+    converted = list(iter_entities(data, entity, company_id, issues))
+    stock_levels = [stock_level(p) for p in converted] if entity == 'products' else []
+    summaries = {'validation': issues.to_dict()}
+    if stock_levels:
+        summaries['stock_levels'] = stock_levels
+    sub_categories = None
+    if entity == 'categories':
+        # Parents before children, missing parents and loops cut, sub_categories filled
+        tree = resolve_categories(converted)
+        converted, sub_categories = tree.ordered, tree.sub_categories
+        summaries['categories'] = tree.report()
+    backup = create_backup_json(
+        products=converted if entity == 'products' else None,
+        customers=converted if entity == 'customers' else None,
+        suppliers=converted if entity == 'suppliers' else None,
+        categories=converted if entity == 'categories' else None,
+        company_id=company_id,
+        summaries=summaries,
+        sub_categories=sub_categories
+    )
+    return backup, converted
+
+def convert_batch(rows: List[Dict], entity: str, company_id: int = 1) -> Tuple[List[str], List[Dict], Dict]:
+    """Pipeline conversion stage: one batch of rows to serialized records, their stock levels and issue counts
+
+    Serializing and validating here keeps both off the writer and in the
+    worker that did the conversion; each worker memoizes its own checks.
+    """
+    issues = IssueCounter()
+    records = list(iter_entities(rows, entity, company_id, issues))
+    stock_levels = [stock_level(p) for p in records] if entity == 'products' else []
+    return [json.dumps(r, ensure_ascii=False) for r in records], stock_levels, issues.to_dict()
+
+def convert_streaming(data: Iterable[Dict], entity: str, output: str, company_id: int = 1,
+                      batch_size: int = 1000, queue_size: int = 4, executor: str = 'process',
+                      workers: Optional[int] = None) -> Tuple[int, Dict]:
+    """Read, convert and write as overlapping pipeline stages; returns (records written, queue metrics)
+
+    Rows are read in batches on a thread, converted on a process (or thread)
+    pool and streamed into the output, compressed by extension (.gz/.bz2/.xz)
+    or loaded into a staging database (.sqlite/.db).
+    """
+    from .backup_stream import open_writer
+    from .pipeline import batched, run_pipeline
+    
+    if executor == 'process':
+        from concurrent.futures import ProcessPoolExecutor as PoolExecutor
+    else:
+        from concurrent.futures import ThreadPoolExecutor as PoolExecutor
+    
+    stock_levels = []
+    issues = IssueCounter()
+    
+    def write(result):
+        lines, levels, batch_issues = result
+        writer.write_records(lines)
+        stock_levels.extend(levels)
+        issues.merge(batch_issues)
+    
+    with open_writer(output, export_by='sql_migration') as writer:
+        writer.begin_entity(entity)
+        with PoolExecutor(max_workers=workers) as pool:
+            metrics = run_pipeline(
+                batched(data, batch_size),
+                partial(convert_batch, entity=entity, company_id=company_id),
+                write, pool, queue_size
+            )
+        count = writer.end_entity()
+        writer.write_object('settings', {})
+        summaries = {'validation': issues.to_dict()}
+        if stock_levels:
+            summaries['stock_levels'] = stock_levels
+        writer.close({'summaries': summaries})
+    metrics['validation'] = summaries['validation']
+    return count, metrics
@@ -0,0 +1,98 @@
+"""
+Purchase Fingerprint Index
+Persistent on-disk record of invoices and invoice lines already converted,
+so re-runs over overlapping exports can drop or flag them
+"""
+
+import sqlite3
+import hashlib
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, Tuple
+
+from .backup_stream import open_reader
+
+def _digest(*parts: Any) -> str:
+    """Stable short hash of the given parts"""
+    joined = "\x1f".join("" if p is None else str(p) for p in parts)
+    return hashlib.sha1(joined.encode("utf-8")).hexdigest()
+
+def invoice_fingerprint(gstin: str, supplier_name: str, invoice_number: str, invoice_date: str) -> str:
+    """Fingerprint of an invoice: supplier GSTIN (or name) + invoice number + date"""
+    supplier = (gstin or "").strip().upper() or (supplier_name or "").strip().upper()
+    return _digest(supplier, (invoice_number or "").strip().upper(), (invoice_date or "")[:10])
+
+def line_content_hash(product_name: str, hsn_code: str, quantity: Any, total: Any) -> str:
+    """Hash of the content of one invoice line"""
+    return _digest((product_name or "").strip().upper(), (hsn_code or "").strip(), quantity, round(float(total or 0), 2))
+
+def line_fingerprint(invoice_fp: str, content_hash: str, occurrence: int) -> str:
+    """Fingerprint of an invoice line; occurrence separates identical lines within one invoice"""
+    return _digest(invoice_fp, content_hash, occurrence)
+
+def iter_purchase_fingerprints(purchase: Dict, gstin: str = "") -> Iterator[Tuple[str, str]]:
+    """Yield ('invoice', fp) and ('line', fp) pairs for a converted purchase"""
+    invoice_fp = invoice_fingerprint(gstin, purchase.get("supplier_name", ""),
+                                     purchase.get("invoice_number", ""), purchase.get("purchase_date", ""))
+    yield "invoice", invoice_fp
+
+    seen = {}
+    for item in purchase.get("items", []):
+        content = line_content_hash(item.get("product_name", ""), item.get("hsn_code", ""),
+                                    item.get("quantity", 0), item.get("total", 0))
+        occurrence = seen.get(content, 0)
+        seen[content] = occurrence + 1
+        yield "line", line_fingerprint(invoice_fp, content, occurrence)
+
+class FingerprintIndex:
+    """SQLite-backed set of fingerprints (primary key lookup per row)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS fingerprints ("
+            " fp TEXT PRIMARY KEY,"
+            " kind TEXT NOT NULL,"
+            " source TEXT,"
+            " first_seen TEXT"
+            ") WITHOUT ROWID"
+        )
+
+    def __contains__(self, fp: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM fingerprints WHERE fp = ?", (fp,)).fetchone() is not None
+
+    def add_many(self, fingerprints: Iterable[Tuple[str, str]], source: str = "") -> int:
+        """Record (kind, fp) pairs; returns the number of new fingerprints"""
+        now = datetime.now().strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        before = self.conn.total_changes
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO fingerprints (fp, kind, source, first_seen) VALUES (?, ?, ?, ?)",
+            ((fp, kind, source, now) for kind, fp in fingerprints)
+        )
+        self.conn.commit()
+        return self.conn.total_changes - before
+
+    def counts(self) -> Dict[str, int]:
+        """Number of stored fingerprints per kind"""
+        return dict(self.conn.execute("SELECT kind, COUNT(*) FROM fingerprints GROUP BY kind").fetchall())
+
+    def clear(self):
+        self.conn.execute("DELETE FROM fingerprints")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def rebuild_from_backup(self, backup_path: str) -> int:
+        """Add fingerprints for every purchase in an existing backup file (or staging database)
+
+        The backup is streamed twice: purchases come before suppliers in
+        "data", so the first pass only collects supplier GSTINs, and the
+        second fingerprints purchases as they are read.
+        """
+        gstins = {record.get("id"): record.get("gstin", "")
+                  for entity, record in open_reader(backup_path) if entity == "suppliers"}
+        fingerprints = (fingerprint
+                        for entity, purchase in open_reader(backup_path) if entity == "purchases"
+                        for fingerprint in iter_purchase_fingerprints(purchase, gstins.get(purchase.get("supplier_id"), "")))
+        return self.add_many(fingerprints, backup_path)
@@ -0,0 +1,187 @@
+"""
+Fleet Conversion
+Converts the sources of many companies (e.g. every shop of a franchise) in
+one process pool, largest first, with an output directory, report and
+status per company; a failing tenant is reported and the rest carry on
+"""
+
+import os
+import csv
+import json
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from .jobs import JobPool
+
+ENTITIES = ('purchases', 'products', 'customers', 'suppliers', 'categories', 'sales')
+
+# Manifest fields; everything but source and company_id falls back to the CLI defaults
+MANIFEST_FIELDS = ('source', 'company_id', 'entity', 'table', 'sheet', 'type', 'name')
+
+def _read_manifest_entries(path: str) -> List[Dict]:
+    if path.lower().endswith('.csv'):
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            return [{k.strip(): (v or '').strip() for k, v in row.items() if k} for row in csv.DictReader(f)]
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.lower().endswith('.jsonl'):
+            return [json.loads(line) for line in f if line.strip()]
+        entries = json.load(f)
+    # Either a plain list or {"defaults": {...}, "tenants": [...]}
+    if isinstance(entries, dict):
+        defaults = entries.get('defaults', {})
+        return [{**defaults, **entry} for entry in entries.get('tenants', [])]
+    return entries
+
+def load_manifest(path: str, defaults: Optional[Dict] = None) -> List[Dict]:
+    """Read a .json, .jsonl or .csv manifest into tenant entries
+
+    Sources are relative to the manifest. An entry that cannot run (missing
+    source, bad company_id, unknown entity) keeps an 'error' instead of
+    stopping the load, so it shows up as a failed tenant in the report.
+    """
+    base_dir = os.path.dirname(os.path.abspath(path))
+    tenants = []
+    for number, raw in enumerate(_read_manifest_entries(path), 1):
+        entry = {field: value for field, value in (defaults or {}).items() if value is not None}
+        entry.update({field: value for field, value in raw.items() if value not in (None, '')})
+        unknown = sorted(set(raw) - set(MANIFEST_FIELDS))
+        source = entry.get('source')
+        entry['source'] = os.path.join(base_dir, source) if source else ''
+        entry.setdefault('name', os.path.splitext(os.path.basename(source))[0] if source else f"entry{number}")
+        if isinstance(entry.get('sheet'), str):
+            entry['sheet'] = [entry['sheet']]
+
+        if unknown:
+            entry['error'] = f"unknown manifest field(s): {', '.join(unknown)}"
+        elif not source:
+            entry['error'] = "no source given"
+        elif not str(entry.get('company_id', '')).isdigit():
+            entry['error'] = f"company_id must be a positive integer, got {entry.get('company_id')!r}"
+        elif entry.get('entity') not in ENTITIES:
+            entry['error'] = f"entity must be one of {', '.join(ENTITIES)}, got {entry.get('entity')!r}"
+        elif not os.path.isfile(entry['source']):
+            entry['error'] = f"source not found: {source}"
+        else:
+            entry['company_id'] = int(entry['company_id'])
+        tenants.append(entry)
+
+    # Two sources of one company with the same file name would overwrite each other's output
+    seen = {}
+    for entry in tenants:
+        key = (str(entry.get('company_id')), entry['name'])
+        seen[key] = seen.get(key, 0) + 1
+        if seen[key] > 1:
+            entry['name'] = f"{entry['name']}_{seen[key]}"
+    return tenants
+
+def schedule(tenants: List[Dict]) -> List[Dict]:
+    """Runnable tenants, largest source first
+
+    Longest-processing-time-first: the big tenants start while every worker
+    is free and the small ones fill the gaps at the end, instead of one huge
+    database starting last and running alone.
+    """
+    runnable = [tenant for tenant in tenants if 'error' not in tenant]
+    for tenant in runnable:
+        tenant['bytes'] = os.path.getsize(tenant['source'])
+    return sorted(runnable, key=lambda tenant: tenant['bytes'], reverse=True)
+
+def company_dir(outbox: str, company_id) -> str:
+    return os.path.join(outbox, f"company_{company_id}")
+
+def _tenant_report(tenant: Dict, report: Dict) -> Dict:
+    report.update(company_id=tenant.get('company_id'), name=tenant['name'], source=tenant['source'])
+    report['finished_at'] = datetime.now().isoformat()
+    report.setdefault('seconds', 0)
+    return report
+
+def _write_report(outbox: str, tenant: Dict, report: Dict):
+    directory = company_dir(outbox, tenant.get('company_id', 'unknown'))
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, tenant['name'] + '.report.json'), 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+def _print_result(report: Dict):
+    label = f"company {report['company_id']} / {report['name']}"
+    if report['status'] == 'ok':
+        counts = ', '.join(f"{k}: {v}" for k, v in report['counts'].items())
+        cached = ', from cache' if report.get('cached') else ''
+        print(f"✅ {label} ({counts}, {report['seconds']}s{cached})")
+    else:
+        print(f"❌ {label}: {report['error']}")
+
+def run_fleet(tenants: List[Dict], outbox: str, workers: int, options: Optional[Dict] = None) -> Dict:
+    """Convert every tenant into outbox/company_<id>/; returns the fleet report (also written to the outbox)
+
+    options are passed to every job (cache_dir, cache_size, profile_dir, save_profile). At
+    most workers jobs are handed to the pool at a time, so the schedule order
+    holds.
+    """
+    os.makedirs(outbox, exist_ok=True)
+    started = time.time()
+    reports = []
+
+    for tenant in tenants:
+        if 'error' in tenant:
+            report = _tenant_report(tenant, {'file': os.path.basename(tenant['source']), 'entity': tenant.get('entity'),
+                                             'status': 'failed', 'error': tenant['error'], 'seconds': 0})
+            _write_report(outbox, tenant, report)
+            _print_result(report)
+            reports.append(report)
+
+    queue = schedule(tenants)
+    print(f"🚚 Converting {len(queue)} tenant(s) with {workers} worker(s), largest first")
+    pool = JobPool(workers)
+    try:
+        while queue or len(pool):
+            while queue and len(pool) < workers:
+                tenant = queue.pop(0)
+                directory = company_dir(outbox, tenant['company_id'])
+                os.makedirs(directory, exist_ok=True)
+                job_options = {'entity': tenant['entity'], 'company_id': tenant['company_id'],
+                               'table': tenant.get('table'), 'sheets': tenant.get('sheet'), 'type': tenant.get('type'),
+                               **(options or {})}
+                pool.submit(tenant, tenant['source'], os.path.join(directory, tenant['name'] + '.json'), job_options)
+            for tenant, report in pool.poll():
+                report = _tenant_report(tenant, report)
+                report['bytes'] = tenant['bytes']
+                _write_report(outbox, tenant, report)
+                _print_result(report)
+                reports.append(report)
+    finally:
+        pool.shutdown(wait=True)
+
+    makespan = time.time() - started
+    work = sum(report['seconds'] for report in reports)
+    companies = {}
+    for report in reports:
+        company = companies.setdefault(str(report['company_id']), {'status': 'ok', 'tenants': []})
+        company['tenants'].append({key: report.get(key) for key in ('name', 'entity', 'status', 'output', 'error')})
+        if report['status'] != 'ok':
+            company['status'] = 'failed'
+
+    fleet_report = {
+        'finished_at': datetime.now().isoformat(),
+        'workers': workers,
+        'tenants': len(reports),
+        'ok': sum(1 for report in reports if report['status'] == 'ok'),
+        'failed': sum(1 for report in reports if report['status'] != 'ok'),
+        'makespan_s': round(makespan, 3),
+        'work_s': round(work, 3),
+        # 1.0 means the workers were busy converting from start to finish
+        'efficiency': round(work / (makespan * workers), 3) if makespan else None,
+        'companies': companies,
+    }
+    with open(os.path.join(outbox, 'fleet_report.json'), 'w', encoding='utf-8') as f:
+        json.dump(fleet_report, f, indent=2, ensure_ascii=False)
+    return fleet_report
+
+def print_fleet_report(fleet_report: Dict):
+    print(f"\n🏁 Fleet done: {fleet_report['ok']} converted, {fleet_report['failed']} failed"
+          f" across {len(fleet_report['companies'])} compan{'y' if len(fleet_report['companies']) == 1 else 'ies'}")
+    print(f"   Makespan {fleet_report['makespan_s']}s for {fleet_report['work_s']}s of work on"
+          f" {fleet_report['workers']} worker(s) (efficiency {fleet_report['efficiency']})")
+    failed = [company_id for company_id, company in fleet_report['companies'].items() if company['status'] != 'ok']
+    if failed:
+        print(f"   ⚠️  Companies with failures: {', '.join(failed)}")
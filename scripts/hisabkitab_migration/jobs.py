@@ -0,0 +1,205 @@
+"""
+Conversion Jobs
+Converts whole input files in worker processes, each job ending in a report
+instead of an exception, and a pool that keeps going when a worker dies
+"""
+
+import io
+import os
+import time
+import signal
+import importlib
+import traceback
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from .cache import ResultCache
+from .entities import convert_rows
+from .profiles import ProfileStore, profiled_rows
+from .purchases import PurchaseAssembler, create_backup_json, parse_purchase_file
+from .rejects import RejectSink
+from .sales import write_sales_backup
+from .sources import read_rows, source_for_path
+from .writers import write_backup_json
+
+# Result cache opened by each worker on its first file (see _worker_cache)
+_cache: Optional[ResultCache] = None
+
+# Mapping profiles, likewise (see _worker_profiles)
+_profiles: Optional[ProfileStore] = None
+
+def warm_worker():
+    """Pay imports and setup once per worker instead of once per file"""
+    # Ctrl+C goes to the whole process group; the parent decides when workers stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # The SQL dump parser is otherwise imported on a worker's first dump
+    importlib.import_module('.sql_dump', __package__)
+
+def _convert_purchases(path: str, options: Dict) -> Dict:
+    # Rejected rows reach the report as counts; the first few are in its log
+    rejects = RejectSink()
+    _, lines = parse_purchase_file(path, options.get('sheets'), rejects, _worker_profiles(options))
+    assembler = PurchaseAssembler(company_id=options['company_id'])
+    assembler.add_lines(lines)
+    result = assembler.result()
+    backup = create_backup_json(result['suppliers'], result['purchases'], options['company_id'], result['summaries'])
+    return {'backup': backup, 'counts': {'lines': len(lines), 'suppliers': len(result['suppliers']),
+                                         'purchases': len(result['purchases']), 'rejected': rejects.total}}
+
+def _read_source(path: str, options: Dict) -> Tuple[str, Any]:
+    source = options.get('type') or source_for_path(path)
+    if source is None:
+        raise ValueError(f"no input source handles {os.path.basename(path)}")
+    # SQLite files, like SQL dumps, default to the table named after the entity
+    rows = read_rows(path, source, table=options.get('table') or options['entity'], entity=options['entity'],
+                     sheet=options.get('sheets'), workers=1, profiles=_worker_profiles(options))
+    return source, profiled_rows(rows, options['entity'], _worker_profiles(options))
+
+def _convert_entities(path: str, options: Dict) -> Dict:
+    source, rows = _read_source(path, options)
+    backup, converted = convert_rows(rows, options['entity'], options['company_id'])
+    return {'backup': backup, 'counts': {options['entity']: len(converted)}, 'source': source}
+
+def _convert_sales(path: str, options: Dict, output_path: str) -> Dict:
+    # Sales histories are the largest inputs, so they stream straight into the output
+    source, rows = _read_source(path, options)
+    counts = write_sales_backup(rows, output_path, options['company_id'])
+    return {'counts': counts, 'source': source}
+
+def _worker_cache(options: Dict) -> Optional[ResultCache]:
+    """This worker's connection to the result cache, or None when caching is off"""
+    global _cache
+    if _cache is None and options.get('cache_dir'):
+        _cache = ResultCache(options['cache_dir'], options['cache_size'])
+    return _cache
+
+def _worker_profiles(options: Dict) -> Optional[ProfileStore]:
+    """This worker's mapping profile store, or None when profiles are off"""
+    global _profiles
+    if _profiles is None and options.get('profile_dir'):
+        _profiles = ProfileStore(options['profile_dir'], options.get('save_profile', False))
+    return _profiles
+
+def convert_file(path: str, output_path: str, options: Dict) -> Dict:
+    """Convert one input file into output_path; never raises, failures go in the report
+
+    options: entity, company_id, and optionally table (SQLite and SQL dumps;
+    default: the entity name), sheets, type (source name, default: by
+    extension), cache_dir, cache_size, profile_dir and save_profile.
+    """
+    started = time.time()
+    report = {
+        'file': os.path.basename(path),
+        'entity': options['entity'],
+        'started_at': datetime.now().isoformat(),
+        'worker_pid': os.getpid()
+    }
+    log = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(log):
+            cache = _worker_cache(options)
+            profiles = _worker_profiles(options)
+            if cache is not None:
+                key = cache.key([path], {'converter': 'convert-file', 'entity': options['entity'],
+                                         'table': options.get('table'), 'sheets': options.get('sheets'),
+                                         'type': options.get('type'), 'company_id': options['company_id'],
+                                         'profiles': profiles.version() if profiles else None})
+                result = cache.restore(key, output_path)
+            else:
+                result = None
+
+            if result is not None:
+                report['cached'] = True
+            else:
+                tmp_path = output_path + '.tmp'
+                if options['entity'] == 'purchases':
+                    result = _convert_purchases(path, options)
+                elif options['entity'] == 'sales':
+                    result = _convert_sales(path, options, tmp_path)
+                else:
+                    result = _convert_entities(path, options)
+                if 'backup' in result:
+                    write_backup_json(tmp_path, result.pop('backup'))
+                os.replace(tmp_path, output_path)
+                if cache is not None:
+                    cache.store(key, output_path, [output_path], result)
+        report.update(status='ok', output=os.path.basename(output_path), counts=result['counts'])
+        if 'source' in result:
+            report['source'] = result['source']
+    except Exception as e:
+        report.update(status='failed', error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc())
+    report['seconds'] = round(time.time() - started, 3)
+    report['log'] = log.getvalue().splitlines()[-50:]
+    return report
+
+class JobPool:
+    """Warm process pool running convert_file jobs, tolerant of worker deaths
+
+    A dead worker (killed, out of memory, crash in an extension) takes the
+    whole pool down, so every job running at that moment fails with it. Each
+    of those jobs is retried alone in a single-worker quarantine pool; a job
+    that kills that worker too is the culprit and gets a failed report.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        # future -> (tag, path, output path, options, executor it runs on)
+        self.in_flight: Dict = {}
+        self.executor = self._new_executor(workers)
+        self.retries: List[tuple] = []
+        self.quarantine = self._new_executor(1)
+
+    def _new_executor(self, workers: int) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=workers, initializer=warm_worker)
+
+    def __len__(self) -> int:
+        """Jobs running, queued in the pool or waiting for a retry"""
+        return len(self.in_flight) + len(self.retries)
+
+    def _submit(self, executor: ProcessPoolExecutor, tag: Any, path: str, output_path: str, options: Dict):
+        future = executor.submit(convert_file, path, output_path, options)
+        self.in_flight[future] = (tag, path, output_path, options, executor)
+
+    def submit(self, tag: Any, path: str, output_path: str, options: Dict):
+        """Queue a job; tag comes back with its report"""
+        self._submit(self.executor, tag, path, output_path, options)
+
+    def _submit_retry(self):
+        """Start the next retry once the quarantine worker is idle"""
+        if self.retries and not any(entry[4] is self.quarantine for entry in self.in_flight.values()):
+            self._submit(self.quarantine, *self.retries.pop(0))
+
+    def poll(self, timeout: Optional[float] = None) -> List[Tuple[Any, Dict]]:
+        """Wait up to timeout for jobs to finish; returns (tag, report) for each finished job"""
+        self._submit_retry()
+        if not self.in_flight:
+            return []
+        finished = []
+        done, _ = wait(list(self.in_flight), timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            tag, path, output_path, options, executor = self.in_flight.pop(future)
+            try:
+                finished.append((tag, future.result()))
+                continue
+            except BrokenProcessPool:
+                pass
+            if executor is self.executor:
+                self.executor.shutdown(wait=False)
+                self.executor = self._new_executor(self.workers)
+            if executor is not self.quarantine:
+                print(f"🔁 {os.path.basename(path)}: worker process died, retrying alone")
+                self.retries.append((tag, path, output_path, options))
+                continue
+            self.quarantine.shutdown(wait=False)
+            self.quarantine = self._new_executor(1)
+            finished.append((tag, {'file': os.path.basename(path), 'entity': options['entity'], 'status': 'failed',
+                                   'error': 'worker process died while converting this file'}))
+        self._submit_retry()
+        return finished
+
+    def shutdown(self, wait: bool = True):
+        self.executor.shutdown(wait=wait)
+        self.quarantine.shutdown(wait=wait)
@@ -0,0 +1,139 @@
+"""
+Staged Conversion Pipeline
+Runs read -> convert -> write as concurrent asyncio stages joined by bounded
+queues, so source reads and output writes overlap with conversion work and a
+slow stage makes the others wait instead of letting batches pile up in memory
+"""
+
+import asyncio
+import time
+from concurrent.futures import Executor
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+_DONE = object()
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Group an iterable into lists of up to size items"""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+class StageQueue:
+    """Bounded queue between two stages that records how full it ran
+
+    A queue that stays near maxsize with a blocked producer points at a slow
+    consumer; one that stays empty with a waiting consumer points upstream.
+    """
+
+    def __init__(self, name: str, maxsize: int):
+        self.name = name
+        self.maxsize = maxsize
+        self._queue = asyncio.Queue(maxsize)
+        self.items = 0
+        self.samples = 0
+        self.depth_total = 0
+        self.max_depth = 0
+        self.put_wait = 0.0
+        self.get_wait = 0.0
+
+    def _sample(self):
+        depth = self._queue.qsize()
+        self.samples += 1
+        self.depth_total += depth
+        self.max_depth = max(self.max_depth, depth)
+
+    async def put(self, item: Any):
+        start = time.perf_counter()
+        await self._queue.put(item)
+        self.put_wait += time.perf_counter() - start
+        self._sample()
+
+    async def get(self) -> Any:
+        start = time.perf_counter()
+        item = await self._queue.get()
+        self.get_wait += time.perf_counter() - start
+        self._sample()
+        if item is not _DONE:
+            self.items += 1
+        return item
+
+    def to_dict(self) -> Dict:
+        return {
+            'queue': self.name,
+            'maxsize': self.maxsize,
+            'batches': self.items,
+            'avg_depth': round(self.depth_total / self.samples, 2) if self.samples else 0,
+            'max_depth': self.max_depth,
+            'producer_blocked_s': round(self.put_wait, 3),
+            'consumer_waiting_s': round(self.get_wait, 3),
+        }
+
+async def _run(batches: Iterable[Any], convert: Callable[[Any], Any], write: Callable[[Any], None],
+               executor: Optional[Executor], queue_size: int) -> Dict:
+    loop = asyncio.get_running_loop()
+    to_convert = StageQueue('read -> convert', queue_size)
+    to_write = StageQueue('convert -> write', queue_size)
+    timings = {'read_s': 0.0, 'convert_wait_s': 0.0, 'write_s': 0.0}
+
+    async def timed(key: str, awaitable):
+        start = time.perf_counter()
+        result = await awaitable
+        timings[key] += time.perf_counter() - start
+        return result
+
+    async def reader():
+        # Sources are blocking iterators; each next() runs on a thread so the loop keeps moving
+        iterator = iter(batches)
+        while True:
+            batch = await timed('read_s', loop.run_in_executor(None, next, iterator, _DONE))
+            await to_convert.put(batch)
+            if batch is _DONE:
+                return
+
+    async def converter():
+        # Futures travel downstream in read order, so output order is kept while
+        # up to queue_size batches convert at once
+        while True:
+            batch = await to_convert.get()
+            if batch is _DONE:
+                await to_write.put(_DONE)
+                return
+            await to_write.put(loop.run_in_executor(executor, convert, batch))
+
+    async def writer():
+        while True:
+            pending = await to_write.get()
+            if pending is _DONE:
+                return
+            # Time spent here is the writer waiting on conversion, not writing
+            result = await timed('convert_wait_s', pending)
+            await timed('write_s', loop.run_in_executor(None, write, result))
+
+    await asyncio.gather(reader(), converter(), writer())
+    return {
+        'queues': [to_convert.to_dict(), to_write.to_dict()],
+        'stages': {key: round(value, 3) for key, value in timings.items()},
+    }
+
+def run_pipeline(batches: Iterable[Any], convert: Callable[[Any], Any], write: Callable[[Any], None],
+                 executor: Optional[Executor] = None, queue_size: int = 4) -> Dict:
+    """Feed batches through convert (on executor) into write, in order; returns queue and stage metrics
+
+    convert must be picklable when executor is a process pool. write is called
+    from one thread at a time, in the order the batches were read.
+    """
+    return asyncio.run(_run(batches, convert, write, executor, queue_size))
+
+def print_metrics(metrics: Dict):
+    stages = metrics['stages']
+    print(f"\n📊 Pipeline stages: reading {stages['read_s']}s,"
+          f" writer waiting on conversion {stages['convert_wait_s']}s, writing {stages['write_s']}s")
+    for queue in metrics['queues']:
+        print(f"   {queue['queue']}: {queue['batches']} batches, depth avg {queue['avg_depth']}"
+              f" / max {queue['max_depth']} of {queue['maxsize']},"
+              f" producer blocked {queue['producer_blocked_s']}s,"
+              f" consumer waiting {queue['consumer_waiting_s']}s")
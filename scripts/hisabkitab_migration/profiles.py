@@ -0,0 +1,374 @@
+"""
+Mapping Profiles
+Remembers how an input layout converts: the header row is fingerprinted and
+the column mapping, date format, number locale and entity are saved as an
+editable JSON profile per fingerprint. A layout seen before is converted
+with its profile, without column detection or sampling; a new one is
+detected once and saved for the next run.
+"""
+
+import os
+import re
+import json
+import hashlib
+from datetime import datetime
+from functools import lru_cache
+from itertools import chain, islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+DEFAULT_PROFILE_DIR = os.environ.get('HK_PROFILE_DIR') or os.path.join(
+    os.path.expanduser('~'), '.config', 'hisabkitab-migration', 'profiles')
+
+# Rows looked at to detect the date format and number locale of a new layout
+SAMPLE_ROWS = 200
+
+# Thousands and decimal separators
+NUMBER_LOCALES = {
+    'en-IN': (',', '.'),  # 1,23,456.78 (also 123,456.78)
+    'eu': ('.', ','),     # 123.456,78
+}
+DEFAULT_LOCALE = 'en-IN'
+
+ENTITIES = ('products', 'customers', 'suppliers', 'categories', 'sales', 'purchases')
+
+# Fields holding dates / amounts and counts, per entity
+DATE_FIELDS = {
+    'purchases': ('invoice_date',),
+    'sales': ('sale_date',),
+}
+NUMBER_FIELDS = {
+    'products': ('purchase_price', 'selling_price', 'stock_quantity', 'min_stock_level', 'gst_rate'),
+    'customers': ('credit_limit',),
+    'purchases': ('gst_rate', 'quantity', 'taxable_amount', 'sgst', 'cgst', 'igst', 'total_amount', 'amount_paid'),
+    'sales': ('quantity', 'unit_price', 'mrp', 'discount', 'tax_amount', 'total', 'grand_total', 'paid_amount',
+              'cash_amount', 'upi_amount', 'card_amount'),
+}
+
+# Month-first formats are never guessed per value, but a layout whose dates only parse this way gets them
+US_DATE_FORMATS = ['%m/%d/%Y', '%m-%d-%Y', '%m/%d/%Y %H:%M']
+
+_EU_NUMBER = re.compile(r'^-?\d{1,3}(\.\d{3})*,\d+$|^-?\d+,\d+$')
+_EN_NUMBER = re.compile(r'^-?\d{1,3}(,\d{2,3})*\.\d+$|^-?\d+\.\d+$')
+
+def normalize_header(header: Any) -> str:
+    return str(header if header is not None else '').strip().lower()
+
+def schema_fingerprint(headers: List[Any]) -> str:
+    """Identifies a layout by its header names and their order; case and surrounding spaces do not count"""
+    text = '\x1f'.join(normalize_header(h) for h in headers)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+def entity_fields(entity: str) -> List[str]:
+    """Fields a profile of this entity can map a column to"""
+    if entity == 'purchases':
+        from .purchases import map_purchase_columns
+        return list(map_purchase_columns([]))
+    from .entities import CONVERTERS, FIELD_MAPPINGS
+    if entity not in FIELD_MAPPINGS:
+        raise ValueError(f"unknown entity '{entity}'")
+    fields = list(FIELD_MAPPINGS[entity])
+    if entity in CONVERTERS:
+        # Converters also read columns named exactly like one of their record fields
+        fields += [f for f in CONVERTERS[entity]({}, []).keys() if f not in fields]
+    return fields
+
+def detect_columns(headers: List[Any], entity: str) -> Dict[str, Optional[str]]:
+    """field -> header as the converters' own heuristics map them (None when no column matches)"""
+    headers = [h for h in headers if h is not None]
+    if entity == 'purchases':
+        from .purchases import map_purchase_columns
+        return {field: headers[i] if i is not None else None for field, i in map_purchase_columns(headers).items()}
+    if entity == 'sales':
+        from .sales import map_sale_columns
+        return map_sale_columns(headers)
+    from .entities import FIELD_MAPPINGS, find_matching_field
+    columns: Dict[str, Optional[str]] = {field: None for field in FIELD_MAPPINGS[entity]}
+    direct = set(entity_fields(entity))
+    for header in headers:
+        # The converters apply columns in order, so the last one for a field wins
+        field = find_matching_field(str(header), entity) or (header if header in direct else None)
+        if field:
+            columns[field] = header
+    return columns
+
+def _column_values(rows: List[Any], headers: List[Any], header: Optional[str]) -> List[str]:
+    """Non-empty text values of one column in sampled rows (list or dict rows)"""
+    if header is None:
+        return []
+    index = headers.index(header)
+    values = []
+    for row in rows:
+        value = row.get(header) if isinstance(row, dict) else (row[index] if index < len(row) else None)
+        if isinstance(value, str) and value.strip():
+            values.append(value.strip())
+    return values
+
+def detect_date_format(values: List[str]) -> Optional[str]:
+    """The first known format every sampled date parses with; None for ISO dates or no single format"""
+    from .purchases import DATE_FORMATS
+    texts = [v for v in values if not (v[:4].isdigit() and v[4:5] == '-')]
+    if not texts:
+        return None
+    for fmt in DATE_FORMATS + US_DATE_FORMATS:
+        try:
+            for text in texts:
+                datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        return fmt
+    return None
+
+def detect_number_locale(values: List[str]) -> str:
+    """eu when more sampled amounts have a decimal comma than a decimal point"""
+    eu = sum(1 for v in values if _EU_NUMBER.match(v))
+    en = sum(1 for v in values if _EN_NUMBER.match(v))
+    return 'eu' if eu > en else DEFAULT_LOCALE
+
+def detect_profile(headers: List[Any], sample: List[Any], entity: str) -> Dict:
+    """A profile for a new layout, from the heuristics and a sample of its rows"""
+    columns = detect_columns(headers, entity)
+    dates = [v for field in DATE_FIELDS.get(entity, ()) for v in _column_values(sample, headers, columns.get(field))]
+    numbers = [v for field in NUMBER_FIELDS.get(entity, ()) for v in _column_values(sample, headers, columns.get(field))]
+    return {
+        'fingerprint': schema_fingerprint(headers),
+        'entity': entity,
+        'headers': [str(h) for h in headers if h is not None],
+        'columns': columns,
+        'date_format': detect_date_format(dates),
+        'number_locale': detect_number_locale(numbers),
+        'detected_at': datetime.now().isoformat(timespec='seconds'),
+    }
+
+def check_profile(profile: Dict, headers: List[Any], where: str):
+    """Raise ValueError naming the problem when a (hand-edited) profile cannot be applied to headers"""
+    entity = profile.get('entity')
+    if entity not in ENTITIES:
+        raise ValueError(f"{where}: entity must be one of {', '.join(ENTITIES)}")
+    fields = set(entity_fields(entity))
+    present = {normalize_header(h) for h in headers}
+    columns = profile.get('columns')
+    if not isinstance(columns, dict):
+        raise ValueError(f"{where}: \"columns\" must map fields to column names")
+    for field, header in columns.items():
+        if field not in fields:
+            raise ValueError(f"{where}: {entity} have no field {field!r}")
+        if header is not None and normalize_header(header) not in present:
+            raise ValueError(f"{where}: column {header!r} for {field} is not in this layout")
+    if (profile.get('number_locale') or DEFAULT_LOCALE) not in NUMBER_LOCALES:
+        raise ValueError(f"{where}: number_locale must be one of {', '.join(NUMBER_LOCALES)}")
+    date_format = profile.get('date_format')
+    if date_format is not None:
+        sample = datetime(2025, 4, 7, 14, 30)
+        try:
+            datetime.strptime(sample.strftime(date_format), date_format)
+        except (TypeError, ValueError):
+            raise ValueError(f"{where}: date_format {date_format!r} is not a strptime format")
+
+@lru_cache(maxsize=4096)
+def _rewrite_date(text: str, date_format: str) -> str:
+    """Date text in the profile's format as an ISO timestamp; anything else is left to the usual parser"""
+    try:
+        return datetime.strptime(text.strip(), date_format).strftime('%Y-%m-%dT%H:%M:%S')
+    except ValueError:
+        return text
+
+def _rewrite_number(text: str, separators: Tuple[str, str]) -> str:
+    thousands, decimal = separators
+    text = text.replace(thousands, '').replace(' ', '')
+    return text.replace(decimal, '.') if decimal != '.' else text
+
+def _converters(profile: Dict) -> Dict[str, Any]:
+    """field -> function rewriting its text values, for the fields the profile's formats apply to"""
+    converters = {}
+    date_format = profile.get('date_format')
+    if date_format:
+        for field in DATE_FIELDS.get(profile['entity'], ()):
+            converters[field] = lambda text, fmt=date_format: _rewrite_date(text, fmt)
+    separators = NUMBER_LOCALES[profile.get('number_locale') or DEFAULT_LOCALE]
+    for field in NUMBER_FIELDS.get(profile['entity'], ()):
+        converters[field] = lambda text, sep=separators: _rewrite_number(text, sep)
+    return converters
+
+def profile_columns(profile: Dict, headers: List[Any]) -> Dict[str, Optional[int]]:
+    """field -> column index in headers (purchase registers are read as lists)"""
+    positions = {normalize_header(h): i for i, h in reversed(list(enumerate(headers)))}
+    return {field: positions.get(normalize_header(header)) if header is not None else None
+            for field, header in profile['columns'].items()}
+
+def row_rewriter(profile: Dict, headers: List[Any]) -> Optional[Callable[[List[Any]], List[Any]]]:
+    """Function returning a copy of a list row with its dates and numbers rewritten as the profile says
+    (columns stay where they are); None when the profile rewrites nothing"""
+    indices = profile_columns(profile, headers)
+    rewrites = [(indices[field], convert) for field, convert in _converters(profile).items()
+                if indices.get(field) is not None]
+    if not rewrites:
+        return None
+
+    def rewrite(row: List[Any]) -> List[Any]:
+        row = list(row)
+        for index, convert in rewrites:
+            if index < len(row) and isinstance(row[index], str):
+                row[index] = convert(row[index])
+        return row
+    return rewrite
+
+def apply_to_dicts(rows: Iterable[Dict], profile: Dict, headers: List[Any]) -> Iterator[Dict]:
+    """Rows keyed by the column name the converters recognize for each mapped field, formats rewritten
+
+    Columns the profile does not map are dropped, so the converters'
+    heuristics find exactly what the profile says.
+    """
+    from .entities import FIELD_MAPPINGS
+    aliases = FIELD_MAPPINGS.get(profile['entity'], {})
+    converters = _converters(profile)
+    # The profile may spell a column in another case than this file does
+    actual = {normalize_header(h): h for h in reversed(headers)}
+    mapped = [(aliases[field][0] if field in aliases else field, actual[normalize_header(header)], converters.get(field))
+              for field, header in profile['columns'].items() if header is not None]
+    for row in rows:
+        out = {}
+        for name, header, convert in mapped:
+            value = row.get(header)
+            out[name] = convert(value) if convert is not None and isinstance(value, str) else value
+        yield out
+
+class ProfileStore:
+    """Directory of mapping profiles, one <fingerprint>.json per layout
+
+    layout() finds the profile for a table's headers, or detects one and,
+    only with save_new (--save-profile), saves it. Profiles are plain JSON,
+    meant to be corrected by hand; an edited profile is checked against the
+    layout before use.
+    """
+
+    def __init__(self, directory: str = DEFAULT_PROFILE_DIR, save_new: bool = False):
+        self.directory = directory
+        self.save_new = save_new
+        self._loaded: Dict[str, Optional[Dict]] = {}
+
+    def path(self, fingerprint: str) -> str:
+        return os.path.join(self.directory, f"{fingerprint}.json")
+
+    def load(self, fingerprint: str) -> Optional[Dict]:
+        if fingerprint not in self._loaded:
+            try:
+                with open(self.path(fingerprint), 'r', encoding='utf-8') as f:
+                    self._loaded[fingerprint] = json.load(f)
+            except FileNotFoundError:
+                self._loaded[fingerprint] = None
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{self.path(fingerprint)}: not valid JSON ({e})")
+        return self._loaded[fingerprint]
+
+    def save(self, profile: Dict) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(profile['fingerprint'])
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(profile, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        os.replace(tmp_path, path)
+        self._loaded[profile['fingerprint']] = profile
+        return path
+
+    def delete(self, fingerprint: str) -> bool:
+        self._loaded.pop(fingerprint, None)
+        try:
+            os.remove(self.path(fingerprint))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def profiles(self) -> List[Tuple[str, Dict]]:
+        """(path, profile) for every saved profile"""
+        if not os.path.isdir(self.directory):
+            return []
+        found = []
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith('.json'):
+                path = os.path.join(self.directory, name)
+                with open(path, 'r', encoding='utf-8') as f:
+                    found.append((path, json.load(f)))
+        return found
+
+    def version(self) -> str:
+        """Hash of every saved profile, for cache keys: editing a profile changes the output"""
+        digest = hashlib.sha256()
+        if os.path.isdir(self.directory):
+            for name in sorted(os.listdir(self.directory)):
+                if name.endswith('.json'):
+                    digest.update(name.encode('utf-8'))
+                    with open(os.path.join(self.directory, name), 'rb') as f:
+                        digest.update(f.read())
+        return digest.hexdigest()
+
+    def find(self, headers: List[Any], entity: str) -> Optional[Dict]:
+        """The saved profile of this layout for entity, or None"""
+        profile = self.load(schema_fingerprint(headers))
+        return profile if profile is not None and profile.get('entity') == entity else None
+
+    def layout(self, headers: List[Any], rows: Iterable[Any], entity: str) -> Tuple[Dict, Iterator[Any]]:
+        """(profile, rows) for a table: its saved profile, or one detected from the first rows (saved with save_new)
+
+        rows come back unread when the profile was saved before, otherwise
+        with the sampled rows put back in front.
+        """
+        fingerprint = schema_fingerprint(headers)
+        profile = self.load(fingerprint)
+        if profile is not None and profile.get('entity') == entity:
+            check_profile(profile, headers, self.path(fingerprint))
+            print(f"🗂️  Mapping profile {fingerprint} ({entity})")
+            return profile, iter(rows)
+
+        rows = iter(rows)
+        sample = list(islice(rows, SAMPLE_ROWS))
+        detected = detect_profile(headers, sample, entity)
+        if profile is not None:
+            print(f"⚠️  Mapping profile {fingerprint} is for {profile.get('entity')}, not {entity}; detecting columns")
+        elif self.save_new:
+            path = self.save(detected)
+            print(f"🗂️  New layout: saved the detected mapping as {path}")
+            print(f"   Edit it to correct the mapping; later runs of this layout use it")
+        else:
+            print(f"🗂️  New layout {fingerprint}: columns detected; --save-profile saves the mapping as "
+                  f"{self.path(fingerprint)}")
+        return detected, chain(sample, rows)
+
+def table_headers(rows: Iterable[Dict], first: Dict) -> List[Any]:
+    """Headers a table's layout is fingerprinted on: all its columns when the reader
+    selected only some (sources.TableRows), else the keys of its first row"""
+    return list(getattr(rows, 'columns', None) or first.keys())
+
+def profiled_rows(rows: Iterable[Dict], entity: str, profiles: Optional[ProfileStore]) -> Iterator[Dict]:
+    """Dict rows (as read_rows() yields) mapped through their layout's profile; unchanged without a store
+
+    The first row is read right away, so a profile that does not fit the
+    input fails here rather than halfway through a conversion.
+    """
+    if profiles is None:
+        return iter(rows)
+    table, rows = rows, iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return iter(())
+    headers = table_headers(table, first)
+    profile, rows = profiles.layout(headers, chain([first], rows), entity)
+    return apply_to_dicts(rows, profile, headers)
+
+def add_profile_arguments(parser):
+    """The --no-profile / --save-profile / --profile-dir options shared by the converter CLIs"""
+    parser.add_argument('--no-profile', action='store_true',
+                        help='Detect columns on every run; neither use nor save mapping profiles')
+    parser.add_argument('--save-profile', action='store_true',
+                        help='Save the detected mapping of a new layout as its profile (default: only use saved ones)')
+    parser.add_argument('--profile-dir', default=DEFAULT_PROFILE_DIR,
+                        help='Mapping profile directory (default: $HK_PROFILE_DIR or ~/.config/hisabkitab-migration/profiles)')
+
+def open_profiles(args, save_new: Optional[bool] = None) -> Optional[ProfileStore]:
+    """The profile store selected by the CLI options, or None with --no-profile
+
+    New layouts are saved with --save-profile, unless save_new says otherwise.
+    """
+    if args.no_profile:
+        return None
+    return ProfileStore(args.profile_dir, args.save_profile if save_new is None else save_new)
@@ -0,0 +1,660 @@
+"""
+Purchase Conversion
+Turns purchase registers (one row per invoice line, from CSV or XLSX) into
+HisabKitab-Pro suppliers and purchases, with stock and ledger summaries
+"""
+
+import os
+import csv
+import glob
+import multiprocessing
+from datetime import date, datetime
+from functools import lru_cache, partial
+from itertools import chain
+from typing import Callable, Dict, Iterable, Iterator, List, Any, Optional, Tuple
+
+from .fingerprint_index import FingerprintIndex, invoice_fingerprint, line_content_hash, line_fingerprint
+from .xlsx_reader import is_xlsx, read_xlsx_sheet, select_sheets
+
+from .profiles import ProfileStore, profile_columns, row_rewriter
+from .rejects import RejectSink
+from .validation import IssueCounter, check_hsn, validate_record
+
+# Date formats tried in order on text that is not an ISO timestamp
+DATE_FORMATS = [
+    "%d-%b-%Y",      # 07-Apr-2025
+    "%d/%b/%Y",      # 08/Apr/2025
+    "%d-%B-%Y",      # 07-April-2025
+    "%d/%B/%Y",      # 08/April/2025
+    "%d-%m-%Y",      # 07-04-2025
+    "%d/%m/%Y",      # 07/04/2025
+    "%Y-%m-%d",      # 2025-04-07
+    "%d.%m.%Y",      # 07.04.2025
+    "%d %b %Y",      # 07 Apr 2025
+    "%d %B %Y",      # 07 April 2025
+    "%d-%m-%Y %H:%M:%S",  # 07-04-2025 14:30:00
+    "%d/%m/%Y %H:%M",     # 07/04/2025 14:30
+]
+
+def parse_date(date_str: str) -> str:
+    """Convert various date formats to ISO format; text in no known format becomes the current date"""
+    return try_parse_date(date_str) or datetime.now().strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+def try_parse_date(date_str: Any) -> Optional[str]:
+    """parse_date, but None for text in no known format, so the caller can report the row"""
+    if not date_str:
+        return datetime.now().strftime("%Y-%m-%dT%H:%M:%S.000Z")
+    if isinstance(date_str, (datetime, date)):
+        # Typed XLSX cell: already a real date
+        return date_str.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+    
+    # Every line of an invoice repeats its date, so each distinct text is parsed once
+    return _parse_date_text(str(date_str).strip())
+
+@lru_cache(maxsize=4096)
+def _parse_date_text(date_str: str) -> Optional[str]:
+    # SQL and ISO timestamps (2025-04-07 14:30:00, 2025-04-07T14:30:00.123Z) without trying every format
+    if date_str[:4].isdigit() and date_str[4:5] == "-":
+        try:
+            dt = datetime.fromisoformat(date_str.replace("Z", "+00:00"))
+            return dt.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        except ValueError:
+            pass
+    
+    for fmt in DATE_FORMATS:
+        try:
+            dt = datetime.strptime(date_str, fmt)
+            return dt.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        except:
+            continue
+    
+    return None
+
+def clean_string(value: Any) -> str:
+    """Clean and strip string values"""
+    if value is None:
+        return ""
+    return str(value).strip()
+
+def clean_number(value: Any) -> float:
+    """Clean and convert to number"""
+    if value is None:
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        cleaned = str(value).replace(",", "").replace(" ", "").strip()
+        return float(cleaned)
+    except:
+        return 0.0
+
+def clean_int(value: Any) -> int:
+    """Clean and convert to integer"""
+    if value is None:
+        return 0
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        cleaned = str(value).replace(",", "").replace(" ", "").strip()
+        return int(float(cleaned))
+    except:
+        return 0
+
+def find_column_index(headers: List[str], keywords: List[str]) -> Optional[int]:
+    """Find column index by matching keywords"""
+    headers_lower = [str(h or '').lower().strip() for h in headers]
+    for keyword in keywords:
+        for i, header in enumerate(headers_lower):
+            if keyword in header:
+                return i
+    return None
+
+def find_column_named(headers: List[str], names: List[str]) -> Optional[int]:
+    """Find column index by whole name (case, spaces and underscores ignored), for columns
+    whose keywords also occur inside other names ("paid" in "Unpaid" or "Paid Status")"""
+    headers_normal = [' '.join(str(h or '').lower().replace('_', ' ').split()) for h in headers]
+    for name in names:
+        if name in headers_normal:
+            return headers_normal.index(name)
+    return None
+
+def map_purchase_columns(headers: List[str]) -> Dict[str, Optional[int]]:
+    """Find column indices for each purchase field"""
+    return {
+        "supplier_name": find_column_index(headers, ['customer name', 'supplier name', 'vendor name', 'supplier']),
+        "gstin": find_column_index(headers, ['gst number', 'gstin', 'gst no', 'gst']),
+        "invoice_number": find_column_index(headers, ['bill no', 'invoice no', 'invoice number', 'bill number']),
+        "invoice_date": find_column_index(headers, ['bill date', 'invoice date', 'date', 'purchase date']),
+        "hsn_code": find_column_index(headers, ['hsn', 'hsn code', 'hsn_code']),
+        "description": find_column_index(headers, ['desc', 'description', 'product', 'item']),
+        "gst_rate": find_column_index(headers, ['gst%', 'gst rate', 'gst_percent', 'tax rate']),
+        "quantity": find_column_index(headers, ['qty', 'quantity', 'qty']),
+        "unit": find_column_index(headers, ['unit', 'uom', 'unit of measure']),
+        "taxable_amount": find_column_index(headers, ['taxable amt', 'taxable amount', 'subtotal', 'base amount']),
+        "sgst": find_column_index(headers, ['sgst']),
+        "cgst": find_column_index(headers, ['cgst']),
+        "igst": find_column_index(headers, ['igst']),
+        "total_amount": find_column_index(headers, ['bill amt', 'total', 'grand total', 'bill amount']),
+        "amount_paid": find_column_named(headers, ['amount paid', 'paid amount', 'paid amt', 'amt paid', 'paid'])
+    }
+
+def purchase_columns(headers: List[str], data_rows: Iterable[List[Any]], profiles: Optional[ProfileStore] = None
+                     ) -> Tuple[Dict[str, Optional[int]], Iterable[List[Any]], Optional[Callable]]:
+    """Column indices for a register table, its rows and how to rewrite each row before parsing it
+    
+    With a store, the columns come from the layout's mapping profile and the
+    rewrite puts dates and amounts in the usual formats (None when there is
+    nothing to rewrite); otherwise they are detected from the headers. Rows
+    come back as read, so rejects can show them unchanged.
+    """
+    if profiles is None:
+        return map_purchase_columns(headers), data_rows, None
+    profile, data_rows = profiles.layout(headers, data_rows, "purchases")
+    return profile_columns(profile, headers), data_rows, row_rewriter(profile, headers)
+
+def print_column_mapping(columns: Dict[str, Optional[int]]):
+    print(f"📊 Column Mapping:")
+    print(f"   Supplier Name: Column {columns['supplier_name']}")
+    print(f"   Invoice Number: Column {columns['invoice_number']}")
+    print(f"   Invoice Date: Column {columns['invoice_date']}")
+    print(f"   Quantity: Column {columns['quantity']}")
+    print(f"   Total Amount: Column {columns['total_amount']}")
+
+def parse_purchase_rows(data_rows: Iterable[List[Any]], columns: Dict[str, Optional[int]],
+                        rejects: Optional[RejectSink] = None, source: str = "",
+                        rewrite: Optional[Callable] = None) -> List[Dict]:
+    """Clean and type every row into a purchase line; rows that cannot be used are skipped"""
+    return list(iter_purchase_lines(data_rows, columns, rejects, source, rewrite))
+
+def iter_purchase_lines(data_rows: Iterable[List[Any]], columns: Dict[str, Optional[int]],
+                        rejects: Optional[RejectSink] = None, source: str = "",
+                        rewrite: Optional[Callable] = None) -> Iterator[Dict]:
+    """Lazily clean and type rows into purchase lines, skipping rows that cannot be used
+    
+    Skipped rows, and rows whose date could not be parsed, go to rejects
+    (by default a console-only sink) under their source name and row number,
+    with the row as it was read: rewrite (a mapping profile's, see
+    purchase_columns()) is applied only to the copy that is parsed.
+    """
+    if rejects is None:
+        rejects = RejectSink()
+    supplier_name_idx = columns["supplier_name"]
+    gstin_idx = columns["gstin"]
+    invoice_number_idx = columns["invoice_number"]
+    invoice_date_idx = columns["invoice_date"]
+    hsn_code_idx = columns["hsn_code"]
+    description_idx = columns["description"]
+    gst_rate_idx = columns["gst_rate"]
+    quantity_idx = columns["quantity"]
+    unit_idx = columns["unit"]
+    taxable_amount_idx = columns["taxable_amount"]
+    sgst_idx = columns["sgst"]
+    cgst_idx = columns["cgst"]
+    igst_idx = columns["igst"]
+    total_amount_idx = columns["total_amount"]
+    # Optional, and missing from profiles saved before it was mapped
+    amount_paid_idx = columns.get("amount_paid")
+    
+    for row_idx, raw in enumerate(data_rows, 1):
+        if not raw or len(raw) < max(filter(None, [
+            supplier_name_idx, invoice_number_idx, invoice_date_idx
+        ]), default=0) + 1:
+            rejects.reject(source, row_idx, "short_row", raw)
+            continue
+        row = rewrite(raw) if rewrite is not None else raw
+        
+        try:
+            # Extract data
+            supplier_name = clean_string(row[supplier_name_idx]) if supplier_name_idx is not None else ""
+            invoice_number = clean_string(row[invoice_number_idx]) if invoice_number_idx is not None else ""
+            
+            # Skip if essential data is missing
+            if not supplier_name or not invoice_number:
+                rejects.reject(source, row_idx, "missing_key", raw)
+                continue
+            
+            if invoice_date_idx is not None:
+                invoice_date = try_parse_date(row[invoice_date_idx])
+                if invoice_date is None:
+                    rejects.reject(source, row_idx, "bad_date", raw, str(raw[invoice_date_idx]), action="kept")
+                    invoice_date = datetime.now().strftime("%Y-%m-%dT%H:%M:%S.000Z")
+            else:
+                invoice_date = datetime.now().strftime("%Y-%m-%dT%H:%M:%S.000Z")
+            
+            hsn_code = clean_string(row[hsn_code_idx]) if hsn_code_idx is not None else ""
+            line = {
+                "row": row_idx,
+                "supplier_name": supplier_name,
+                "gstin": clean_string(row[gstin_idx]) if gstin_idx is not None else "",
+                "invoice_number": invoice_number,
+                "invoice_date": invoice_date,
+                
+                # Item data
+                "hsn_code": hsn_code,
+                "description": clean_string(row[description_idx]) if description_idx is not None else hsn_code or "Unknown Product",
+                "gst_rate": clean_number(row[gst_rate_idx]) if gst_rate_idx is not None else 0,
+                "quantity": clean_int(row[quantity_idx]) if quantity_idx is not None else 0,
+                "unit": clean_string(row[unit_idx]) if unit_idx is not None else "pcs",
+                "taxable_amount": clean_number(row[taxable_amount_idx]) if taxable_amount_idx is not None else 0,
+                "sgst_amount": clean_number(row[sgst_idx]) if sgst_idx is not None else 0,
+                "cgst_amount": clean_number(row[cgst_idx]) if cgst_idx is not None else 0,
+                "igst_amount": clean_number(row[igst_idx]) if igst_idx is not None else 0,
+                "total_amount": clean_number(row[total_amount_idx]) if total_amount_idx is not None else 0,
+                "amount_paid": clean_number(row[amount_paid_idx]) if amount_paid_idx is not None else None
+            }
+            
+        except Exception as e:
+            rejects.reject(source, row_idx, "row_error", raw, f"{type(e).__name__}: {e}")
+            continue
+        
+        yield line
+
+class PurchaseAssembler:
+    """Groups parsed purchase lines into suppliers and purchases
+    
+    Supplier and purchase ids are allocated in the order lines are added, so
+    feeding the same lines in the same order always gives the same output.
+    When a fingerprint index is given, lines already emitted by an earlier
+    run are dropped (on_duplicate="drop") or kept and flagged in the purchase
+    notes (on_duplicate="flag"). Suppliers and purchases belong to company_id.
+    """
+    
+    def __init__(self, index: Optional[FingerprintIndex] = None, on_duplicate: str = "drop", company_id: int = 1):
+        self.index = index
+        self.on_duplicate = on_duplicate
+        self.company_id = company_id
+        
+        # Group purchases by invoice
+        self.purchases_dict = {}
+        self.suppliers_dict = {}
+        self.purchase_id = 1
+        
+        # Aggregates built in the same pass (see build_summaries)
+        self.stock_dict = {}
+        self.ledger_dict = {}
+        self.issues = IssueCounter()
+        
+        # Fingerprints of what this run emits, recorded once the output is written
+        self.fingerprints = []
+        self.line_occurrences = {}
+        self.duplicate_lines = 0
+    
+    def add_lines(self, lines: Iterable[Dict]) -> List[int]:
+        """Add parsed lines; returns the ids of the purchases they went into"""
+        return [purchase_id for purchase_id in map(self.add_line, lines) if purchase_id is not None]
+    
+    def add_line(self, line: Dict) -> Optional[int]:
+        """Add one parsed line; returns its purchase id, or None if it was dropped"""
+        supplier_name = line["supplier_name"]
+        gstin = line["gstin"]
+        invoice_number = line["invoice_number"]
+        invoice_date = line["invoice_date"]
+        hsn_code = line["hsn_code"]
+        description = line["description"]
+        gst_rate = line["gst_rate"]
+        quantity = line["quantity"]
+        taxable_amount = line["taxable_amount"]
+        sgst_amount = line["sgst_amount"]
+        cgst_amount = line["cgst_amount"]
+        igst_amount = line["igst_amount"]
+        total_amount = line["total_amount"]
+        amount_paid = line.get("amount_paid")
+        
+        # Check against invoices/lines emitted by earlier runs
+        invoice_fp = invoice_fingerprint(gstin, supplier_name, invoice_number, invoice_date)
+        content_hash = line_content_hash(description, hsn_code, quantity, total_amount)
+        occurrence = self.line_occurrences.get((invoice_fp, content_hash), 0)
+        self.line_occurrences[(invoice_fp, content_hash)] = occurrence + 1
+        line_fp = line_fingerprint(invoice_fp, content_hash, occurrence)
+        
+        is_duplicate = self.index is not None and line_fp in self.index
+        if is_duplicate:
+            self.duplicate_lines += 1
+            if self.on_duplicate == "drop":
+                return None
+        
+        # Create supplier if not exists
+        supplier_key = supplier_name.upper().strip()
+        if supplier_key not in self.suppliers_dict:
+            supplier_id = len(self.suppliers_dict) + 1
+            self.suppliers_dict[supplier_key] = {
+                "id": supplier_id,
+                "name": supplier_name.strip(),
+                "gstin": gstin,
+                "email": "",
+                "phone": "",
+                "address": "",
+                "city": "",
+                "state": "",
+                "pincode": "",
+                "contact_person": "",
+                "is_registered": bool(gstin),
+                "company_id": self.company_id,
+                "created_at": invoice_date,
+                "updated_at": invoice_date
+            }
+            self.issues.add(validate_record(self.suppliers_dict[supplier_key]))
+            self.ledger_dict[supplier_id] = {
+                "supplier_id": supplier_id,
+                "supplier_name": supplier_name.strip(),
+                "total_purchases": 0,
+                "total_paid": 0,
+                "pending_amount": 0,
+                "invoice_count": 0
+            }
+        
+        supplier_id = self.suppliers_dict[supplier_key]["id"]
+        ledger = self.ledger_dict[supplier_id]
+        
+        # Create purchase key (supplier + invoice + date)
+        purchase_key = f"{supplier_key}_{invoice_number}_{invoice_date[:10]}"
+        
+        if purchase_key not in self.purchases_dict:
+            self.purchases_dict[purchase_key] = {
+                "id": self.purchase_id,
+                "type": "gst",
+                "supplier_id": supplier_id,
+                "supplier_name": supplier_name.strip(),
+                "invoice_number": invoice_number,
+                "purchase_date": invoice_date,
+                "items": [],
+                "subtotal": 0,
+                "total_tax": 0,
+                "grand_total": 0,
+                "payment_status": "pending",
+                "payment_method": "cash",
+                "notes": "",
+                "company_id": self.company_id,
+                "created_by": 1,
+                "created_at": invoice_date,
+                "updated_at": invoice_date
+            }
+            self.purchase_id += 1
+            ledger["invoice_count"] += 1
+            self.fingerprints.append(("invoice", invoice_fp))
+            if self.index is not None and invoice_fp in self.index:
+                self.purchases_dict[purchase_key]["notes"] = "Invoice already converted in an earlier run"
+        
+        purchase = self.purchases_dict[purchase_key]
+        if is_duplicate:
+            purchase["notes"] = "Possible duplicate: contains lines already converted in an earlier run"
+        self.fingerprints.append(("line", line_fp))
+        
+        # Calculate unit price
+        unit_price = taxable_amount / quantity if quantity > 0 else 0
+        
+        # Calculate tax rates
+        cgst_rate = (cgst_amount / taxable_amount * 100) if taxable_amount > 0 else 0
+        sgst_rate = (sgst_amount / taxable_amount * 100) if taxable_amount > 0 else 0
+        igst_rate = (igst_amount / taxable_amount * 100) if taxable_amount > 0 else 0
+        
+        # Use provided GST rate or calculate from tax amounts
+        if gst_rate == 0:
+            gst_rate = cgst_rate + sgst_rate + igst_rate
+        
+        # Create purchase item
+        item = {
+            "product_id": None,
+            "product_name": description,
+            "quantity": quantity,
+            "unit_price": unit_price,
+            "purchase_price": unit_price,
+            "hsn_code": hsn_code,
+            "gst_rate": round(gst_rate, 2),
+            "cgst_rate": round(cgst_rate, 2) if cgst_rate > 0 else None,
+            "sgst_rate": round(sgst_rate, 2) if sgst_rate > 0 else None,
+            "igst_rate": round(igst_rate, 2) if igst_rate > 0 else None,
+            "tax_amount": round(cgst_amount + sgst_amount + igst_amount, 2),
+            "total": round(total_amount, 2),
+            "article": "",
+            "barcode": ""
+        }
+        # GSTINs are checked once per supplier; HSN codes per line, memoized per code
+        hsn_issues = check_hsn(hsn_code) if hsn_code else ()
+        if hsn_issues:
+            item["issues"] = list(hsn_issues)
+            self.issues.add(hsn_issues)
+        
+        purchase["items"].append(item)
+        purchase["subtotal"] = round(purchase["subtotal"] + taxable_amount, 2)
+        purchase["total_tax"] = round(purchase["total_tax"] + (cgst_amount + sgst_amount + igst_amount), 2)
+        purchase["grand_total"] = round(purchase["grand_total"] + total_amount, 2)
+        
+        # Running stock per product; items are not linked to product ids yet, so
+        # products are keyed by description and HSN code (see product_key)
+        stock_key = product_key(description, hsn_code)
+        if stock_key not in self.stock_dict:
+            self.stock_dict[stock_key] = {
+                "product_key": stock_key,
+                "product_id": None,
+                "product_name": description,
+                "hsn_code": hsn_code,
+                "stock_quantity": 0
+            }
+        self.stock_dict[stock_key]["stock_quantity"] += quantity
+        
+        # Amount paid as the register's paid column says, summed over the lines like the totals;
+        # without one the purchase stays pending
+        if amount_paid is not None:
+            purchase["amount_paid"] = round(purchase.get("amount_paid", 0) + amount_paid, 2)
+            if purchase["amount_paid"] <= 0:
+                purchase["payment_status"] = "pending"
+            elif purchase["amount_paid"] >= purchase["grand_total"]:
+                purchase["payment_status"] = "paid"
+            else:
+                purchase["payment_status"] = "partial"
+        
+        # Supplier ledger, same rules as get_supplier_ledger_summary() (amount_paid, else nothing paid)
+        ledger["total_purchases"] = round(ledger["total_purchases"] + total_amount, 2)
+        ledger["total_paid"] = round(ledger["total_paid"] + (amount_paid or 0), 2)
+        ledger["pending_amount"] = round(max(0, ledger["total_purchases"] - ledger["total_paid"]), 2)
+        
+        return purchase["id"]
+    
+    def result(self) -> Dict:
+        if self.duplicate_lines:
+            action = "Dropped" if self.on_duplicate == "drop" else "Flagged"
+            print(f"🔁 {action} {self.duplicate_lines} line(s) already converted in earlier runs")
+        
+        return {
+            "suppliers": list(self.suppliers_dict.values()),
+            "purchases": list(self.purchases_dict.values()),
+            "summaries": build_summaries(list(self.stock_dict.values()), list(self.ledger_dict.values()),
+                                         self.issues.to_dict()),
+            "fingerprints": self.fingerprints
+        }
+
+def iter_purchases(rows: Iterable[Any], headers: Optional[List[str]] = None,
+                   assembler: Optional[PurchaseAssembler] = None, rejects: Optional[RejectSink] = None,
+                   profiles: Optional[ProfileStore] = None) -> Iterator[Dict]:
+    """Convert purchase register rows and yield the purchases in id order
+    
+    rows are lists (headers given, or taken from the first row) or dicts such
+    as read_rows() yields. This is eager: lines of one invoice may be
+    anywhere in the input, so every row is read and every purchase held
+    before the first is yielded (iter_purchase_lines() is the lazy stage).
+    Pass an assembler to get the suppliers and summaries from it afterwards,
+    a RejectSink to collect the rows that were skipped, and a ProfileStore
+    to map columns by the layout's profile.
+    """
+    assembler = assembler if assembler is not None else PurchaseAssembler()
+    rows = iter(rows)
+    if headers is None:
+        first = next(rows, None)
+        if first is None:
+            return
+        if isinstance(first, dict):
+            headers = list(first.keys())
+            rows = ([row.get(h) for h in headers] for row in chain([first], rows))
+        else:
+            headers = first
+    
+    columns, rows, rewrite = purchase_columns(headers, rows, profiles)
+    assembler.add_lines(iter_purchase_lines(rows, columns, rejects, rewrite=rewrite))
+    yield from assembler.purchases_dict.values()
+
+def convert_purchase_data(data_rows: Iterable[List[Any]], headers: List[str],
+                          index: Optional[FingerprintIndex] = None, on_duplicate: str = "drop",
+                          company_id: int = 1, rejects: Optional[RejectSink] = None, source: str = "",
+                          profiles: Optional[ProfileStore] = None) -> Dict:
+    """Convert purchase data rows to HisabKitab-Pro format"""
+    return convert_purchase_tables([(source, headers, data_rows)], index, on_duplicate, company_id, rejects, profiles)
+
+def convert_purchase_tables(tables: Iterable[Tuple], index: Optional[FingerprintIndex] = None,
+                            on_duplicate: str = "drop", company_id: int = 1,
+                            rejects: Optional[RejectSink] = None, profiles: Optional[ProfileStore] = None) -> Dict:
+    """Convert several (headers, rows) tables, e.g. the sheets of a workbook, into one id space
+    
+    Tables may also be (name, headers, rows), as iter_input_tables() yields;
+    the name is what rejected rows are reported under.
+    """
+    assembler = PurchaseAssembler(index, on_duplicate, company_id)
+    if rejects is None:
+        rejects = RejectSink()
+    for *name, headers, data_rows in tables:
+        columns, data_rows, rewrite = purchase_columns(headers, data_rows, profiles)
+        print_column_mapping(columns)
+        assembler.add_lines(parse_purchase_rows(data_rows, columns, rejects, name[0] if name else "", rewrite))
+    return assembler.result()
+
+def iter_input_tables(file_path: str, sheets: Optional[List[str]] = None) -> Iterator[Tuple[str, List[str], Iterable[List[Any]]]]:
+    """Yield (name, headers, rows) for a CSV file, or for each selected sheet of an XLSX workbook
+    
+    The name is the file name, plus [sheet] for workbooks.
+    """
+    if not is_xlsx(file_path):
+        yield (os.path.basename(file_path), *stream_csv_file(file_path))
+        return
+    for sheet in select_sheets(file_path, sheets):
+        print(f"   📄 Sheet: {sheet}")
+        yield (f"{os.path.basename(file_path)}[{sheet}]", *read_xlsx_sheet(file_path, sheet))
+
+def read_input_tables(file_path: str, sheets: Optional[List[str]] = None) -> Iterator[Tuple[List[str], Iterable[List[Any]]]]:
+    """Yield (headers, rows) for a CSV file, or for each selected sheet of an XLSX workbook"""
+    for _, headers, data_rows in iter_input_tables(file_path, sheets):
+        yield headers, data_rows
+
+def parse_purchase_file(file_path: str, sheets: Optional[List[str]] = None, rejects: Optional[RejectSink] = None,
+                        profiles: Optional[ProfileStore] = None) -> Tuple[str, List[Dict]]:
+    """Read and parse one CSV/XLSX file (runs in a worker process in batch mode)"""
+    if rejects is None:
+        rejects = RejectSink()
+    lines = []
+    for name, headers, data_rows in iter_input_tables(file_path, sheets):
+        columns, data_rows, rewrite = purchase_columns(headers, data_rows, profiles)
+        lines.extend(parse_purchase_rows(data_rows, columns, rejects, name, rewrite))
+    return file_path, lines
+
+def _parse_purchase_file_rejects(file_path: str, sheets: Optional[List[str]] = None,
+                                 profiles: Optional[ProfileStore] = None) -> Tuple[str, List[Dict], List[Dict]]:
+    """Batch mode worker: parse_purchase_file, handing the rejected rows back to the parent's sink"""
+    rejects = RejectSink(console_limit=0, keep=True)
+    _, lines = parse_purchase_file(file_path, sheets, rejects, profiles)
+    return file_path, lines, rejects.entries
+
+def find_input_files(pattern: str) -> List[str]:
+    """Expand a directory or glob pattern into a sorted list of CSV/XLSX files"""
+    if os.path.isdir(pattern):
+        return sorted(glob.glob(os.path.join(pattern, "*.csv")) + glob.glob(os.path.join(pattern, "*.xlsx")))
+    return sorted(glob.glob(pattern))
+
+def convert_purchase_files(file_paths: List[str], workers: Optional[int] = None,
+                           index: Optional[FingerprintIndex] = None, on_duplicate: str = "drop",
+                           sheets: Optional[List[str]] = None, company_id: int = 1,
+                           rejects: Optional[RejectSink] = None, profiles: Optional[ProfileStore] = None) -> Dict:
+    """Convert many CSV/XLSX files into one id space
+    
+    Files are parsed in parallel worker processes; lines are then assembled in
+    sorted file order, so supplier and purchase ids are the same on every run
+    regardless of which worker finishes first.
+    """
+    assembler = PurchaseAssembler(index, on_duplicate, company_id)
+    purchase_ids_by_file = {}
+    if rejects is None:
+        rejects = RejectSink()
+    
+    with multiprocessing.Pool(workers) as pool:
+        for file_path, lines, rejected in pool.imap(partial(_parse_purchase_file_rejects, sheets=sheets, profiles=profiles), file_paths):
+            rejects.extend(rejected)
+            purchase_ids_by_file[file_path] = sorted(set(assembler.add_lines(lines)))
+            print(f"   ✔ {os.path.basename(file_path)}: {len(lines)} lines")
+    
+    result = assembler.result()
+    result["purchase_ids_by_file"] = purchase_ids_by_file
+    return result
+
+def split_into_shards(result: Dict) -> List[Tuple[str, List[Dict], List[Dict]]]:
+    """One (file, suppliers, purchases) shard per input file, each with the suppliers it references"""
+    purchases_by_id = {p["id"]: p for p in result["purchases"]}
+    suppliers_by_id = {s["id"]: s for s in result["suppliers"]}
+    
+    shards = []
+    for file_path, purchase_ids in result["purchase_ids_by_file"].items():
+        purchases = [purchases_by_id[pid] for pid in purchase_ids]
+        supplier_ids = sorted({p["supplier_id"] for p in purchases})
+        shards.append((file_path, [suppliers_by_id[sid] for sid in supplier_ids], purchases))
+    return shards
+
+def product_key(description: str, hsn_code: str) -> str:
+    """Key of a purchased product in the stock summary: upper-cased description and HSN code"""
+    return f"{' '.join(description.upper().split())}|{hsn_code.strip()}"
+
+def build_summaries(stock_levels: List[Dict], supplier_ledger: List[Dict], validation: Optional[Dict] = None) -> Dict:
+    """Build the precomputed aggregates block written next to the backup data"""
+    summaries = {
+        "stock_levels": stock_levels,
+        "supplier_ledger": sorted(supplier_ledger, key=lambda s: s["pending_amount"], reverse=True)
+    }
+    if validation is not None:
+        summaries["validation"] = validation
+    return summaries
+
+def read_csv_file(file_path: str) -> tuple[List[str], List[List[str]]]:
+    """Read CSV file and return headers and rows"""
+    headers = []
+    rows = []
+    
+    with open(file_path, 'r', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        headers = next(reader, [])
+        rows = list(reader)
+    
+    return headers, rows
+
+def stream_csv_file(file_path: str) -> Tuple[List[str], Iterator[List[str]]]:
+    """Headers and a lazy iterator over the rows of a CSV file (closed once the rows are read)"""
+    f = open(file_path, 'r', encoding='utf-8')
+    reader = csv.reader(f)
+    headers = next(reader, [])
+    
+    def rows():
+        with f:
+            yield from reader
+    return headers, rows()
+
+def create_backup_json(suppliers: List[Dict], purchases: List[Dict], company_id: int = 1, summaries: Dict = None) -> Dict:
+    """Create HisabKitab-Pro backup JSON structure"""
+    backup = {
+        "version": "1.0.0",
+        "export_date": datetime.now().strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+        "export_by": "csv_purchase_converter",
+        "data": {
+            "companies": [],
+            "users": [],
+            "products": [],
+            "categories": [],
+            "sales": [],
+            "purchases": purchases,
+            "suppliers": suppliers,
+            "customers": [],
+            "sales_persons": [],
+            "category_commissions": [],
+            "sub_categories": [],
+            "sales_person_category_assignments": [],
+            "stock_adjustments": [],
+            "settings": {}
+        }
+    }
+    if summaries:
+        backup["summaries"] = summaries
+    return backup
@@ -0,0 +1,121 @@
+"""
+Rejected Rows
+Rows a converter skips (or keeps with a substituted value) go to a buffered
+rejects file with their row number, reason code and raw values, and are
+counted per reason; the console only shows the first few and a running count
+"""
+
+import os
+import csv
+import json
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+# Reason code -> what the console and summary say about it
+REASONS = {
+    'short_row': 'too few columns',
+    'missing_key': 'missing supplier name or invoice number',
+    'row_error': 'could not be converted',
+    'bad_date': 'unparseable date, converted with today\'s date',
+}
+
+REJECT_FIELDS = ('source', 'row', 'reason', 'action', 'detail', 'raw')
+
+# Rejects printed one by one before the console switches to a running count
+CONSOLE_LIMIT = 5
+
+def rejects_path(output: str, fmt: str = 'ndjson') -> str:
+    """<output stem>.rejects.<fmt>, next to the backup (and restored with it from the cache)"""
+    return f"{os.path.splitext(output)[0]}.rejects.{fmt}"
+
+class RejectSink:
+    """Counts rejected rows and writes them to a rejects file (.csv, otherwise NDJSON)
+
+    The file is opened on the first reject, so clean inputs leave none
+    behind; one left at path by an earlier run is removed right away, so it
+    cannot pass for this run's. Without a path only the counts and console output remain. keep
+    holds the entries in memory as well: worker processes hand them to the
+    parent's sink with extend(). console_limit=0 silences the console.
+    """
+
+    def __init__(self, path: Optional[str] = None, console_limit: int = CONSOLE_LIMIT,
+                 console_interval: float = 10.0, keep: bool = False):
+        self.path = path
+        self.console_limit = console_limit
+        self.console_interval = console_interval
+        self.counts = Counter()
+        self.total = 0
+        self.entries: Optional[List[Dict]] = [] if keep else None
+        self._file = None
+        self._csv = None
+        self._last_log = time.monotonic()
+        if path:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def reject(self, source: str, row: int, reason: str, raw: Any = None, detail: str = '', action: str = 'skipped'):
+        """Record one row; action is 'skipped', or 'kept' when the row was converted with a substitute value"""
+        self.add({'source': source, 'row': row, 'reason': reason, 'action': action, 'detail': detail,
+                  'raw': list(raw) if raw is not None else None})
+
+    def add(self, entry: Dict):
+        self.counts[entry['reason']] += 1
+        self.total += 1
+        if self.entries is not None:
+            self.entries.append(entry)
+        if self.path:
+            self._write(entry)
+        self._log(entry)
+
+    def extend(self, entries: Iterable[Dict]):
+        for entry in entries:
+            self.add(entry)
+
+    def _write(self, entry: Dict):
+        if self._file is None:
+            self._file = open(self.path, 'w', encoding='utf-8', newline='', buffering=1 << 20)
+            if self.path.lower().endswith('.csv'):
+                self._csv = csv.writer(self._file)
+                self._csv.writerow(REJECT_FIELDS)
+        if self._csv is not None:
+            self._csv.writerow([entry['source'], entry['row'], entry['reason'], entry['action'], entry['detail'],
+                                json.dumps(entry['raw'], ensure_ascii=False, default=str)])
+        else:
+            self._file.write(json.dumps(entry, ensure_ascii=False, default=str) + '\n')
+
+    def _log(self, entry: Dict):
+        if not self.console_limit:
+            return
+        if self.total <= self.console_limit:
+            where = f"{entry['source']} " if entry['source'] else ''
+            detail = f" ({entry['detail']})" if entry['detail'] else ''
+            print(f"⚠️  {where}row {entry['row']}: {REASONS.get(entry['reason'], entry['reason'])}{detail}")
+            if self.total == self.console_limit:
+                print(f"   Further rejects are only counted{' and written to ' + self.path if self.path else ''}")
+        elif time.monotonic() - self._last_log >= self.console_interval:
+            self._last_log = time.monotonic()
+            print(f"⚠️  {self.total} problem rows so far")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+    @property
+    def written(self) -> bool:
+        """Whether a rejects file was created"""
+        return self._file is not None
+
+    def summary(self) -> Dict:
+        return {'rejected': self.total, 'reasons': dict(self.counts.most_common())}
+
+def print_rejects(sink: RejectSink):
+    if not sink.total:
+        return
+    print(f"⚠️  {sink.total} problem row(s):")
+    for reason, count in sink.counts.most_common():
+        print(f"   {reason}: {count} ({REASONS.get(reason, reason)})")
+    if sink.written:
+        print(f"   Rows, reasons and raw values: {sink.path}")
@@ -0,0 +1,381 @@
+"""
+Sales Conversion
+Groups invoice lines (one row per sold item, from CSV, SQLite or SQL dumps)
+into HisabKitab-Pro sales with items, payment methods and linked customers,
+holding only the invoices still open instead of the whole sales history
+"""
+
+import re
+from collections import OrderedDict
+from functools import partial
+from itertools import chain
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .backup_stream import open_writer
+
+from .entities import FIELD_MAPPINGS, create_backup_json
+from .purchases import clean_number, clean_string, parse_date
+from .validation import IssueCounter, validate_record
+
+# Invoices kept open at once (see SalesAssembler); a few MB of memory
+DEFAULT_MAX_OPEN = 10000
+
+# Payment method names seen in shop exports -> the app's methods (cash, card, upi, credit, other)
+PAYMENT_ALIASES = {
+    'cash': 'cash',
+    'upi': 'upi', 'gpay': 'upi', 'google pay': 'upi', 'phonepe': 'upi', 'paytm': 'upi', 'bhim': 'upi',
+    'card': 'card', 'credit card': 'card', 'debit card': 'card', 'pos': 'card', 'swipe': 'card',
+    'credit': 'credit', 'due': 'credit', 'udhar': 'credit', 'udhaar': 'credit',
+    'other': 'other', 'cheque': 'other', 'bank': 'other', 'neft': 'other', 'imps': 'other',
+}
+
+# Invoice-level amount columns, one per payment method
+PAYMENT_COLUMNS = {'cash_amount': 'cash', 'upi_amount': 'upi', 'card_amount': 'card'}
+
+WALK_IN_NAMES = ('', 'walk-in', 'walk in', 'walkin', 'cash', 'cash customer', 'counter sale')
+
+def map_sale_columns(headers: List[str]) -> Dict[str, Optional[str]]:
+    """Source column for each sale line field; the earlier name in FIELD_MAPPINGS wins"""
+    lowered = {}
+    for header in headers:
+        lowered.setdefault(str(header).lower().strip(), header)
+    return {field: next((lowered[name] for name in names if name in lowered), None)
+            for field, names in FIELD_MAPPINGS['sales'].items()}
+
+def normalize_payment_method(name: str) -> str:
+    name = name.lower().strip()
+    return PAYMENT_ALIASES.get(name) or PAYMENT_ALIASES.get(name.split()[0] if name else '', 'other')
+
+def parse_payment_methods(text: str, amount: float) -> List[Dict]:
+    """'Cash', 'cash+upi' or 'Cash: 500, UPI 300' as payment_methods
+
+    Methods without an amount get what is left of amount: the first one all
+    of it, any others 0 (they are kept so the method mix is not lost).
+    """
+    payments = []
+    unpriced = []
+    for part in re.split(r'[,;/+&|]', text):
+        part = part.strip()
+        name = re.sub(r'[\d.:=\-\s]+$', '', part).strip()
+        if not name:
+            continue
+        number = re.search(r'\d[\d,]*(?:\.\d+)?', part[len(name):])
+        payment = {'method': normalize_payment_method(name),
+                   'amount': clean_number(number.group()) if number else None}
+        payments.append(payment)
+        if payment['amount'] is None:
+            unpriced.append(payment)
+
+    remaining = round(max(0.0, amount - sum(p['amount'] for p in payments if p['amount'] is not None)), 2)
+    for number, payment in enumerate(unpriced):
+        payment['amount'] = remaining if number == 0 else 0
+    return payments
+
+def parse_sale_line(row: Dict, columns: Dict[str, Optional[str]]) -> Optional[Dict]:
+    """Clean and type one invoice line; None when it has no invoice number"""
+    def value(field):
+        header = columns[field]
+        return row.get(header) if header is not None else None
+
+    invoice_number = clean_string(value('invoice_number'))
+    if not invoice_number:
+        return None
+
+    quantity = clean_number(value('quantity')) if columns['quantity'] is not None else 1.0
+    unit_price = clean_number(value('unit_price'))
+    discount = clean_number(value('discount'))
+    total = clean_number(value('total')) if columns['total'] is not None else unit_price * quantity - discount
+    sale_type = clean_string(value('sale_type')).lower()
+    is_return = 'return' in sale_type or quantity < 0 or total < 0
+    quantity, total = abs(quantity), abs(total)
+    if columns['unit_price'] is None:
+        unit_price = total / quantity if quantity else 0.0
+    customer_id = clean_string(value('customer_id'))
+
+    return {
+        "invoice_number": invoice_number,
+        "sale_date": parse_date(value('sale_date')),
+        "customer_id": int(float(customer_id)) if customer_id.replace('.', '', 1).isdigit() else None,
+        "customer_name": clean_string(value('customer_name')),
+        "customer_phone": clean_string(value('customer_phone')),
+        "product_id": int(clean_number(value('product_id'))) or None,
+        "product_name": clean_string(value('product_name')) or "Unknown Product",
+        "barcode": clean_string(value('barcode')),
+        "quantity": int(quantity) if quantity == int(quantity) else quantity,
+        "unit_price": round(unit_price, 2),
+        "mrp": clean_number(value('mrp')) or None,
+        "discount": round(discount, 2),
+        "tax_amount": clean_number(value('tax_amount')),
+        "total": round(total, 2),
+        "sale_type": "return" if is_return else "sale",
+        "grand_total": clean_number(value('grand_total')) if columns['grand_total'] is not None else None,
+        "payment_method": clean_string(value('payment_method')),
+        "paid_amount": clean_number(value('paid_amount')) if columns['paid_amount'] is not None else None,
+        "method_amounts": {method: clean_number(value(field)) for field, method in PAYMENT_COLUMNS.items()
+                           if columns[field] is not None},
+        "sales_person_name": clean_string(value('sales_person_name')),
+        "notes": clean_string(value('notes'))
+    }
+
+def parse_sale_batch(rows: List[Dict], columns: Dict[str, Optional[str]]) -> List[Dict]:
+    """Pipeline conversion stage: parse a batch of rows (grouping stays in one place, the writer)"""
+    return [line for line in map(partial(parse_sale_line, columns=columns), rows) if line is not None]
+
+class SalesAssembler:
+    """Groups parsed sale lines into sales, keeping at most max_open invoices in memory
+
+    Sales tables are written invoice by invoice, so the lines of one invoice
+    arrive close together. When more than max_open invoices are open, the one
+    touched least recently is closed and handed back to the caller. A line
+    for an invoice closed shortly before starts a new sale with the same
+    invoice number, noted on the sale and counted in split_invoices; raise
+    max_open if that happens.
+
+    Customers come from a customer_id column when the source has one (convert
+    the customers table with the same ids), otherwise they are created here,
+    one per phone number or name.
+    """
+
+    def __init__(self, company_id: int = 1, max_open: int = DEFAULT_MAX_OPEN):
+        self.company_id = company_id
+        self.max_open = max_open
+        self.open_sales = OrderedDict()
+        self.sale_id = 1
+        self.customers_dict = {}
+        self.issues = IssueCounter()
+
+        # Keys of recently closed invoices, to notice invoices split by a too small window
+        self.recently_closed = OrderedDict()
+        self.split_invoices = 0
+        self.lines = 0
+        self.sales = 0
+
+    def add_lines(self, lines: Iterable[Dict]) -> Iterator[Dict]:
+        """Add parsed lines; yields the sales closed to make room for them"""
+        for line in lines:
+            yield from self.add_line(line)
+
+    def add_line(self, line: Dict) -> List[Dict]:
+        """Add one parsed line; returns the sales it closed (usually none)"""
+        self.lines += 1
+        key = (line["invoice_number"], line["sale_date"][:10])
+        closed = []
+
+        sale = self.open_sales.get(key)
+        if sale is None:
+            if len(self.open_sales) >= self.max_open:
+                closed.append(self._close(next(iter(self.open_sales))))
+            sale = self._open(line)
+            if key in self.recently_closed:
+                self.split_invoices += 1
+                sale["notes"] = "Continues an invoice of the same number; its lines were far apart in the source"
+            self.open_sales[key] = sale
+        else:
+            self.open_sales.move_to_end(key)
+
+        item = {
+            "product_id": line["product_id"],
+            "product_name": line["product_name"],
+            "barcode": line["barcode"],
+            "quantity": line["quantity"],
+            "unit_price": line["unit_price"],
+            "mrp": line["mrp"],
+            "discount": line["discount"],
+            "sale_type": line["sale_type"],
+            "total": line["total"]
+        }
+        if line["sales_person_name"] and line["sales_person_name"] != sale["sales_person_name"]:
+            item["sales_person_name"] = line["sales_person_name"]
+        sale["items"].append(item)
+
+        sign = -1 if line["sale_type"] == "return" else 1
+        sale["subtotal"] = round(sale["subtotal"] + sign * line["total"], 2)
+        sale["tax_amount"] = round(sale["tax_amount"] + sign * line["tax_amount"], 2)
+        return closed
+
+    def _customer(self, line: Dict, sale_date: str) -> Tuple[Optional[int], str]:
+        name = line["customer_name"]
+        if line["customer_id"] is not None:
+            return line["customer_id"], name
+
+        phone = re.sub(r'\D', '', line["customer_phone"])[-10:]
+        if not phone and name.lower() in WALK_IN_NAMES:
+            return None, name
+
+        key = phone or name.upper()
+        if key not in self.customers_dict:
+            self.customers_dict[key] = {
+                "id": len(self.customers_dict) + 1,
+                "name": name or phone,
+                "email": "",
+                "phone": phone,
+                "gstin": "",
+                "address": "",
+                "city": "",
+                "state": "",
+                "pincode": "",
+                "contact_person": "",
+                "credit_limit": 0,
+                "credit_balance": 0,
+                "is_active": True,
+                "company_id": self.company_id,
+                "created_at": sale_date,
+                "updated_at": sale_date
+            }
+            self.issues.add(validate_record(self.customers_dict[key]))
+        customer = self.customers_dict[key]
+        return customer["id"], customer["name"]
+
+    def _open(self, line: Dict) -> Dict:
+        sale_date = line["sale_date"]
+        customer_id, customer_name = self._customer(line, sale_date)
+        sale = {
+            "id": self.sale_id,
+            "invoice_number": line["invoice_number"],
+            "customer_id": customer_id,
+            "customer_name": customer_name,
+            "sales_person_id": None,
+            "sales_person_name": line["sales_person_name"] or None,
+            "sale_date": sale_date,
+            "items": [],
+            "subtotal": 0,
+            "tax_amount": 0,
+            "grand_total": 0,
+            "payment_status": "paid",
+            "payment_method": "cash",
+            "payment_methods": [],
+            "return_amount": 0,
+            "credit_applied": 0,
+            "credit_added": 0,
+            "notes": line["notes"],
+            "company_id": self.company_id,
+            "created_by": 1,
+            "archived": False,
+            "created_at": sale_date,
+            "updated_at": sale_date,
+            # Invoice-level columns repeat on every line; the first line's are kept until close
+            "_payment": (line["grand_total"], line["payment_method"], line["paid_amount"], line["method_amounts"])
+        }
+        self.sale_id += 1
+        return sale
+
+    def _close(self, key: Tuple[str, str]) -> Dict:
+        sale = self.open_sales.pop(key)
+        grand_total, method_text, paid_amount, method_amounts = sale.pop("_payment")
+        sale["grand_total"] = round(grand_total if grand_total is not None else sale["subtotal"], 2)
+        if sale["grand_total"] < 0:
+            # More returned than bought: nothing to pay, the difference goes back to the customer
+            sale["return_amount"] = -sale["grand_total"]
+            sale["grand_total"] = 0
+
+        paid = paid_amount if paid_amount is not None else sale["grand_total"]
+        payments = [{"method": method, "amount": round(amount, 2)}
+                    for method, amount in method_amounts.items() if amount]
+        if not payments and method_text:
+            payments = parse_payment_methods(method_text, paid)
+        if not payments:
+            payments = [{"method": "cash", "amount": round(paid, 2)}]
+        sale["payment_methods"] = payments
+        sale["payment_method"] = payments[0]["method"]
+
+        if paid_amount is None:
+            paid = sum(p["amount"] for p in payments if p["method"] != "credit")
+        if paid + 0.005 < sale["grand_total"]:
+            sale["payment_status"] = "pending"
+
+        self.recently_closed[key] = None
+        if len(self.recently_closed) > self.max_open * 4:
+            self.recently_closed.popitem(last=False)
+        self.sales += 1
+        return sale
+
+    def flush(self) -> List[Dict]:
+        """Close every open sale, in id order (open_sales is kept least recently used first)"""
+        keys = sorted(self.open_sales, key=lambda key: self.open_sales[key]["id"])
+        return [self._close(key) for key in keys]
+
+    def customers(self) -> List[Dict]:
+        return list(self.customers_dict.values())
+
+    def counts(self) -> Dict[str, int]:
+        return {'lines': self.lines, 'sales': self.sales, 'customers': len(self.customers_dict),
+                'split_invoices': self.split_invoices, 'customer_issues': self.issues.records}
+
+    def summaries(self) -> Dict:
+        return {'validation': self.issues.to_dict()}
+
+def iter_sales(rows: Iterable[Dict], company_id: int = 1, assembler: Optional[SalesAssembler] = None,
+               max_open: int = DEFAULT_MAX_OPEN) -> Iterator[Dict]:
+    """Convert invoice line rows (dicts, as read_rows() yields) and yield sales as their invoices close
+
+    Pass an assembler to get the customers and counts from it afterwards.
+    """
+    assembler = assembler if assembler is not None else SalesAssembler(company_id, max_open)
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return
+    columns = map_sale_columns(list(first.keys()))
+    lines = (line for line in map(partial(parse_sale_line, columns=columns), chain([first], rows)) if line is not None)
+    yield from assembler.add_lines(lines)
+    yield from assembler.flush()
+
+def convert_sales_rows(data: Iterable[Dict], company_id: int = 1) -> Tuple[Dict, List[Dict]]:
+    """In-memory conversion (see convert_rows); returns the backup JSON and the sales"""
+    assembler = SalesAssembler(company_id)
+    sales = list(iter_sales(data, assembler=assembler))
+    backup = create_backup_json(sales=sales, customers=assembler.customers(), company_id=company_id,
+                                summaries=assembler.summaries())
+    return backup, sales
+
+def print_sales_counts(counts: Dict[str, int]):
+    print(f"   🧾 {counts['lines']} lines → {counts['sales']} sales, {counts['customers']} new customers")
+    if counts['split_invoices']:
+        print(f"   ⚠️  {counts['split_invoices']} invoice(s) had lines far apart and were split;"
+              f" raise --max-open-invoices")
+    if counts['customer_issues']:
+        print(f"   🔍 {counts['customer_issues']} new customer(s) with an invalid phone; see their \"issues\" field")
+
+def write_sales_backup(data: Iterable[Dict], output: str, company_id: int = 1,
+                       max_open: int = DEFAULT_MAX_OPEN) -> Dict[str, int]:
+    """Stream sales into a backup (.gz/.bz2/.xz) or staging database (.sqlite/.db) as invoices close; returns counts"""
+    assembler = SalesAssembler(company_id, max_open)
+    with open_writer(output, export_by='sql_migration') as writer:
+        writer.write_entity('sales', iter_sales(data, assembler=assembler))
+        writer.write_entity('customers', assembler.customers())
+        writer.close({'summaries': assembler.summaries()})
+    return assembler.counts()
+
+def convert_sales_streaming(data: Iterable[Dict], output: str, company_id: int = 1, batch_size: int = 1000,
+                            queue_size: int = 4, executor: str = 'process', workers: Optional[int] = None,
+                            max_open: int = DEFAULT_MAX_OPEN) -> Tuple[Dict[str, int], Dict]:
+    """write_sales_backup as pipeline stages; returns (counts, queue metrics)
+
+    Lines are parsed on a process (or thread) pool and grouped by the writer
+    stage, which sees the batches in read order.
+    """
+    from .pipeline import batched, run_pipeline
+
+    if executor == 'process':
+        from concurrent.futures import ProcessPoolExecutor as PoolExecutor
+    else:
+        from concurrent.futures import ThreadPoolExecutor as PoolExecutor
+
+    rows = iter(data)
+    first = next(rows, None)
+    columns = map_sale_columns(list(first.keys()) if first is not None else [])
+    assembler = SalesAssembler(company_id, max_open)
+
+    with open_writer(output, export_by='sql_migration') as writer:
+        writer.begin_entity('sales')
+        with PoolExecutor(max_workers=workers) as pool:
+            metrics = run_pipeline(
+                batched(chain([first], rows) if first is not None else [], batch_size),
+                partial(parse_sale_batch, columns=columns),
+                lambda lines: writer.write_records(assembler.add_lines(lines)), pool, queue_size
+            )
+        writer.write_records(assembler.flush())
+        writer.end_entity()
+        writer.write_entity('customers', assembler.customers())
+        writer.close({'summaries': assembler.summaries()})
+    return assembler.counts(), metrics
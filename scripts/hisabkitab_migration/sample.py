@@ -0,0 +1,283 @@
+"""
+Sample Preview
+Draws a small sample of an input in one pass and runs the real conversion on
+it, to check the detected column mapping and project the size and runtime
+of the full conversion before committing to a huge file
+"""
+
+import os
+import json
+import math
+import time
+import random
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .xlsx_reader import is_xlsx
+
+from .entities import FIELD_MAPPINGS, convert_rows, find_matching_field
+from .profiles import ProfileStore, apply_to_dicts, normalize_header, open_profiles, table_headers
+from .purchases import PurchaseAssembler, create_backup_json, iter_purchase_lines, purchase_columns, read_input_tables
+from .sources import SOURCES, count_sqlite_rows, iter_dump_rows
+
+# reservoir samples each table of a SQL dump and each file/sheet of a purchase register
+# on its own (stratified); there is no separate stratified mode
+SAMPLE_MODES = ('reservoir', 'head')
+
+_END = object()
+
+def reservoir_sample(items: Iterable[Any], size: int, rng: random.Random) -> Tuple[List[Any], int]:
+    """Uniform sample of up to size items in one pass; returns (sample, items seen)
+
+    Algorithm L: after the reservoir fills, it jumps over a random number of
+    items between replacements instead of drawing a random number per item.
+    """
+    iterator = iter(items)
+    reservoir = list(islice(iterator, size))
+    seen = len(reservoir)
+    if seen < size:
+        return reservoir, seen
+
+    # 1 - random() is in (0, 1], so log() never sees zero
+    weight = math.exp(math.log(1.0 - rng.random()) / size)
+    while True:
+        skip = math.floor(math.log(1.0 - rng.random()) / math.log(1.0 - weight)) if weight < 1.0 else 0
+        skipped = sum(1 for _ in islice(iterator, skip))
+        seen += skipped
+        if skipped < skip:
+            return reservoir, seen
+        item = next(iterator, _END)
+        if item is _END:
+            return reservoir, seen
+        seen += 1
+        reservoir[rng.randrange(size)] = item
+        weight *= math.exp(math.log(1.0 - rng.random()) / size)
+
+def head_sample(items: Iterable[Any], size: int) -> Tuple[List[Any], Optional[int]]:
+    """First size items; the total is only known (and returned) when the input ran out"""
+    iterator = iter(items)
+    sample = list(islice(iterator, size))
+    if next(iterator, _END) is _END:
+        return sample, len(sample)
+    return sample, None
+
+def take_sample(items: Iterable[Any], size: int, mode: str = 'reservoir',
+                seed: Optional[int] = None) -> Tuple[List[Any], Optional[int]]:
+    """(sample, total items or None when the head of the input was enough)"""
+    if mode == 'head':
+        return head_sample(items, size)
+    return reservoir_sample(items, size, random.Random(seed))
+
+def stratified_sample(keyed_items: Iterable[Tuple[Any, Any]], size: int,
+                      seed: Optional[int] = None) -> Dict[Any, Tuple[List[Any], int]]:
+    """Up to size items per key (e.g. per dump table) in one pass; key -> (sample, items seen)"""
+    rng = random.Random(seed)
+    strata = {}
+    for key, item in keyed_items:
+        stratum = strata.setdefault(key, [[], 0])
+        stratum[1] += 1
+        if len(stratum[0]) < size:
+            stratum[0].append(item)
+        else:
+            # Algorithm R: keys interleave, so each stratum draws per item
+            slot = rng.randrange(stratum[1])
+            if slot < size:
+                stratum[0][slot] = item
+    return {key: (sample, seen) for key, (sample, seen) in strata.items()}
+
+def estimate_csv_rows(file_path: str, sample_rows: List[List[Any]]) -> Optional[int]:
+    """Row count of a CSV file guessed from its size and the sampled rows' width"""
+    if not sample_rows:
+        return None
+    row_bytes = sum(len(','.join(str(v) for v in row).encode('utf-8')) + 1 for row in sample_rows) / len(sample_rows)
+    return int(os.path.getsize(file_path) / row_bytes)
+
+def format_bytes(size: float) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+def backup_size(backup: Dict) -> int:
+    """Bytes the backup takes when written the way the converters write it"""
+    return len(json.dumps(backup, indent=2, ensure_ascii=False).encode('utf-8'))
+
+def print_projection(total: Optional[int], sample_count: int, read_seconds: float, full_pass: bool,
+                     convert_seconds: float, sample_bytes: int, empty_bytes: int, estimated: bool = False):
+    """Scale the sample's read time, conversion time and output size up to the whole input
+
+    read_seconds covers the whole input after a full pass (reservoir), or
+    just the sampled head otherwise.
+    """
+    if not total:
+        print(f"\n📐 Projection: row count unknown after a head sample; use --sample-mode reservoir")
+        return
+    if not full_pass:
+        read_seconds = read_seconds / sample_count * total
+    per_row_bytes = (sample_bytes - empty_bytes) / sample_count
+    convert_total = convert_seconds / sample_count * total
+    about = '~' if estimated else ''
+    print(f"\n📐 Projection for {about}{total:,} rows{' (estimated from the file size)' if estimated else ''}:")
+    print(f"   Output size: ~{format_bytes(empty_bytes + per_row_bytes * total)}")
+    print(f"   Runtime: ~{read_seconds + convert_total:.1f}s in one process"
+          f" (reading ~{read_seconds:.1f}s, converting ~{convert_total:.1f}s)")
+
+def print_records(records: List[Dict], limit: int = 3):
+    print(f"\n🔎 Converted sample ({min(limit, len(records))} of {len(records)}):")
+    for record in records[:limit]:
+        print(json.dumps(record, indent=2, ensure_ascii=False, default=str))
+
+def preview_entities(sample: List[Dict], entity: str, company_id: int, total: Optional[int],
+                     read_seconds: float, full_pass: bool, estimated: bool = False,
+                     profile: Optional[Dict] = None) -> List[Dict]:
+    """Print the column mapping and converted sample of one entity, with a projection; returns the records
+
+    With a mapping profile, the sample is mapped through it and its mapping is the one printed.
+    """
+    if not sample:
+        print("⚠️  No rows to sample")
+        return []
+
+    headers = list(sample[0].keys())
+    rows = sample if profile is None else list(apply_to_dicts(sample, profile, headers))
+    started = time.perf_counter()
+    backup, records = convert_rows(rows, entity, company_id)
+    convert_seconds = time.perf_counter() - started
+
+    # Columns named exactly like a record field are read directly, without a mapping
+    fields = set(records[0].keys()) if records else set()
+    sources = {}
+    print(f"📊 Column mapping ({entity}{', from its profile' if profile else ''}):")
+    for header in headers:
+        if profile is not None:
+            field = next((f for f, h in profile['columns'].items()
+                              if h is not None and normalize_header(h) == normalize_header(header)), None)
+        else:
+            field = find_matching_field(header, entity)
+            if field is None and header in fields:
+                field = header
+        print(f"   {header} → {field or '(not mapped)'}")
+        if field:
+            sources.setdefault(field, []).append(header)
+    for field, columns in sources.items():
+        if len(columns) > 1:
+            print(f"   ⚠️  {field} comes from {', '.join(columns)}; the last one wins")
+    unmapped = [field for field in FIELD_MAPPINGS[entity] if field not in sources]
+    if unmapped:
+        print(f"   Not found (defaults used): {', '.join(unmapped)}")
+
+    print_records(records)
+    print_projection(total, len(sample), read_seconds, full_pass, convert_seconds,
+                     backup_size(backup), backup_size(convert_rows([], entity, company_id)[0]), estimated)
+    return records
+
+def preview_purchases(strata: List[Tuple[str, List[str], List[List[Any]], Optional[int]]],
+                      read_seconds: float, full_pass: bool, estimated: bool = False,
+                      profiles: Optional[ProfileStore] = None) -> Dict:
+    """Print mappings and the converted sample of purchase register tables, with a projection
+
+    strata holds (label, headers, sampled rows, total rows or None) per file or sheet;
+    with profiles, known layouts are mapped by their profile.
+    """
+    assembler = PurchaseAssembler()
+    printed = []
+    sample_count = 0
+    convert_seconds = 0.0
+    for label, headers, rows, seen in strata:
+        columns, rows, rewrite = purchase_columns(headers, rows, profiles)
+        rows = list(rows)
+        if columns not in printed:
+            printed.append(columns)
+            print(f"📊 Column mapping ({label}):")
+            for field, index in columns.items():
+                source = f"{headers[index]!r} (column {index})" if index is not None else '(not found)'
+                print(f"   {field}: {source}")
+        sample_count += len(rows)
+        started = time.perf_counter()
+        assembler.add_lines(iter_purchase_lines(rows, columns, rewrite=rewrite))
+        convert_seconds += time.perf_counter() - started
+
+    if not sample_count:
+        print("⚠️  No rows to sample")
+        return {}
+
+    result = assembler.result()
+    print_records(result['purchases'])
+    totals = [seen for _, _, _, seen in strata]
+    total = None if None in totals else sum(totals)
+    backup = create_backup_json(result['suppliers'], result['purchases'], summaries=result['summaries'])
+    print_projection(total, sample_count, read_seconds, full_pass, convert_seconds,
+                     backup_size(backup), backup_size(create_backup_json([], [])), estimated)
+    if total:
+        print("   Sampled lines rarely share an invoice, so the output size is an upper bound")
+    return result
+
+def preview_entity_input(args) -> List[Dict]:
+    """--sample for sql-to-json-converter.py: sample the input in one pass and preview its conversion"""
+    started = time.perf_counter()
+    estimated = False
+    # A preview writes nothing, so a new layout's detected profile is not saved
+    profiles = args.profiles = open_profiles(args, save_new=False)
+    headers = None
+    if args.type == 'sql':
+        target = (args.table or args.entity).lower()
+        if args.sample_mode == 'head':
+            rows = (row for table, row in iter_dump_rows(args.input) if table.lower() == target)
+            sample, total = head_sample(rows, args.sample)
+        else:
+            # One pass over every table, so a wrong --table shows what the dump does hold
+            strata = stratified_sample(iter_dump_rows(args.input, args.workers), args.sample, args.seed)
+            print(f"📚 Tables in the dump:")
+            for name, (_, seen) in sorted(strata.items()):
+                print(f"   {name}: {seen:,} rows")
+            match = next((name for name in strata if name.lower() == target), None)
+            if match is None:
+                raise ValueError(f"no rows found for table '{target}'; use --table to pick one of the tables above")
+            sample, total = strata[match]
+    else:
+        rows = SOURCES[args.type]['reader'](args)
+        sample, total = take_sample(rows, args.sample, args.sample_mode, args.seed)
+        headers = table_headers(rows, sample[0]) if sample else None
+        if total is None and args.type == 'sqlite':
+            total = count_sqlite_rows(args.input, args.table)
+        elif total is None and args.type == 'csv':
+            total = estimate_csv_rows(args.input, [list(row.values()) for row in sample])
+            estimated = True
+    read_seconds = time.perf_counter() - started
+
+    print(f"🎲 Sampled {len(sample)} rows ({args.sample_mode}) in {read_seconds:.2f}s\n")
+    if profiles and sample:
+        profile = profiles.layout(headers or list(sample[0].keys()), sample, args.entity)[0]
+    else:
+        profile = None
+    return preview_entities(sample, args.entity, args.company_id, total, read_seconds,
+                            args.sample_mode != 'head', estimated, profile)
+
+def preview_purchase_input(file_paths: List[str], args) -> Dict:
+    """--sample for csv-purchase-converter-advanced.py: sample every file/sheet (stratified) and preview"""
+    started = time.perf_counter()
+    strata = []
+    estimated = False
+    for file_path in file_paths:
+        for number, (headers, rows) in enumerate(read_input_tables(file_path, args.sheet), 1):
+            sample, seen = take_sample(rows, args.sample, args.sample_mode, args.seed)
+            if seen is None and not is_xlsx(file_path):
+                seen = estimate_csv_rows(file_path, sample)
+                estimated = True
+            label = os.path.basename(file_path) + (f" #{number}" if number > 1 else '')
+            strata.append((label, headers, sample, seen))
+    read_seconds = time.perf_counter() - started
+
+    print(f"🎲 Sampled {sum(len(s[2]) for s in strata)} rows ({args.sample_mode}) from {len(strata)} table(s)"
+          f" in {read_seconds:.2f}s\n")
+    return preview_purchases(strata, read_seconds, args.sample_mode != 'head', estimated,
+                             open_profiles(args, save_new=False))
+
+def add_sample_arguments(parser):
+    """The --sample / --sample-mode / --seed options shared by the converter CLIs"""
+    parser.add_argument('--sample', type=int, metavar='N',
+                        help='Preview: convert N sampled rows, print the mapping and project the full run; writes nothing')
+    parser.add_argument('--sample-mode', choices=SAMPLE_MODES, default='reservoir',
+                        help='reservoir: uniform, N rows per table / file / sheet (one full read); '
+                             'head: first N rows only (default: reservoir)')
+    parser.add_argument('--seed', type=int, help='Random seed for a repeatable reservoir sample')
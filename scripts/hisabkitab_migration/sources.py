@@ -0,0 +1,308 @@
+"""
+Input Sources
+Registry of the backends rows can be read from (CSV, XLSX, SQL dumps,
+SQLite, MySQL); optional dependencies are imported only when used
+"""
+
+import csv
+import importlib
+import importlib.util
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+def read_csv_file(file_path: str) -> Iterator[Dict]:
+    """Stream rows of a CSV file as dictionaries"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        yield from csv.DictReader(f)
+
+def read_xlsx_file(file_path: str, sheets: Optional[List[str]] = None) -> Iterator[Dict]:
+    """Stream rows of the selected sheets of an XLSX workbook as dictionaries, keeping typed cells"""
+    from .xlsx_reader import read_xlsx_sheet, select_sheets
+    
+    for sheet in select_sheets(file_path, sheets):
+        headers, rows = read_xlsx_sheet(file_path, sheet)
+        for row in rows:
+            # Empty cells read as '' like they do from a CSV export
+            yield {header: '' if value is None else value for header, value in zip(headers, row) if header}
+
+def read_sqlite_db(db_path: str, table_name: str) -> Iterator[Dict]:
+    """Stream rows of a SQLite table as dictionaries"""
+    import sqlite3
+    
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        for row in conn.execute(f"SELECT * FROM {table_name}"):
+            yield dict(row)
+    finally:
+        conn.close()
+
+def count_sqlite_rows(db_path: str, table_name: str) -> int:
+    import sqlite3
+    
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+    finally:
+        conn.close()
+
+# Rows pulled off the socket per fetch from an unbuffered cursor
+MYSQL_FETCH_SIZE = 1000
+
+def quote_mysql(name: str) -> str:
+    return '`' + name.replace('`', '``') + '`'
+
+def mysql_table_layout(conn, database: str, table: str) -> Tuple[List[str], List[str]]:
+    """(column names, primary key columns) of a MySQL table"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT COLUMN_NAME FROM information_schema.COLUMNS"
+                       " WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s ORDER BY ORDINAL_POSITION", (database, table))
+        columns = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT COLUMN_NAME FROM information_schema.KEY_COLUMN_USAGE"
+                       " WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND CONSTRAINT_NAME = 'PRIMARY'"
+                       " ORDER BY ORDINAL_POSITION", (database, table))
+        key = [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+    if not columns:
+        raise ValueError(f"table '{table}' not found in MySQL database '{database}'")
+    return columns, key
+
+class TableRows:
+    """Rows of a table read with only some of its columns selected
+
+    columns is the table's full column list: a layout is fingerprinted on it
+    (see profiles.table_headers), not on the columns that were selected.
+    """
+
+    def __init__(self, rows: Iterable[Dict], columns: List[str]):
+        self.rows = rows
+        self.columns = columns
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self.rows)
+
+def projected_columns(columns: List[str], entity: Optional[str], profile: Optional[Dict] = None) -> List[str]:
+    """The columns the entity's conversion reads; all of them when none map (or no entity is known)
+
+    With the layout's mapping profile, that is the columns the profile maps,
+    whatever their names.
+    """
+    if not entity:
+        return list(columns)
+    if profile is not None:
+        from .profiles import normalize_header
+        mapped = {normalize_header(h) for h in profile['columns'].values() if h is not None}
+        return [c for c in columns if normalize_header(c) in mapped] or list(columns)
+    from .entities import CONVERTERS, FIELD_MAPPINGS, find_matching_field
+    
+    direct = set(FIELD_MAPPINGS.get(entity, {}))
+    if entity in CONVERTERS:
+        # Converters also read columns named exactly like one of their record fields
+        direct |= set(CONVERTERS[entity]({}, []).keys())
+    wanted = [c for c in columns if c in direct or find_matching_field(c, entity)]
+    return wanted or list(columns)
+
+def iter_mysql_rows(conn, table: str, columns: List[str], key: List[str], page_size: int = 10000) -> Iterator[Dict]:
+    """Stream rows of a MySQL table as dictionaries, closing the connection at the end
+    
+    Rows come through an unbuffered cursor, so they are converted as they
+    arrive. With a primary key the table is read in key order, page by page
+    (WHERE key > last key seen), all in one consistent snapshot: no query
+    runs for long, and no page costs more than the one before it as OFFSET
+    would. Without a key it is one streamed SELECT.
+    """
+    select = f"SELECT {', '.join(map(quote_mysql, columns))} FROM {quote_mysql(table)}"
+    order = ', '.join(map(quote_mysql, key))
+    try:
+        conn.start_transaction(consistent_snapshot=True, readonly=True)
+        cursor = conn.cursor(dictionary=True)
+        try:
+            if not key:
+                cursor.execute(select)
+                for rows in iter(lambda: cursor.fetchmany(MYSQL_FETCH_SIZE), []):
+                    yield from rows
+                return
+            
+            last = None
+            while True:
+                if last is None:
+                    cursor.execute(f"{select} ORDER BY {order} LIMIT {int(page_size)}")
+                else:
+                    placeholders = ', '.join(['%s'] * len(key))
+                    cursor.execute(f"{select} WHERE ({order}) > ({placeholders}) ORDER BY {order} LIMIT {int(page_size)}",
+                                   last)
+                count = 0
+                for rows in iter(lambda: cursor.fetchmany(MYSQL_FETCH_SIZE), []):
+                    count += len(rows)
+                    last = tuple(rows[-1][k] for k in key)
+                    yield from rows
+                if count < page_size:
+                    return
+        finally:
+            cursor.close()
+    finally:
+        conn.close()
+
+def iter_dump_rows(file_path: str, workers: int = 1) -> Iterator[Tuple[str, Dict]]:
+    """Stream (table, row dictionary) for every INSERT/COPY row of a SQL dump"""
+    from .sql_dump import iter_sql_rows
+    
+    for table_name, columns, values in iter_sql_rows(file_path, workers):
+        names = [columns[i] if i < len(columns) else f"column_{i + 1}" for i in range(len(values))]
+        yield table_name, dict(zip(names, values))
+
+def iter_dump_table(file_path: str, table_name: str, workers: int = 1) -> Iterator[Dict]:
+    """Stream the rows of one table (name matched case-insensitively) of a SQL dump
+    
+    Raises ValueError once the dump has been read without finding a row of
+    the table, i.e. on the first pull when the table is missing.
+    """
+    wanted = table_name.lower()
+    found = False
+    for name, row in iter_dump_rows(file_path, workers):
+        if name.lower() == wanted:
+            found = True
+            yield row
+    if not found:
+        raise ValueError(f"no rows found for table '{table_name}'; use --table to pick the dump's table name")
+
+def parse_sql_dump(file_path: str, table_names: Optional[List[str]] = None, workers: int = 1) -> Dict[str, List[Dict]]:
+    """Parse INSERT/COPY rows of a SQL dump into per-table lists of dictionaries
+    
+    Only tables in table_names are kept when it is given. With workers > 1
+    the dump is memory-mapped and its byte ranges are parsed in parallel.
+    Everything is held in memory; converters stream with iter_dump_table().
+    """
+    data = {}
+    wanted = {name.lower() for name in table_names} if table_names else None
+    
+    for table_name, row in iter_dump_rows(file_path, workers):
+        if wanted is None or table_name.lower() in wanted:
+            data.setdefault(table_name, []).append(row)
+    
+    return data
+
+# Input backends selectable with --type: name -> reader(args) and its optional
+# dependency. Dependencies are imported only when their source is used, so the
+# CSV path starts with nothing beyond the standard library.
+SOURCES: Dict[str, Dict[str, Any]] = {}
+
+def register_source(name: str, description: str, requires: Optional[str] = None, install: Optional[str] = None,
+                    extensions: tuple = ()):
+    """Decorator adding a reader(args) -> List[Dict] to SOURCES"""
+    def decorator(reader: Callable) -> Callable:
+        SOURCES[name] = {
+            'reader': reader,
+            'description': description,
+            'requires': requires,
+            'install': install or requires,
+            'extensions': extensions
+        }
+        return reader
+    return decorator
+
+def source_for_path(path: str) -> Optional[str]:
+    """Source name for a file, chosen by its extension"""
+    lower = path.lower()
+    for name, source in SOURCES.items():
+        if source['extensions'] and lower.endswith(source['extensions']):
+            return name
+    return None
+
+def source_available(name: str) -> bool:
+    """Whether a source's optional dependency is installed (checked without importing it)"""
+    requires = SOURCES[name]['requires']
+    return requires is None or importlib.util.find_spec(requires.split('.')[0]) is not None
+
+def import_optional(module_name: str, source: str):
+    """Import a source's optional dependency, failing with an install hint"""
+    try:
+        return importlib.import_module(module_name)
+    except ImportError:
+        install = SOURCES[source]['install']
+        raise ImportError(f"the '{source}' source needs {install} (pip install {install})") from None
+
+@register_source('csv', 'CSV export with a header row', extensions=('.csv',))
+def _read_csv_source(args) -> Iterator[Dict]:
+    return read_csv_file(args.input)
+
+@register_source('sqlite', 'SQLite database file (--table)', extensions=('.db', '.sqlite', '.sqlite3'))
+def _read_sqlite_source(args) -> Iterator[Dict]:
+    if not args.table:
+        raise ValueError("--table required for SQLite input")
+    return read_sqlite_db(args.input, args.table)
+
+@register_source('sql', 'SQL dump: mysqldump/phpMyAdmin INSERTs or pg_dump COPY data (--table, --workers)',
+                 extensions=('.sql', '.dump'))
+def _read_sql_dump_source(args) -> Iterator[Dict]:
+    table_name = args.table or args.entity
+    print(f"📂 Parsing SQL dump: {args.input} (table: {table_name}, workers: {args.workers})")
+    return iter_dump_table(args.input, table_name, args.workers)
+
+@register_source('xlsx', 'Excel workbook, streamed sheet by sheet (--sheet)', requires='openpyxl',
+                 extensions=('.xlsx', '.xlsm'))
+def _read_xlsx_source(args) -> Iterator[Dict]:
+    import_optional('openpyxl', 'xlsx')
+    from .xlsx_reader import select_sheets
+    
+    # Resolve the sheets up front so a wrong --sheet fails before conversion starts
+    return read_xlsx_file(args.input, select_sheets(args.input, args.sheet))
+
+@register_source('mysql', 'Live MySQL/MariaDB database, streamed by primary key (--host, --user, --database, --table)',
+                 requires='mysql.connector', install='mysql-connector-python')
+def _read_mysql_source(args) -> Iterator[Dict]:
+    if not args.table or not args.database:
+        raise ValueError("--database and --table required for MySQL input")
+    connector = import_optional('mysql.connector', 'mysql')
+    try:
+        conn = connector.connect(host=args.host, port=args.port, user=args.user,
+                                 password=args.password, database=args.database)
+    except connector.Error as e:
+        raise ValueError(f"cannot connect to MySQL: {e}") from None
+    try:
+        columns, key = mysql_table_layout(conn, args.database, args.table)
+    except Exception:
+        conn.close()
+        raise
+    # A saved profile of this layout says which columns to read, standard names or not
+    profiles = getattr(args, 'profiles', None)
+    profile = profiles.find(columns, args.entity) if profiles is not None else None
+    selected = projected_columns(columns, args.entity, profile)
+    selected += [k for k in key if k not in selected]
+    paging = f"paging by {', '.join(key)}, {args.page_size} rows per page" if key else "no primary key, one streamed query"
+    print(f"🔌 Streaming MySQL {args.database}.{args.table}: {len(selected)} of {len(columns)} columns, {paging}")
+    return TableRows(iter_mysql_rows(conn, args.table, selected, key, args.page_size), columns)
+
+def print_sources():
+    """List registered input sources and whether their dependencies are installed"""
+    print("📦 Input sources (--type):")
+    for name, source in SOURCES.items():
+        if source_available(name):
+            print(f"   ✅ {name:<8} {source['description']}")
+        else:
+            print(f"   ⚠️  {name:<8} {source['description']} [needs: pip install {source['install']}]")
+
+# Options every reader may look at; read_rows() fills in the ones not given
+SOURCE_DEFAULTS = {
+    'input': None, 'table': None, 'entity': None, 'sheet': None, 'workers': 1,
+    'host': 'localhost', 'port': 3306, 'user': 'root', 'password': '', 'database': None, 'page_size': 10000,
+    'profiles': None,
+}
+
+def read_rows(path: Optional[str] = None, source: Optional[str] = None, **options) -> Iterable[Dict]:
+    """Rows of one input as dictionaries, e.g. read_rows('items.xlsx', sheet=['Stock'])
+
+    The source is picked from the file extension unless given; options are
+    the CLI's (table, entity, sheet, workers, host, port, user, password, database,
+    page_size) and profiles, the ProfileStore whose profiles pick MySQL columns.
+    """
+    source = source or (source_for_path(path) if path else None)
+    if source not in SOURCES:
+        raise ValueError(f"no input source for {path!r}; choose one of: {', '.join(SOURCES)}")
+    unknown = set(options) - set(SOURCE_DEFAULTS)
+    if unknown:
+        raise TypeError(f"unknown source option(s): {', '.join(sorted(unknown))}")
+    args = SimpleNamespace(**{**SOURCE_DEFAULTS, **options, 'input': path, 'type': source})
+    return SOURCES[source]['reader'](args)
@@ -0,0 +1,560 @@
+"""
+SQL Dump Scanning
+Statement-aware reading of SQL dump files (mysqldump, pg_dump, phpMyAdmin)
+over a memory map, either in one pass or split into statement-aligned byte
+ranges that a process pool scans in parallel
+"""
+
+import os
+import re
+import mmap
+import multiprocessing
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Ranges handed to each worker; several per worker keeps the pool busy when
+# INSERT-heavy and DDL-only stretches of a dump take very different times
+RANGES_PER_WORKER = 4
+MIN_RANGE_SIZE = 4 << 20   # 4 MB: smaller files are not worth a process pool
+MAX_RANGE_SIZE = 16 << 20  # 16 MB: bounds what one worker sends back at a time
+# Ranges submitted ahead of the one being consumed, per worker; finished
+# results wait in the parent, so this bounds its memory when the consumer is slower
+IN_FLIGHT_PER_WORKER = 2
+
+# Statements buffered by the scanner; everything else (INSERT, COPY, SET, ...) is skipped
+DDL_PREFIXES = (
+    'CREATE TABLE', 'CREATE TEMPORARY TABLE', 'CREATE UNLOGGED TABLE',
+    'ALTER TABLE', 'CREATE INDEX', 'CREATE UNIQUE INDEX'
+)
+
+# Runs of plain SQL text and complete quoted strings/identifiers (matched on the raw bytes)
+_SQL_TEXT = re.compile(rb"""(?:[^'"`;#/-]+|'[^'\\]*(?:\\.[^'\\]*)*'|"[^"\\]*(?:\\.[^"\\]*)*"|`[^`]*`|-(?=[^-])|/(?=[^*]))+""", re.DOTALL)
+
+_IDENT = r'(?:`[^`]+`|"[^"]+"|\[[^\]]+\]|[\w$]+)'
+_CREATE_TABLE_HEAD = re.compile(
+    r'CREATE\s+(?:TEMPORARY\s+|UNLOGGED\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?'
+    r'((?:' + _IDENT + r'\s*\.\s*)?' + _IDENT + r')\s*\(', re.IGNORECASE)
+_ALTER_TABLE_HEAD = re.compile(
+    r'ALTER\s+TABLE\s+(?:ONLY\s+)?(?:IF\s+EXISTS\s+)?((?:' + _IDENT + r'\s*\.\s*)?' + _IDENT + r')\s+', re.IGNORECASE)
+_CREATE_INDEX = re.compile(
+    r'CREATE\s+(UNIQUE\s+)?INDEX\s+(?:CONCURRENTLY\s+)?(?:IF\s+NOT\s+EXISTS\s+)?(' + _IDENT + r')\s+ON\s+(?:ONLY\s+)?'
+    r'((?:' + _IDENT + r'\s*\.\s*)?' + _IDENT + r')(?:\s+USING\s+\w+)?\s*\(', re.IGNORECASE)
+_COLUMN_TYPE = re.compile(
+    r'(\w+(?:\s+(?:varying|precision))?)(?:\s*(\([^)]*\)))?((?:\s+(?:unsigned|zerofill|with(?:out)?\s+time\s+zone))*)(\[\])?',
+    re.IGNORECASE)
+_DEFAULT = re.compile(r"\bDEFAULT\s+('(?:[^']|'')*'|\([^)]*\)|[^\s,]+)", re.IGNORECASE)
+_REFERENCES = re.compile(r'\bREFERENCES\s+((?:' + _IDENT + r'\s*\.\s*)?' + _IDENT + r')\s*(\([^)]*\))?', re.IGNORECASE)
+
+# Candidate range cut points: right after a ';' that ends its line
+_BOUNDARY = re.compile(rb';[ \t]*\r?\n')
+
+class SqlStatementScanner:
+    """Quote- and comment-aware SQL statement splitter over a memory-mapped dump
+    
+    Yields only statements whose leading keywords match one of `prefixes`.
+    The bodies of all other statements (e.g. multi-GB INSERT sections) are
+    stepped over in place and never copied, so memory stays flat regardless
+    of file size. `start`/`stop` limit the scan to a byte range: it begins at
+    `start`, which must be a statement boundary, and ends with the first
+    statement finishing at or after `stop`; where that was is left in
+    `next_start`.
+    """
+    
+    HEAD_SIZE = 64
+    
+    def __init__(self, file_path: str, prefixes=DDL_PREFIXES, copy_rows: bool = False,
+                 start: int = 0, stop: Optional[int] = None):
+        self.file_path = file_path
+        self.prefixes = tuple(p.upper() for p in prefixes)
+        self.copy_rows = copy_rows
+        self.start = start
+        self.stop = stop
+        self.next_start = None
+    
+    def __iter__(self) -> Iterator[str]:
+        return (text for kind, text in self.iter_items() if kind == 'statement')
+    
+    def iter_items(self) -> Iterator[Tuple[str, str]]:
+        """Yield ('statement', text), plus ('copy_row', line) for COPY data when copy_rows is set"""
+        with open(self.file_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if self.start >= size:
+                self.next_start = size
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                yield from self._scan(buf, size)
+    
+    def _scan(self, buf, size: int) -> Iterator[Tuple[str, str]]:
+        stop = size if self.stop is None else self.stop
+        match_text = _SQL_TEXT.match
+        pos = self.start
+        # The current statement as (start, end) byte spans; None stands for a comment
+        spans = []
+        
+        while pos < size:
+            match = match_text(buf, pos)
+            if match:
+                spans.append((pos, match.end()))
+                pos = match.end()
+                if pos >= size:
+                    break
+            
+            char = buf[pos:pos + 1]
+            if char == b';':
+                pos += 1
+                statement, copy_data = self._finish(buf, spans)
+                spans = []
+                if statement:
+                    yield 'statement', statement
+                if copy_data:
+                    pos = yield from self._copy_data(buf, pos, size)
+                if pos >= stop:
+                    break
+            elif char in (b"'", b'"', b'`'):
+                # Quoted text left open runs to the end of the file
+                spans.append((pos, size))
+                pos = size
+            elif char == b'#' or buf[pos:pos + 2] == b'--':
+                end = buf.find(b'\n', pos)
+                pos = size if end < 0 else end + 1
+                spans.append(None)
+            elif buf[pos:pos + 2] == b'/*':
+                end = buf.find(b'*/', pos + 2)
+                pos = size if end < 0 else end + 2
+                spans.append(None)
+            else:
+                spans.append((pos, pos + 1))
+                pos += 1
+        
+        if pos >= size:
+            statement, _ = self._finish(buf, spans)
+            if statement:
+                yield 'statement', statement
+        self.next_start = min(pos, size)
+    
+    def _finish(self, buf, spans: List) -> Tuple[Optional[str], bool]:
+        """End the current statement; returns (statement if kept, whether COPY data follows)"""
+        head = ''
+        for span in spans:
+            head += ' ' if span is None else buf[span[0]:min(span[1], span[0] + self.HEAD_SIZE)].decode('utf-8', 'replace')
+            head = ' '.join(head.split()).upper()
+            if len(head) >= self.HEAD_SIZE:
+                break
+        # COPY statements are always looked at: their data block has to be skipped
+        is_copy = head.startswith('COPY ')
+        keep = head.startswith(self.prefixes)
+        if not keep and not is_copy:
+            return None, False
+        
+        statement = b''.join(b' ' if span is None else buf[span[0]:span[1]] for span in spans)
+        statement = statement.decode('utf-8', 'replace').strip()
+        # pg_dump COPY ... FROM stdin is followed by raw rows ending at a "\." line
+        copy_data = is_copy and ' '.join(statement.split()).upper().endswith('FROM STDIN')
+        return (statement if keep else None), copy_data
+    
+    def _copy_data(self, buf, pos: int, size: int):
+        """Consume a COPY data block, yielding its lines when copy_rows is set; returns the end position"""
+        if not self.copy_rows:
+            end = buf.find(b'\n\\.', pos)
+            return size if end < 0 else end + 3
+        
+        # The rest of the COPY statement's own line is not data
+        first = True
+        while pos < size:
+            end = buf.find(b'\n', pos)
+            if end < 0:
+                end = size
+            line = buf[pos:end].rstrip(b'\r').decode('utf-8', 'replace')
+            pos = end + 1
+            if line == '\\.':
+                break
+            if line or not first:
+                yield 'copy_row', line
+            first = False
+        return min(pos, size)
+
+def split_ranges(file_path: str, parts: int) -> List[Tuple[int, int]]:
+    """Cut a dump into about `parts` byte ranges at candidate statement ends
+    
+    A cut can still land inside a quoted string, comment or COPY block;
+    scan_ranges() detects that and rescans from the true boundary.
+    """
+    size = os.path.getsize(file_path)
+    parts = min(parts, size // MIN_RANGE_SIZE)
+    if parts <= 1:
+        return [(0, size)]
+    
+    cuts = [0]
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        for i in range(1, parts):
+            found = _BOUNDARY.search(buf, max(size * i // parts, cuts[-1]))
+            if not found:
+                break
+            if found.start() + 1 > cuts[-1]:
+                cuts.append(found.start() + 1)
+    cuts.append(size)
+    return list(zip(cuts, cuts[1:]))
+
+def _run_range(job: Tuple) -> Tuple[int, Any]:
+    task, file_path, start, stop, args = job
+    return task(file_path, start, stop, *args)
+
+def scan_ranges(file_path: str, task: Callable, workers: int, *args) -> Iterator[Any]:
+    """Run task(file_path, start, stop, *args) -> (next_start, result) over a dump, in parallel
+    
+    Results come back in file order. Each range is checked against where the
+    previous one really ended: a range whose cut was not a true statement
+    boundary (quote or comment state differs) is rescanned from that point,
+    so the combined results always match a single sequential pass. At most
+    IN_FLIGHT_PER_WORKER ranges per worker are submitted ahead of the one
+    being consumed, so finished results cannot pile up in the parent.
+    """
+    size = os.path.getsize(file_path)
+    parts = max(workers * RANGES_PER_WORKER, -(-size // MAX_RANGE_SIZE))
+    ranges = split_ranges(file_path, parts) if workers > 1 else [(0, size)]
+    if len(ranges) == 1:
+        yield task(file_path, 0, None, *args)[1]
+        return
+    
+    processes = min(workers, len(ranges))
+    with multiprocessing.Pool(processes) as pool:
+        queued = iter(ranges)
+        pending = deque()
+        
+        def submit():
+            while len(pending) < processes * IN_FLIGHT_PER_WORKER:
+                span = next(queued, None)
+                if span is None:
+                    return
+                pending.append((span, pool.apply_async(_run_range, ((task, file_path, *span, args),))))
+        
+        submit()
+        expected = 0
+        while pending:
+            (start, stop), running = pending.popleft()
+            next_start, result = running.get()
+            # Refill before handing the result on, so the workers keep going while it is consumed
+            submit()
+            if start != expected:
+                if expected >= stop:
+                    # The previous range's last statement covered this one entirely
+                    continue
+                next_start, result = task(file_path, expected, stop, *args)
+            expected = next_start
+            yield result
+
+def _unquote(identifier: str) -> str:
+    """Strip quoting from an identifier and drop any schema prefix"""
+    parts = re.findall(_IDENT, identifier)
+    name = parts[-1] if parts else identifier
+    return name.strip('`"[]')
+
+def _column_list(text: str) -> List[str]:
+    inner = text.strip()
+    if inner.startswith('('):
+        inner = inner[1:inner.rfind(')')]
+    return [_unquote(re.sub(r'\(\d+\)|\s+(?:ASC|DESC)\b', '', c.strip(), flags=re.IGNORECASE)) for c in _split_top_level(inner)]
+
+def _split_top_level(text: str) -> List[str]:
+    """Split on commas that are outside parentheses and quotes"""
+    items, depth, start, quote = [], 0, 0, None
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if quote:
+            if char == '\\' and quote != '`':
+                i += 1
+            elif char == quote:
+                quote = None
+        elif char in '\'"`':
+            quote = char
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            items.append(text[start:i])
+            start = i + 1
+        i += 1
+    items.append(text[start:])
+    return [item.strip() for item in items if item.strip()]
+
+def _matching_paren(text: str, open_pos: int) -> int:
+    """Index of the parenthesis closing the one at open_pos"""
+    depth, quote = 0, None
+    i = open_pos
+    while i < len(text):
+        char = text[i]
+        if quote:
+            if char == '\\' and quote != '`':
+                i += 1
+            elif char == quote:
+                quote = None
+        elif char in '\'"`':
+            quote = char
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    return len(text)
+
+def _new_table() -> Dict:
+    return {'columns': [], 'primary_key': [], 'indexes': [], 'foreign_keys': []}
+
+def _apply_constraint(table: Dict, item: str) -> bool:
+    """Record a table-level constraint/index definition; False if `item` is a column"""
+    text = re.sub(r'^CONSTRAINT\s+(?:' + _IDENT + r'\s+)?', '', item, flags=re.IGNORECASE)
+    upper = text.upper()
+    
+    if upper.startswith('PRIMARY KEY'):
+        table['primary_key'] = _column_list(text[text.index('('):_matching_paren(text, text.index('(')) + 1])
+        for column in table['columns']:
+            if column['name'] in table['primary_key']:
+                column['primary_key'] = True
+                column['nullable'] = False
+        return True
+    if upper.startswith('FOREIGN KEY'):
+        open_pos = text.index('(')
+        close_pos = _matching_paren(text, open_pos)
+        ref = _REFERENCES.search(text, close_pos)
+        table['foreign_keys'].append({
+            'columns': _column_list(text[open_pos:close_pos + 1]),
+            'ref_table': _unquote(ref.group(1)) if ref else None,
+            'ref_columns': _column_list(ref.group(2)) if ref and ref.group(2) else []
+        })
+        return True
+    
+    index_match = re.match(r'(UNIQUE|FULLTEXT|SPATIAL)?\s*(?:KEY|INDEX)?\s*(' + _IDENT + r')?\s*(?:USING\s+\w+\s*)?\(', text, re.IGNORECASE)
+    if index_match and re.match(r'(UNIQUE|FULLTEXT|SPATIAL|KEY|INDEX)\b', upper):
+        open_pos = index_match.end() - 1
+        table['indexes'].append({
+            'name': _unquote(index_match.group(2)) if index_match.group(2) else None,
+            'columns': _column_list(text[open_pos:_matching_paren(text, open_pos) + 1]),
+            'unique': (index_match.group(1) or '').upper() == 'UNIQUE'
+        })
+        return True
+    if upper.startswith(('CHECK', 'EXCLUDE')):
+        return True
+    return False
+
+def _parse_column(item: str) -> Optional[Dict]:
+    name_match = re.match(_IDENT, item)
+    if not name_match:
+        return None
+    rest = item[name_match.end():].strip()
+    type_match = _COLUMN_TYPE.match(rest)
+    if not type_match:
+        return None
+    
+    col_type = ''.join(g or '' for g in type_match.groups())
+    col_type = ' '.join(col_type.split())
+    flags = rest[type_match.end():]
+    upper = flags.upper()
+    default = _DEFAULT.search(flags)
+    ref = _REFERENCES.search(flags)
+    
+    column = {
+        'name': _unquote(name_match.group(0)),
+        'type': col_type,
+        'nullable': 'NOT NULL' not in upper and 'PRIMARY KEY' not in upper,
+        'default': default.group(1) if default else None,
+        'primary_key': 'PRIMARY KEY' in upper,
+        'auto_increment': any(k in upper for k in ('AUTO_INCREMENT', 'AUTOINCREMENT', 'IDENTITY')) or col_type.upper() in ('SERIAL', 'BIGSERIAL', 'SMALLSERIAL')
+    }
+    if ref:
+        column['references'] = {'table': _unquote(ref.group(1)), 'columns': _column_list(ref.group(2)) if ref.group(2) else []}
+    return column
+
+def apply_statement(tables: Dict[str, Dict], statement: str):
+    """Update table metadata from one DDL statement"""
+    head = _CREATE_TABLE_HEAD.match(statement)
+    if head:
+        table = tables.setdefault(_unquote(head.group(1)), _new_table())
+        open_pos = head.end() - 1
+        for item in _split_top_level(statement[open_pos + 1:_matching_paren(statement, open_pos)]):
+            if _apply_constraint(table, item):
+                continue
+            column = _parse_column(item)
+            if column:
+                table['columns'].append(column)
+                if column['primary_key'] and column['name'] not in table['primary_key']:
+                    table['primary_key'].append(column['name'])
+                if 'references' in column:
+                    table['foreign_keys'].append({
+                        'columns': [column['name']],
+                        'ref_table': column['references']['table'],
+                        'ref_columns': column['references']['columns']
+                    })
+        return
+    
+    head = _CREATE_INDEX.match(statement)
+    if head:
+        table = tables.setdefault(_unquote(head.group(3)), _new_table())
+        open_pos = head.end() - 1
+        table['indexes'].append({
+            'name': _unquote(head.group(2)),
+            'columns': _column_list(statement[open_pos:_matching_paren(statement, open_pos) + 1]),
+            'unique': bool(head.group(1))
+        })
+        return
+    
+    head = _ALTER_TABLE_HEAD.match(statement)
+    if head:
+        table = tables.setdefault(_unquote(head.group(1)), _new_table())
+        for clause in _split_top_level(statement[head.end():]):
+            if clause.upper().startswith('ADD'):
+                item = re.sub(r'^ADD\s+(?:COLUMN\s+)?', '', clause, flags=re.IGNORECASE)
+                if not _apply_constraint(table, item) and re.match(r'ADD\s+COLUMN\b', clause, re.IGNORECASE):
+                    column = _parse_column(item)
+                    if column:
+                        table['columns'].append(column)
+
+
+def _read_statements(file_path: str, start: int, stop: Optional[int]) -> Tuple[int, List[str]]:
+    scanner = SqlStatementScanner(file_path, start=start, stop=stop)
+    statements = list(scanner)
+    return scanner.next_start, statements
+
+def scan_sql_tables(file_path: str, workers: int = 1) -> Dict[str, Dict]:
+    """Scan a SQL dump and return per-table column/type/key metadata"""
+    tables = {}
+    for statements in scan_ranges(file_path, _read_statements, workers):
+        for statement in statements:
+            apply_statement(tables, statement)
+    return tables
+
+# Statements the dump row reader needs: DDL for column names, plus the data itself
+ROW_PREFIXES = DDL_PREFIXES + ('INSERT', 'REPLACE', 'COPY')
+
+_INSERT_HEAD = re.compile(
+    r'(?:INSERT|REPLACE)\s+(?:(?:LOW_PRIORITY|DELAYED|HIGH_PRIORITY|IGNORE)\s+)*(?:INTO\s+)?'
+    r'((?:' + _IDENT + r'\s*\.\s*)?' + _IDENT + r')\s*(\([^)]*\))?\s*VALUES?\s*', re.IGNORECASE)
+_COPY_HEAD = re.compile(r'COPY\s+((?:' + _IDENT + r'\s*\.\s*)?' + _IDENT + r')\s*(\([^)]*\))?', re.IGNORECASE)
+_VALUE_TOKEN = re.compile(r"""\s*(?:
+    (?:_\w+\s*)?'((?:[^'\\]|\\.|'')*)'         # quoted string, optionally with a charset introducer
+  | (NULL)\b
+  | (0x[0-9a-fA-F]+\b)                        # hex literal (--hex-blob), before a number takes its 0
+  | ([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)(?!\w)  # number
+  | (\w+(?:\s*\([^)]*\))?)                     # keyword or function call
+  | ([(),])
+)""", re.IGNORECASE | re.VERBOSE | re.DOTALL)
+_SQL_ESCAPES = re.compile(r"\\(.)|''", re.DOTALL)
+_SQL_ESCAPE_CHARS = {'0': '\0', 'b': '\b', 'n': '\n', 'r': '\r', 't': '\t', 'Z': '\x1a'}
+_COPY_ESCAPES = re.compile(r'\\(.)')
+
+def _unescape_sql(text: str) -> str:
+    if '\\' not in text and "''" not in text:
+        return text
+    return _SQL_ESCAPES.sub(lambda m: _SQL_ESCAPE_CHARS.get(m.group(1), m.group(1)) if m.group(1) is not None else "'", text)
+
+def _parse_insert_values(statement: str, start: int) -> Iterator[List[Any]]:
+    """Yield each value tuple of an INSERT ... VALUES (...), (...) statement"""
+    row = None
+    for match in _VALUE_TOKEN.finditer(statement, start):
+        string, null, hex_literal, number, word, punct = match.groups()
+        if punct == '(':
+            row = []
+        elif punct == ')':
+            if row is not None:
+                yield row
+            row = None
+        elif punct == ',' or row is None:
+            continue
+        elif string is not None:
+            row.append(_unescape_sql(string))
+        elif null is not None:
+            row.append(None)
+        else:
+            row.append(hex_literal or number or word)
+
+def _parse_copy_row(line: str) -> List[Any]:
+    return [None if value == '\\N' else _COPY_ESCAPES.sub(lambda m: _SQL_ESCAPE_CHARS.get(m.group(1), m.group(1)), value)
+            for value in line.split('\t')]
+
+def row_scanner(file_path: str, start: int = 0, stop: Optional[int] = None) -> SqlStatementScanner:
+    """Scanner for the statements iter_range_events() reads"""
+    return SqlStatementScanner(file_path, ROW_PREFIXES, copy_rows=True, start=start, stop=stop)
+
+def iter_range_events(scanner: SqlStatementScanner) -> Iterator[Tuple]:
+    """Yield the data and DDL seen by a row scanner, in file order
+    
+    Events are ('ddl', statement) and ('row', table, columns, values), where
+    columns is None when the statement relies on the table definition.
+    """
+    copy_table, copy_columns = None, None
+    
+    for kind, text in scanner.iter_items():
+        if kind == 'copy_row':
+            yield 'row', copy_table, copy_columns, _parse_copy_row(text)
+            continue
+        
+        head = _INSERT_HEAD.match(text)
+        if head:
+            table_name = _unquote(head.group(1))
+            columns = _column_list(head.group(2)) if head.group(2) else None
+            for values in _parse_insert_values(text, head.end()):
+                yield 'row', table_name, columns, values
+            continue
+        
+        head = _COPY_HEAD.match(text)
+        if head:
+            copy_table = _unquote(head.group(1))
+            copy_columns = _column_list(head.group(2)) if head.group(2) else None
+            continue
+        
+        yield 'ddl', text
+
+def _read_events(file_path: str, start: int, stop: Optional[int]) -> Tuple[int, List[Tuple]]:
+    """Range task: the range's events, with consecutive rows of one table sent back as
+    ('rows', table, columns, [values, ...]) so the table and columns are pickled once"""
+    scanner = row_scanner(file_path, start, stop)
+    batch = []
+    for event in iter_range_events(scanner):
+        if event[0] != 'row':
+            batch.append(event)
+        elif batch and batch[-1][0] == 'rows' and batch[-1][1] == event[1] and batch[-1][2] == event[2]:
+            batch[-1][3].append(event[3])
+        else:
+            batch.append(('rows', event[1], event[2], [event[3]]))
+    return scanner.next_start, batch
+
+def _expand_events(batches: Iterable[List[Tuple]]) -> Iterator[Tuple]:
+    """The events of _read_events() batches, as iter_range_events() yields them"""
+    for batch in batches:
+        for event in batch:
+            if event[0] != 'rows':
+                yield event
+                continue
+            _, table_name, columns, rows = event
+            for values in rows:
+                yield 'row', table_name, columns, values
+
+def table_columns(tables: Dict[str, Dict], table_name: str) -> List[str]:
+    """Column names of a table as defined by the DDL seen so far"""
+    return [c['name'] for c in tables.get(table_name, _new_table())['columns']]
+
+def iter_sql_rows(file_path: str, workers: int = 1) -> Iterator[Tuple[str, List[str], List[Any]]]:
+    """Stream (table, columns, values) for every row in a SQL dump's INSERT and COPY data
+    
+    With one worker, one INSERT statement is held in memory at a time
+    (mysqldump keeps these around 1 MB). With more, byte ranges are parsed
+    by a process pool and their rows are yielded in file order; the parsed
+    rows of up to IN_FLIGHT_PER_WORKER ranges (MAX_RANGE_SIZE each) per
+    worker are held at once. Every row is pickled back from its worker, so
+    this only pays off with spare CPUs.
+    """
+    tables = {}
+    if workers > 1:
+        events = _expand_events(scan_ranges(file_path, _read_events, workers))
+    else:
+        events = iter_range_events(row_scanner(file_path))
+    
+    for event in events:
+        if event[0] == 'ddl':
+            apply_statement(tables, event[1])
+            continue
+        _, table_name, columns, values = event
+        yield table_name, columns if columns is not None else table_columns(tables, table_name), values
@@ -0,0 +1,129 @@
+"""
+Field Validation
+Checks GSTIN, HSN, pincode and phone values as records are converted and
+attaches compact issue codes (e.g. "gstin:checksum") to the records that
+have problems, so bad values are found before the import instead of inside
+the app. Every check is memoized per distinct value.
+"""
+
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+GSTIN_PATTERN = re.compile(r'\d{2}[0-9A-Z]{13}')
+HSN_PATTERN = re.compile(r'\d+')
+PINCODE_PATTERN = re.compile(r'[1-9]\d{5}')
+PHONE_SEPARATORS = re.compile(r'[,/;]')
+NON_DIGITS = re.compile(r'\D')
+
+GSTIN_CHARS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+# 01-38 are states and union territories; 96 foreign (OIDAR), 97 other territory, 99 centre jurisdiction
+GSTIN_STATE_CODES = frozenset([f"{code:02d}" for code in range(1, 39)] + ['96', '97', '99'])
+
+# HSN is 4 digits (or 6, 8 for larger businesses and exports); SAC codes are 6 digits starting 99
+HSN_LENGTHS = (4, 6, 8)
+
+# Memoized values per check; GSTINs and HSN codes repeat on every line of a register
+MEMO_SIZE = 65536
+
+def gstin_check_digit(gstin: str) -> str:
+    """Expected 15th character of a GSTIN (mod 36 checksum over the first 14)"""
+    total = 0
+    for position, char in enumerate(gstin[:14]):
+        product = GSTIN_CHARS.index(char) * (2 if position % 2 else 1)
+        total += product // 36 + product % 36
+    return GSTIN_CHARS[(36 - total % 36) % 36]
+
+@lru_cache(maxsize=MEMO_SIZE)
+def check_gstin(value: str) -> Tuple[str, ...]:
+    gstin = value.strip().upper()
+    if not GSTIN_PATTERN.fullmatch(gstin):
+        return ('gstin:format',)
+    issues = []
+    if gstin[:2] not in GSTIN_STATE_CODES:
+        issues.append('gstin:state')
+    if gstin[14] != gstin_check_digit(gstin):
+        issues.append('gstin:checksum')
+    return tuple(issues)
+
+@lru_cache(maxsize=MEMO_SIZE)
+def check_hsn(value: str) -> Tuple[str, ...]:
+    hsn = value.strip().replace(' ', '')
+    if not HSN_PATTERN.fullmatch(hsn):
+        return ('hsn:format',)
+    if len(hsn) not in HSN_LENGTHS:
+        return ('hsn:length',)
+    if hsn[:2] == '00':
+        return ('hsn:chapter',)
+    return ()
+
+@lru_cache(maxsize=MEMO_SIZE)
+def check_pincode(value: str) -> Tuple[str, ...]:
+    return () if PINCODE_PATTERN.fullmatch(value.strip().replace(' ', '')) else ('pincode:format',)
+
+@lru_cache(maxsize=MEMO_SIZE)
+def check_phone(value: str) -> Tuple[str, ...]:
+    """Indian numbers: 10 digits after dropping +91 / a leading 0; several may be separated by , / ;"""
+    for number in PHONE_SEPARATORS.split(value):
+        digits = NON_DIGITS.sub('', number)
+        if len(digits) == 12 and digits.startswith('91'):
+            digits = digits[2:]
+        elif len(digits) == 11 and digits.startswith('0'):
+            digits = digits[1:]
+        if len(digits) != 10 or digits[0] == '0':
+            return ('phone:format',)
+    return ()
+
+# Record field -> check; records are checked for whichever of these they carry
+CHECKS = {
+    'gstin': check_gstin,
+    'hsn_code': check_hsn,
+    'pincode': check_pincode,
+    'phone': check_phone,
+}
+
+def validate_record(record: Dict) -> List[str]:
+    """Check a record's GSTIN/HSN/pincode/phone; issues are attached as record['issues'] and returned
+
+    Empty values are not issues: these fields are optional in the app.
+    """
+    issues = []
+    for field, check in CHECKS.items():
+        value = record.get(field)
+        if value:
+            issues.extend(check(value if isinstance(value, str) else str(value)))
+    if issues:
+        record['issues'] = issues
+    return issues
+
+class IssueCounter:
+    """Tally of issue codes over a run, written to the backup's summaries"""
+
+    def __init__(self):
+        self.records = 0
+        self.codes = Counter()
+
+    def add(self, issues: Iterable[str]):
+        issues = list(issues)
+        if issues:
+            self.records += 1
+            self.codes.update(issues)
+
+    def merge(self, summary: Optional[Dict]):
+        """Add a to_dict() from another counter, e.g. one pipeline batch's"""
+        if summary:
+            self.records += summary['records_with_issues']
+            self.codes.update(summary['issues'])
+
+    def to_dict(self) -> Dict:
+        return {'records_with_issues': self.records, 'issues': dict(self.codes.most_common())}
+
+def print_validation(summary: Optional[Dict]):
+    if not summary or not summary['records_with_issues']:
+        print("🔍 Validation: no GSTIN/HSN/pincode/phone issues")
+        return
+    codes = ', '.join(f"{code} {count}" for code, count in summary['issues'].items())
+    print(f"🔍 Validation: {summary['records_with_issues']} record(s) with issues ({codes});"
+          f" see their \"issues\" field")
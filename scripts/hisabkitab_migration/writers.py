@@ -0,0 +1,42 @@
+"""
+Backup Writers
+Write converted records as a HisabKitab-Pro backup, either streamed record
+by record or as one pretty-printed document, or load them into a staging
+database when the output is named .sqlite/.sqlite3/.db
+"""
+
+import json
+from typing import Dict, Iterable, Optional
+
+from .backup_stream import is_staging, open_writer
+
+def write_backup(path: str, entities: Dict[str, Iterable[Dict]], export_by: str,
+                 summaries: Optional[Dict] = None) -> Dict[str, int]:
+    """Stream entity iterables into a backup file (.gz/.bz2/.xz compressed by extension)
+
+    Records are written as they are produced, so iter_products() and friends
+    can feed this without the output being built in memory. Returns the
+    number of records written per entity.
+    """
+    counts = {}
+    with open_writer(path, export_by=export_by) as writer:
+        for name, records in entities.items():
+            counts[name] = writer.write_entity(name, records)
+        writer.close({'summaries': summaries} if summaries else None)
+    return counts
+
+def write_backup_json(path: str, backup: Dict):
+    """Write a backup built in memory (e.g. by create_backup_json) as indented JSON, or into a staging database"""
+    if is_staging(path):
+        with open_writer(path, export_by=backup['export_by'], version=backup['version'],
+                         export_date=backup['export_date']) as writer:
+            for name, value in backup['data'].items():
+                if isinstance(value, list):
+                    writer.write_entity(name, value)
+                else:
+                    writer.write_object(name, value)
+            writer.close({key: value for key, value in backup.items()
+                          if key not in ('version', 'export_date', 'export_by', 'data')})
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(backup, f, indent=2, ensure_ascii=False)
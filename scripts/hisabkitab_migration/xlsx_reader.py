@@ -0,0 +1,67 @@
+"""
+Streaming XLSX Reader
+Reads Excel workbooks sheet by sheet, row by row, in openpyxl's read-only
+mode, keeping typed cells (dates as datetime, numbers as int/float)
+"""
+
+from typing import Any, Iterator, List, Optional, Tuple
+
+XLSX_EXTENSIONS = ('.xlsx', '.xlsm')
+
+def is_xlsx(path: str) -> bool:
+    return path.lower().endswith(XLSX_EXTENSIONS)
+
+def open_workbook(path: str):
+    """Open a workbook for streaming; openpyxl is only imported when XLSX input is used"""
+    try:
+        import openpyxl
+    except ImportError:
+        raise ImportError("XLSX input needs openpyxl (pip install openpyxl)") from None
+    # read_only streams rows from the sheet XML instead of building every cell up front;
+    # data_only returns the cached results of formulas rather than the formulas
+    return openpyxl.load_workbook(path, read_only=True, data_only=True)
+
+def select_sheets(path: str, selection: Optional[List[str]] = None) -> List[str]:
+    """Resolve sheet names, 1-based sheet numbers or 'all' to sheet names (default: first sheet)"""
+    workbook = open_workbook(path)
+    try:
+        names = list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+    if not selection:
+        return names[:1]
+    if any(s.lower() == 'all' for s in selection):
+        return names
+
+    selected = []
+    for sheet in selection:
+        if sheet in names:
+            selected.append(sheet)
+        elif sheet.isdigit() and 1 <= int(sheet) <= len(names):
+            selected.append(names[int(sheet) - 1])
+        else:
+            raise ValueError(f"{path}: no sheet '{sheet}' (sheets: {', '.join(names)})")
+    return selected
+
+def iter_xlsx_rows(path: str, sheet: str) -> Iterator[List[Any]]:
+    """Yield the non-empty rows of one sheet as lists of cell values"""
+    workbook = open_workbook(path)
+    try:
+        for row in workbook[sheet].iter_rows(values_only=True):
+            if any(value is not None and value != '' for value in row):
+                yield list(row)
+    finally:
+        workbook.close()
+
+def read_xlsx_sheet(path: str, sheet: str) -> Tuple[List[str], Iterator[List[Any]]]:
+    """Headers (first non-empty row) and a lazy iterator over the data rows of a sheet
+
+    Data rows are padded to the header width, so they index like CSV rows.
+    """
+    rows = iter_xlsx_rows(path, sheet)
+    headers = ['' if value is None else str(value).strip() for value in next(rows, [])]
+    while headers and not headers[-1]:
+        headers.pop()
+    width = len(headers)
+    return headers, (row + [None] * (width - len(row)) for row in rows)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Mapping Profile Manager for HisabKitab-Pro Migration
+Lists, shows, creates and deletes the mapping profiles the converters save
+per input layout (column mapping, date format, number locale, entity)
+"""
+
+import sys
+import json
+import argparse
+from itertools import chain
+
+from hisabkitab_migration.profiles import DEFAULT_PROFILE_DIR, ENTITIES, ProfileStore, table_headers
+from hisabkitab_migration.purchases import iter_input_tables
+from hisabkitab_migration.sources import SOURCES, read_rows
+
+def print_profile(path: str, profile: dict):
+    mapped = sum(1 for header in profile.get('columns', {}).values() if header is not None)
+    print(f"🗂️  {profile.get('fingerprint')} ({profile.get('entity')}): {mapped} column(s) mapped, "
+          f"dates {profile.get('date_format') or 'any known format'}, numbers {profile.get('number_locale')}")
+    print(f"   {', '.join(profile.get('headers', []))}")
+    print(f"   {path}")
+
+def detect(store: ProfileStore, args):
+    """Profile every table of an input (each sheet of a purchase workbook), saving the new layouts"""
+    if args.entity == 'purchases':
+        for name, headers, rows in iter_input_tables(args.input, args.sheet):
+            profile, _ = store.layout(headers, rows, 'purchases')
+            print(json.dumps(profile, indent=2, ensure_ascii=False))
+        return
+    table = read_rows(args.input, args.type, table=args.table, entity=args.entity, sheet=args.sheet)
+    rows = iter(table)
+    first = next(rows, None)
+    if first is None:
+        raise ValueError(f"{args.input}: no rows to detect a layout from")
+    profile, _ = store.layout(table_headers(table, first), chain([first], rows), args.entity)
+    print(json.dumps(profile, indent=2, ensure_ascii=False))
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the mapping profiles converters reuse per input layout')
+    parser.add_argument('--profile-dir', default=DEFAULT_PROFILE_DIR,
+                        help='Mapping profile directory (default: $HK_PROFILE_DIR or ~/.config/hisabkitab-migration/profiles)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help='List saved profiles')
+    show = subparsers.add_parser('show', help='Print one profile')
+    show.add_argument('fingerprint', help='Profile fingerprint (see list)')
+    detect_input = subparsers.add_parser('detect',
+                                         help='Profile an input without converting it, to edit before the first run')
+    detect_input.add_argument('--input', '-i', required=True, help='Input file (CSV, XLSX, SQL dump or SQLite DB)')
+    detect_input.add_argument('--entity', '-e', required=True, choices=ENTITIES,
+                              help='What the input holds (purchases: a purchase register)')
+    detect_input.add_argument('--type', '-t', choices=list(SOURCES),
+                              help='Input source type (default: from the extension)')
+    detect_input.add_argument('--table', help='Table name (for SQLite or SQL dump)')
+    detect_input.add_argument('--sheet', action='append',
+                              help='XLSX sheet name or 1-based number (repeatable, or "all")')
+    delete = subparsers.add_parser('delete', help='Delete a profile; its layout is detected again on the next run')
+    delete.add_argument('fingerprint', help='Profile fingerprint (see list)')
+
+    args = parser.parse_args()
+    # detect is the explicit way to create a profile, so it saves new layouts
+    store = ProfileStore(args.profile_dir, save_new=args.command == 'detect')
+
+    try:
+        if args.command == 'list':
+            profiles = store.profiles()
+            print(f"📚 {len(profiles)} profile(s) in {args.profile_dir}")
+            for path, profile in profiles:
+                print_profile(path, profile)
+        elif args.command == 'show':
+            profile = store.load(args.fingerprint)
+            if profile is None:
+                print(f"❌ No profile {args.fingerprint} in {args.profile_dir}", file=sys.stderr)
+                sys.exit(1)
+            print(json.dumps(profile, indent=2, ensure_ascii=False))
+            print(f"📁 {store.path(args.fingerprint)}", file=sys.stderr)
+        elif args.command == 'detect':
+            detect(store, args)
+        elif store.delete(args.fingerprint):
+            print(f"🗑️  Deleted profile {args.fingerprint}")
+        else:
+            print(f"❌ No profile {args.fingerprint} in {args.profile_dir}", file=sys.stderr)
+            sys.exit(1)
+    except (ImportError, OSError, ValueError) as e:
+        print(f"❌ Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Backup Merger for HisabKitab-Pro Migration
+Combines several converter outputs / backups into one file, giving every
+record a collision-free id and rewriting foreign keys to match
+"""
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+from typing import Dict, List, Optional
+
+from hisabkitab_migration.backup_stream import open_reader, open_writer
+
+# Foreign keys rewritten during the merge: entity -> {field: referenced entity}
+REFERENCES = {
+    'products': {'category_id': 'categories'},
+    'categories': {'parent_id': 'categories'},
+    'sub_categories': {'parent_id': 'categories'},
+    'purchases': {'supplier_id': 'suppliers'},
+    'sales': {'customer_id': 'customers', 'sales_person_id': 'sales_persons'},
+    'stock_adjustments': {'product_id': 'products'},
+}
+
+# Entities whose line items reference products
+ITEM_REFERENCES = {'purchases': 'items', 'sales': 'items'}
+
+# Shared across all inputs: merged by id, never renumbered
+KEEP_IDS = {'companies', 'users'}
+
+# Entities that repeat another entity's records and so share its ids
+ID_SPACES = {'sub_categories': 'categories'}
+
+def id_key(old_id):
+    """One key per source id, whether it was written as 12 or '12'"""
+    text = str(old_id).strip()
+    return int(text) if text.lstrip('-').isdigit() else text
+
+class IdRemapper:
+    """Allocates new ids per entity and remembers old -> new for the current file"""
+
+    def __init__(self, start_ids: Optional[Dict[str, int]] = None):
+        self.next_ids = dict(start_ids or {})
+        self.maps: Dict[str, Dict] = {}
+        self.defined: Dict[str, set] = {}
+        self.unresolved = 0
+
+    def begin_file(self):
+        """Start a new id space; ids from different files never share a mapping"""
+        for entity, mapping in self.maps.items():
+            self.unresolved += len(set(mapping) - self.defined.get(entity, set()))
+        self.maps = {}
+        self.defined = {}
+
+    def allocate(self, entity: str) -> int:
+        new_id = self.next_ids.get(entity, 1)
+        self.next_ids[entity] = new_id + 1
+        return new_id
+
+    def remap(self, entity: str, old_id) -> Optional[int]:
+        """New id for old_id; references seen before their record get the id the record will receive"""
+        if old_id is None or old_id == '':
+            return None
+        mapping = self.maps.setdefault(entity, {})
+        key = id_key(old_id)
+        if key not in mapping:
+            mapping[key] = self.allocate(entity)
+        return mapping[key]
+
+    def remap_record(self, entity: str, record: Dict) -> Dict:
+        space = ID_SPACES.get(entity, entity)
+        if record.get('id') is None:
+            record['id'] = self.allocate(space)
+        else:
+            self.defined.setdefault(space, set()).add(id_key(record['id']))
+            record['id'] = self.remap(space, record['id'])
+
+        for field, target in REFERENCES.get(entity, {}).items():
+            if field in record:
+                record[field] = self.remap(target, record[field])
+
+        items_key = ITEM_REFERENCES.get(entity)
+        for item in record.get(items_key, []) if items_key else []:
+            if 'product_id' in item:
+                item['product_id'] = self.remap('products', item['product_id'])
+        return record
+
+def max_ids(backup_path: str) -> Dict[str, int]:
+    """Next free id per id space, one above the highest id in an existing backup"""
+    next_ids = {}
+    for entity, record in open_reader(backup_path):
+        record_id = id_key(record['id']) if record.get('id') is not None else None
+        if isinstance(record_id, int):
+            space = ID_SPACES.get(entity, entity)
+            next_ids[space] = max(next_ids.get(space, 1), record_id + 1)
+    return next_ids
+
+def merge_backups(inputs: List[str], output: str, start_ids: Optional[Dict[str, int]] = None) -> Dict:
+    """Stream every input once, spooling remapped records per entity, then write the merged backup"""
+    remapper = IdRemapper(start_ids)
+    counts = {}
+    settings = {}
+    seen_shared = set()
+
+    with tempfile.TemporaryDirectory(prefix='hk_merge_') as spool_dir:
+        spools = {}
+
+        for path in inputs:
+            print(f"📂 Reading: {path}")
+            remapper.begin_file()
+            reader = open_reader(path)
+            for entity, record in reader:
+                if entity in KEEP_IDS:
+                    if (entity, record.get('id')) in seen_shared:
+                        continue
+                    seen_shared.add((entity, record.get('id')))
+                else:
+                    record = remapper.remap_record(entity, record)
+
+                if entity not in spools:
+                    spools[entity] = open(os.path.join(spool_dir, f"{entity}.ndjson"), 'w', encoding='utf-8')
+                spools[entity].write(json.dumps(record, ensure_ascii=False) + '\n')
+                counts[entity] = counts.get(entity, 0) + 1
+
+            if not settings and reader.objects.get('settings'):
+                settings = reader.objects['settings']
+        remapper.begin_file()
+
+        with open_writer(output, export_by='backup_merge') as writer:
+            for entity, spool in spools.items():
+                spool.close()
+                with open(spool.name, 'r', encoding='utf-8') as f:
+                    writer.write_entity(entity, (json.loads(line) for line in f))
+            writer.write_object('settings', settings)
+
+    return {'counts': counts, 'unresolved': remapper.unresolved}
+
+def main():
+    parser = argparse.ArgumentParser(description='Merge HisabKitab-Pro backup files with collision-free ids')
+    parser.add_argument('inputs', nargs='+', help='Backup / converter output files to merge')
+    parser.add_argument('--output', '-o', default='merged_backup.json', help='Output JSON file (.gz/.bz2/.xz to compress)')
+    parser.add_argument('--base', help='Existing backup; new ids start above its highest id per entity')
+
+    args = parser.parse_args()
+
+    start_ids = {}
+    if args.base:
+        print(f"📏 Scanning ids in base backup: {args.base}")
+        start_ids = max_ids(args.base)
+
+    try:
+        result = merge_backups(args.inputs, args.output, start_ids)
+    except (OSError, ValueError) as e:
+        print(f"❌ Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"\n✅ Merge complete!")
+    for entity, count in result['counts'].items():
+        print(f"   {entity}: {count}")
+    if result['unresolved']:
+        print(f"   ⚠️  {result['unresolved']} reference(s) point to records missing from their file")
+    print(f"   Output file: {args.output}")
+    print(f"\n📝 Summaries from the inputs are not carried over; their ids no longer match.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Category Hierarchy Resolver for HisabKitab-Pro Migration
+Reads a backup, converter output or staging file, orders its categories
+parents first (missing parents and loops cut, levels past subcategory merged),
+fills sub_categories and points products at their resolved category
+"""
+
+import os
+import sys
+import argparse
+from itertools import chain, groupby
+from operator import itemgetter
+from typing import Dict
+
+from hisabkitab_migration.backup_stream import open_reader, open_writer
+from hisabkitab_migration.categories import print_hierarchy, remap_products, resolve_categories
+
+# Top-level fields the writer produces itself
+ENVELOPE_FIELDS = ('version', 'export_date', 'export_by')
+
+def resolve_backup(source: str, output: str) -> Dict:
+    """Two streaming passes: collect and resolve the categories, then copy everything with them replaced
+
+    Only the categories are held in memory; products and every other entity
+    are streamed through. Returns the hierarchy report, the product counts
+    and the records written per entity.
+    """
+    tree = resolve_categories(record for entity, record in open_reader(source) if entity == 'categories')
+    report = tree.report()
+    products: Dict[str, int] = {}
+    counts: Dict[str, int] = {}
+    # Written from the tree in place of the input's arrays (sub_categories repeats the subcategories)
+    resolved = {'categories': tree.ordered, 'sub_categories': tree.sub_categories}
+
+    reader = open_reader(source)
+    records = iter(reader)
+    # The envelope fields come before data, so they are known once the first record is
+    first = next(records, None)
+    header = reader.header
+    with open_writer(output, export_by=header.get('export_by', 'category_resolver'),
+                     version=header.get('version', '1.0.0'), export_date=header.get('export_date')) as writer:
+        def write(entity, values):
+            writer.begin_entity(entity)
+            writer.write_records(values)
+            counts[entity] = counts.get(entity, 0) + writer.end_entity()
+
+        for entity, group in groupby(chain([first], records) if first else [], key=itemgetter(0)):
+            values = (record for _, record in group)
+            if entity in ('categories', 'sub_categories'):
+                if entity in resolved:
+                    write(entity, resolved.pop(entity))
+            elif entity == 'products':
+                write(entity, remap_products(values, tree, products))
+            else:
+                write(entity, values)
+        for entity, values in resolved.items():
+            write(entity, values)
+        for name, value in reader.objects.items():
+            writer.write_object(name, value)
+
+        # summaries come after data in a JSON backup, so the rest of the header is only complete now
+        extra = {key: value for key, value in reader.header.items() if key not in ENVELOPE_FIELDS}
+        extra['summaries'] = dict(extra.get('summaries') or {}, categories=report)
+        writer.close(extra)
+    return {'report': report, 'products': products, 'counts': counts}
+
+def main():
+    parser = argparse.ArgumentParser(description='Order categories, fill sub_categories and re-point products '
+                                                 'in a HisabKitab-Pro backup')
+    parser.add_argument('backup', help='Backup, converter output or staging file (.gz/.bz2/.xz/.sqlite/.db)')
+    parser.add_argument('--output', '-o', required=True,
+                        help='Resolved backup (.gz/.bz2/.xz to compress, .sqlite/.db: staging database)')
+
+    args = parser.parse_args()
+    if os.path.abspath(args.output) == os.path.abspath(args.backup):
+        parser.error("--output must be a different file from the backup it is read from")
+
+    print(f"🌳 Resolving categories in: {args.backup}")
+    try:
+        result = resolve_backup(args.backup, args.output)
+    except (OSError, ValueError) as e:
+        print(f"❌ Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print_hierarchy(result['report'], result['products'])
+    print(f"\n✅ Resolved!")
+    for entity, count in result['counts'].items():
+        print(f"   {entity}: {count}")
+    print(f"   Output file: {args.output}")
+
+if __name__ == '__main__':
+    main()